@@ -1,42 +1,90 @@
 #coding = 'utf-8'
 import os
-import subprocess
+import math
+import gc
+import pickle
+import zipfile
+import itertools
+import hashlib
+import signal
 import time
 import json
-from xml.dom.minidom import Element
-from xml.dom import  minidom
-
-from gitdb.util import mkdir
-from lxml import etree
-from concurrent.futures import ThreadPoolExecutor
-import openpyxl  # pip install openpyxl
-# from androguard.core.apk import APK
-from androguard.core.bytecodes.apk import APK
-from androguard.misc import AnalyzeAPK
+import queue
+import threading
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
 import sqlite3
 
-class AppAnalyzer:
-    def __init__(self, apk_path):
+# AndroidManifest.xml 中 android: 前缀对应的命名空间
+ANDROID_NS = "{http://schemas.android.com/apk/res/android}"
+
+# <data> 标签中关心的属性，顺序即 datas 中每个 dict 的键顺序
+DATA_ATTRS = ("scheme", "host", "port", "path", "pathPrefix", "pathPattern", "mimeType")
+
+# <application> 下需要提取的组件标签 -> extract_components() 返回 dict 中的键
+COMPONENT_TYPES = {
+    "activity": "activities",
+    "activity-alias": "activity_aliases",
+    "service": "services",
+    "receiver": "receivers",
+    "provider": "providers",
+}
+
+# 各组件除 name/exported/permission 之外额外提取的属性
+COMPONENT_EXTRA_ATTRS = {
+    "activity-alias": ("targetActivity",),
+    "provider": ("authorities", "readPermission", "writePermission", "grantUriPermissions"),
+}
+
+
+# androguard 的导入开销约占 CLI 启动时间的九成（会连带导入 sqlalchemy/alembic 等），
+# 因此只在真正需要解析 APK 时才导入；只读写数据库的路径（如 AttackSurfaceInspector）不受影响。
+def load_apk(apk_path, raw=False):
+    """
+    只解析 APK 容器与 AndroidManifest.xml，返回 androguard APK 对象
+    :param raw: 为 True 时 apk_path 为 APK 文件内容（bytes）
+    """
+    try:
+        from androguard.core.apk import APK  # androguard >= 4.0
+    except ImportError:
+        from androguard.core.bytecodes.apk import APK
+    return APK(apk_path, raw=raw)
+
+
+def analyze_apk(apk_path, raw=False):
+    """
+    完整解析 APK（含 DEX 分析），返回 (APK, [DalvikVMFormat], Analysis)
+    :param raw: 为 True 时 apk_path 为 APK 文件内容（bytes）
+    """
+    from androguard.misc import AnalyzeAPK
+    return AnalyzeAPK(apk_path, raw=raw)
+
+
+class ManifestExtractor:
+    """
+    直接在 androguard 返回的 lxml Manifest 树上单次遍历提取组件信息。
+    只沿 manifest -> application -> 组件 -> intent-filter -> action/category/data
+    逐层遍历直接子节点，属性通过命名空间键读取，不再序列化后交给 minidom 二次解析。
+    一次遍历即可同时得到 activity、activity-alias、service、receiver 与 provider。
+    """
+
+    def __init__(self, manifest_xml, package_name):
         """
-        初始化
-        :param apk_path: 代分析的apk的路径
+        :param manifest_xml: apk.get_android_manifest_xml() 返回的 lxml 根元素
+        :param package_name: 应用包名，用于补全相对类名
         """
+        self.manifest_xml = manifest_xml
+        self.package_name = package_name
 
-        # 加载并解析 APK 文件，a 为 APK 对象，d 为 DalvikVMFormat 对象，dx 为 Analysis 对象
-        self.apk, self.d, self.dx = AnalyzeAPK(apk_path)
-        self.apk_path = apk_path
-        self.package_name = self.apk.get_package()
-        manifest_xml = self.apk.get_android_manifest_xml()
-        self.manifest_xml = minidom.parseString(etree.tostring(manifest_xml, encoding="unicode"))
-
-    def analyze_activities(self):
+    def extract_activities(self):
         """
         返回一个包含所有Activity信息的列表。
         每个元素形如：
         {
           "activityName": <str>,
           "exported": <"true"|"false"|""(未显式)>,
-          "permission": <str或None>,
+          "permission": <str，未设置时为"">,
           "intent_filters": [
               {
                   "actions": [...],
@@ -47,50 +95,59 @@ class AppAnalyzer:
           ]
         }
         """
-        activities_info = []
-        activity_elements = self.manifest_xml.getElementsByTagName("activity")
-
-        for activity_element in activity_elements:
-            # 1) 获取 activityName(可能是相对路径，也可能是绝对路径)
-            raw_name = activity_element.getAttribute("android:name")
-            full_name = self._normalize_activity_name(raw_name, self.package_name)
-
-            # 2) 获取 exported
-            exported_val = activity_element.getAttribute("android:exported").lower().strip()
-
-            # 3) 获取 permission
-            permission_val = activity_element.getAttribute("android:permission").strip()
-
-            # 4) 获取所有 intent-filter
-            intent_filters = self._parse_intent_filters(activity_element)
-
-            # 整合activity信息
-            activity_info = {
-                "activityName": full_name,
-                "exported": exported_val if exported_val else None,
-                "permission": permission_val if permission_val else None,
-                "intent_filters": intent_filters if intent_filters else None,
+        return [
+            {
+                "activityName": component["name"],
+                "exported": component["exported"],
+                "permission": component["permission"],
+                "intent_filters": component["intent_filters"],
             }
-            activities_info.append(activity_info)
+            for component in self.extract_components(("activity",))["activities"]
+        ]
 
-        return activities_info
-
-    def _normalize_activity_name(self, raw_name, package_name):
+    def extract_components(self, tags=tuple(COMPONENT_TYPES)):
         """
-        将可能是 .MainActivity 等相对路径的 Activity 名称转换成全限定类名
+        单次遍历 <application>，提取 tags 中列出的所有组件。
+        返回 {"activities": [...], "activity_aliases": [...], "services": [...], "receivers": [...], "providers": [...]}
+        （只包含 tags 对应的键）。每个组件形如：
+        {
+          "name": <全限定类名>,
+          "exported": <"true"|"false"|""(未显式)>,
+          "permission": <str，未设置时为"">,
+          "intent_filters": [...],            # 结构同 extract_activities()
+          # activity-alias 额外包含：
+          "targetActivity": <全限定类名>,
+          # provider 额外包含：
+          "authorities": <str>, "readPermission": <str>, "writePermission": <str>, "grantUriPermissions": <str>
+        }
         """
-        if raw_name.startswith("."):
-            return package_name + raw_name
-        elif "." not in raw_name:
-            # 不包含 '.' 则视为相对路径
-            return f"{package_name}.{raw_name}"
-        else:
-            # 已经是绝对路径
-            return raw_name
+        components = {COMPONENT_TYPES[tag]: [] for tag in tags}
+        for application in self.manifest_xml:
+            if application.tag != "application":
+                continue
+            for element in application:
+                tag = element.tag
+                if tag in tags:
+                    components[COMPONENT_TYPES[tag]].append(self._extract_component(element, tag))
+        return components
 
-    def _parse_intent_filters(self, activity_element: Element):
+    def _extract_component(self, element, tag):
+        raw_name = element.get(ANDROID_NS + "name", "")
+        component = {
+            "name": self.normalize_name(raw_name, self.package_name),
+            "exported": element.get(ANDROID_NS + "exported", "").lower().strip(),
+            "permission": element.get(ANDROID_NS + "permission", "").strip(),
+            "intent_filters": self._extract_intent_filters(element),
+        }
+        for attr in COMPONENT_EXTRA_ATTRS.get(tag, ()):
+            component[attr] = element.get(ANDROID_NS + attr, "").strip()
+        if component.get("targetActivity"):
+            component["targetActivity"] = self.normalize_name(component["targetActivity"], self.package_name)
+        return component
+
+    def _extract_intent_filters(self, element):
         """
-        解析 <activity> 下的 <intent-filter> 信息。
+        解析组件下的 <intent-filter> 信息。
         每个 intent-filter 返回结构：
         {
           "actions": [...],
@@ -109,122 +166,1710 @@ class AppAnalyzer:
         }
         """
         result = []
-        intent_filters = activity_element.getElementsByTagName("intent-filter")
-        for f in intent_filters:
-            # 1) 收集 actions
-            action_list = []
-            for act in f.getElementsByTagName("action"):
-                action_name = act.getAttribute("android:name")
-                if action_name:
-                    action_list.append(action_name)
+        for f in element:
+            if f.tag != "intent-filter":
+                continue
 
-            # 2) 收集 categories
+            action_list = []
             category_list = []
-            for cat in f.getElementsByTagName("category"):
-                cat_name = cat.getAttribute("android:name")
-                if cat_name:
-                    category_list.append(cat_name)
-
-            # 3) 收集 data
             data_list = []
-            for d in f.getElementsByTagName("data"):
-                data_attrs = {
-                    "scheme": d.getAttribute("android:scheme") or None,
-                    "host": d.getAttribute("android:host") or None,
-                    "port": d.getAttribute("android:port") or None,
-                    "path": d.getAttribute("android:path") or None,
-                    "pathPrefix": d.getAttribute("android:pathPrefix") or None,
-                    "pathPattern": d.getAttribute("android:pathPattern") or None,
-                    "mimeType": d.getAttribute("android:mimeType") or None
-                }
-                data_list.append(data_attrs)
+            for child in f:
+                tag = child.tag
+                if tag == "action":
+                    action_name = child.get(ANDROID_NS + "name")
+                    if action_name:
+                        action_list.append(action_name)
+                elif tag == "category":
+                    cat_name = child.get(ANDROID_NS + "name")
+                    if cat_name:
+                        category_list.append(cat_name)
+                elif tag == "data":
+                    data_list.append({attr: child.get(ANDROID_NS + attr) or None for attr in DATA_ATTRS})
 
             # 若没有 <data> 标签，也加一个空数据，以便后续构造 Intent 时考虑
             if not data_list:
-                data_list.append({
-                    "scheme": None,
-                    "host": None,
-                    "port": None,
-                    "path": None,
-                    "pathPrefix": None,
-                    "pathPattern": None,
-                    "mimeType": None
-                })
-
-            filter_obj = {
+                data_list.append(dict.fromkeys(DATA_ATTRS))
+
+            result.append({
                 "actions": action_list,
                 "categories": category_list,
                 "datas": data_list
-            }
-            result.append(filter_obj)
+            })
 
         return result
 
-    def store_activities_in_db(self):
+    @staticmethod
+    def normalize_name(raw_name, package_name):
         """
-        执行 analyze_activities() 并且将结果存入数据库。
+        将可能是 .MainActivity 等相对路径的组件名称转换成全限定类名
+        """
+        if raw_name.startswith("."):
+            return package_name + raw_name
+        elif "." not in raw_name:
+            # 不包含 '.' 则视为相对路径
+            return f"{package_name}.{raw_name}"
+        else:
+            # 已经是绝对路径
+            return raw_name
+
+
+def _split_components(bundle_path, entry, package_name, tags):
+    """
+    进程池中执行：从安装包中读出一个 split APK 并只解析它的 Manifest，返回 extract_components(tags) 的结果
+    """
+    data = ApkBundle(bundle_path).read(entry)
+    apk = load_apk(data, raw=True)
+    return ManifestExtractor(apk.get_android_manifest_xml(), package_name).extract_components(tags)
+
+
+class ApkBundle:
+    """
+    由 base APK 与若干 split APK 组成的安装包：
+      - .xapk / .apks：zip 容器，内含 base 与各 split APK（bundletool 的 standalones/ 下为完整 APK，忽略）
+      - split 目录：包含 base.apk（或 base-master.apk）及其他 split APK 的目录，如从设备 /data/app 拉取的目录；
+        其余 APK 必须确实是该应用的 split（见 is_split_dir），否则按各自独立的 APK 处理
+    各 APK 直接从容器读入内存交给 androguard，不解压到磁盘。
+    base 的确定顺序：XAPK 的 manifest.json 中 id 为 base 的文件 -> 文件名为 BASE_NAMES 之一 ->
+    唯一一个文件名不以 split/config. 开头的 APK。
+    """
+
+    EXTENSIONS = (".xapk", ".apks")
+    BASE_NAMES = ("base.apk", "base-master.apk")
+    SPLIT_PREFIXES = ("split", "config.")
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = self._list_entries()
+        self.base = self._find_base()
+        self.splits = [entry for entry in self.entries if entry != self.base]
+
+    @classmethod
+    def is_bundle(cls, path):
+        if os.path.isdir(path):
+            return cls.is_split_dir(path)
+        return path.lower().endswith(cls.EXTENSIONS)
+
+    @classmethod
+    def is_split_dir(cls, path):
+        """
+        目录中（不递归）有 base APK，且其余每个 APK 都是它的 split 时视为 split 目录：
+        文件名以 SPLIT_PREFIXES 开头（如 split_config.arm64_v8a.apk），
+        或 Manifest 根节点带 split 属性且包名与 base 相同。
+        只是碰巧含有 base.apk 的普通 APK 目录返回 False，其中的文件按独立 APK 处理
+        """
+        names = [name for name in os.listdir(path) if name.lower().endswith(".apk")]
+        base = next((name for name in names if name in cls.BASE_NAMES), None)
+        others = [name for name in names if name != base]
+        if base is None or not others:
+            return False
+        unnamed = [name for name in others if not name.startswith(cls.SPLIT_PREFIXES)]
+        if not unnamed:
+            return True
+        # 文件名无法判断时才解析 Manifest，遇到第一个不是 split 的 APK 即停止
+        try:
+            package = load_apk(os.path.join(path, base)).get_package()
+            for name in unnamed:
+                apk = load_apk(os.path.join(path, name))
+                if apk.get_android_manifest_xml().get("split") is None or apk.get_package() != package:
+                    return False
+        except Exception:
+            return False
+        return True
+
+    def _list_entries(self):
+        if os.path.isdir(self.path):
+            return sorted(name for name in os.listdir(self.path) if name.lower().endswith(".apk"))
+        with zipfile.ZipFile(self.path) as zf:
+            return [
+                name for name in zf.namelist()
+                if name.lower().endswith(".apk") and not name.startswith("standalones/")
+            ]
+
+    def _find_base(self):
+        if not os.path.isdir(self.path):
+            with zipfile.ZipFile(self.path) as zf:
+                if "manifest.json" in zf.namelist():
+                    manifest = json.loads(zf.read("manifest.json"))
+                    for split in manifest.get("split_apks") or []:
+                        if split.get("id") == "base" and split.get("file") in self.entries:
+                            return split["file"]
+        for entry in self.entries:
+            if os.path.basename(entry) in self.BASE_NAMES:
+                return entry
+        candidates = [
+            entry for entry in self.entries
+            if not os.path.basename(entry).startswith(self.SPLIT_PREFIXES)
+        ]
+        if len(candidates) == 1:
+            return candidates[0]
+        raise ValueError(f"无法确定安装包中的 base APK: {self.path}")
+
+    def read(self, entry):
+        """
+        读出其中一个 APK 的内容（bytes）
+        """
+        if os.path.isdir(self.path):
+            with open(os.path.join(self.path, entry), "rb") as f:
+                return f.read()
+        with zipfile.ZipFile(self.path) as zf:
+            return zf.read(entry)
+
+    def load_base(self):
+        return load_apk(self.read(self.base), raw=True)
+
+    def analyze_base(self):
+        return analyze_apk(self.read(self.base), raw=True)
+
+    def split_components(self, package_name, tags=tuple(COMPONENT_TYPES), workers=None):
+        """
+        解析所有 split 的 Manifest（base 不在其中），返回各 split 的 extract_components(tags) 结果列表。
+        split 多于一个时在 workers 个进程中并行解析；workers=1 时在当前进程中依次解析
+        （已处于进程池中时使用，如 CorpusIngestor 的工作进程）。
+        :param package_name: base 的包名，用于补全 split 中的相对类名
+        """
+        workers = min(workers or os.cpu_count() or 1, len(self.splits))
+        args = [(self.path, entry, package_name, tags) for entry in self.splits]
+        if workers <= 1:
+            return [_split_components(*a) for a in args]
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_split_components, *zip(*args)))
+
+    @staticmethod
+    def merge_components(base, splits):
+        """
+        将各 split 的组件合并到 base 的 extract_components() 结果中；同名组件以先出现者（base 优先）为准
+        """
+        merged = {key: list(items) for key, items in base.items()}
+        for components in splits:
+            for key, items in components.items():
+                seen = {item["name"] for item in merged.setdefault(key, [])}
+                merged[key].extend(item for item in items if item["name"] not in seen)
+        return merged
+
+
+class AnalysisCache:
+    """
+    以 APK 文件 SHA-256 为键的持久化分析结果缓存（SQLite）。
+    缓存内容为 AppAnalyzer.analyze_components() 的输出，并记录产生它的工具/androguard 版本，
+    版本不一致的条目视为未命中。总大小超过 max_bytes 时按最近访问时间淘汰最旧的条目。
+    数据库使用 WAL，读取不阻塞其他进程的写入；命中时不立即写库，最近访问时间只精确到 ACCESS_INTERVAL 秒，
+    需要更新的条目先记在内存中，在 put()、close() 或积累到 ACCESS_FLUSH_SIZE 条时一次写入。
+    """
+
+    # 提取逻辑或输出结构变化时递增，使旧缓存失效
+    TOOL_VERSION = "2"
+    # 距上次记录的访问时间不足该秒数的命中不更新 last_access
+    ACCESS_INTERVAL = 3600
+    # 待写入的访问时间积累到该条数时立即写入
+    ACCESS_FLUSH_SIZE = 256
+
+    def __init__(self, cache_path='./analysis_cache.db', max_bytes=512 * 1024 * 1024):
+        """
+        :param cache_path: 缓存数据库路径
+        :param max_bytes: 缓存内容（JSON）总大小上限，None 表示不限制
+        """
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.version = self._current_version()
+        self._accessed = {}     # sha256 -> 待写入的访问时间
+        self.conn = sqlite3.connect(cache_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        # 旧版缓存表结构不兼容时直接重建（缓存内容可随时丢弃）
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(analysis_cache)")]
+        if columns and "result" not in columns:
+            self.conn.execute("DROP TABLE analysis_cache")
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_cache (
+            sha256       TEXT PRIMARY KEY,
+            version      TEXT NOT NULL,
+            package_name TEXT,
+            result       TEXT,
+            size         INTEGER NOT NULL,
+            last_access  REAL NOT NULL
+        )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_cache_access ON analysis_cache (last_access)")
+        self.conn.commit()
+
+    @classmethod
+    def _current_version(cls):
+        try:
+            import androguard
+            androguard_version = getattr(androguard, "__version__", "unknown")
+        except ImportError:
+            androguard_version = "unknown"
+        return f"{cls.TOOL_VERSION}/androguard-{androguard_version}"
+
+    @staticmethod
+    def file_sha256(path, chunk_size=1024 * 1024):
+        """
+        计算文件的 SHA-256（十六进制字符串）；path 为目录（split 目录）时依次对其中各文件的名称与内容计算
+        """
+        h = hashlib.sha256()
+        paths = [path]
+        if os.path.isdir(path):
+            paths = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+            paths = [p for p in paths if os.path.isfile(p)]
+        for p in paths:
+            if p != path:
+                h.update(os.path.basename(p).encode("utf-8") + b"\0")
+            with open(p, "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    h.update(chunk)
+        return h.hexdigest()
+
+    def get(self, sha256):
+        """
+        :return: 命中时返回 (package_name, components)，否则返回 None
+        """
+        row = self.conn.execute(
+            "SELECT package_name, result, last_access FROM analysis_cache WHERE sha256 = ? AND version = ?",
+            (sha256, self.version)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[2] >= self.ACCESS_INTERVAL:
+            self._accessed[sha256] = now
+            if len(self._accessed) >= self.ACCESS_FLUSH_SIZE:
+                self._flush_access()
+                self.conn.commit()
+        return row[0], json.loads(row[1])
+
+    def put(self, sha256, package_name, components):
+        payload = json.dumps(components)
+        self.conn.execute("""
+        INSERT OR REPLACE INTO analysis_cache
+            (sha256, version, package_name, result, size, last_access)
+        VALUES
+            (?, ?, ?, ?, ?, ?)
+        """, (sha256, self.version, package_name, payload, len(payload), time.time()))
+        self._accessed.pop(sha256, None)
+        self._flush_access()
+        self._evict()
+        self.conn.commit()
+
+    def _flush_access(self):
+        """
+        写入积累的访问时间（不提交事务）
+        """
+        if not self._accessed:
+            return
+        self.conn.executemany(
+            "UPDATE analysis_cache SET last_access = ? WHERE sha256 = ? AND last_access < ?",
+            [(accessed_at, sha256, accessed_at) for sha256, accessed_at in self._accessed.items()]
+        )
+        self._accessed = {}
+
+    def _evict(self):
+        """
+        删除其他版本产生的条目；若总大小仍超过上限，则按 last_access 从旧到新淘汰。
+        """
+        self.conn.execute("DELETE FROM analysis_cache WHERE version != ?", (self.version,))
+        if self.max_bytes is None:
+            return
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM analysis_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for sha256, size in self.conn.execute("SELECT sha256, size FROM analysis_cache ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            victims.append((sha256,))
+            total -= size
+        self.conn.executemany("DELETE FROM analysis_cache WHERE sha256 = ?", victims)
+
+    def close(self):
+        try:
+            self._flush_access()
+            self.conn.commit()
+        except sqlite3.Error:
+            # 访问时间只影响淘汰顺序，写不进去时放弃
+            pass
+        self.conn.close()
+
+
+# WebView 中会加载外部内容的方法，及 Activity 可被外部 Intent 触发的生命周期入口
+WEBVIEW_CLASS = "Landroid/webkit/WebView;"
+WEBVIEW_SINK_METHODS = ("loadUrl", "loadData", "loadDataWithBaseURL", "evaluateJavascript", "postUrl")
+ACTIVITY_ENTRY_METHODS = ("onCreate", "onNewIntent", "onStart", "onResume")
+
+
+class WebViewReachability:
+    """
+    DEX 层的可达性索引：哪些 Activity 的入口方法能经调用链到达 WebView 的加载方法。
+      - 汇点为 WebView 及应用内 WebView 子类上的 WEBVIEW_SINK_METHODS
+      - 从所有汇点出发沿 get_xref_from()（调用者）做一次多源反向 BFS，记录每个方法通往最近汇点的下一跳；
+        结果缓存在对象中，之后任意多个 Activity 的查询都只是查表，不再各自搜索
+      - Activity 的入口取 ACTIVITY_ENTRY_METHODS 在其继承链（应用内的类）上最靠近子类的实现
+    调用图来自 androguard 的静态交叉引用，经 Handler、回调接口、反射等间接调用的路径不会被发现。
+    """
+
+    def __init__(self, dx):
+        """
+        :param dx: androguard Analysis 对象
+        """
+        self.dx = dx
+        self._next_hop = None  # MethodAnalysis -> 更靠近汇点的被调用方法，汇点本身为 None
+        self._distance = None
+
+    @staticmethod
+    def descriptor(class_name):
+        """
+        com.example.Foo -> Lcom/example/Foo;
+        """
+        return "L" + class_name.replace(".", "/") + ";"
+
+    def _superclasses(self, class_descriptor):
+        # 沿应用内的继承链向上，直到遇到外部类（framework/库）或循环
+        seen = set()
+        while class_descriptor and class_descriptor not in seen:
+            seen.add(class_descriptor)
+            yield class_descriptor
+            ca = self.dx.get_class_analysis(class_descriptor)
+            if ca is None or ca.is_external():
+                return
+            class_descriptor = ca.extends
+
+    def _sinks(self):
+        webview_classes = {WEBVIEW_CLASS}
+        for ca in self.dx.get_classes():
+            if not ca.is_external() and WEBVIEW_CLASS in self._superclasses(ca.name):
+                webview_classes.add(ca.name)
+        for class_descriptor in webview_classes:
+            ca = self.dx.get_class_analysis(class_descriptor)
+            if ca is None:
+                continue
+            for method in ca.get_methods():
+                if method.name in WEBVIEW_SINK_METHODS:
+                    yield method
+
+    def build(self):
+        """
+        执行一次多源反向 BFS（重复调用不会重新计算）
+        """
+        if self._next_hop is not None:
+            return
+        next_hop, distance = {}, {}
+        queue_ = deque()
+        for sink in self._sinks():
+            next_hop[sink] = None
+            distance[sink] = 0
+            queue_.append(sink)
+        while queue_:
+            method = queue_.popleft()
+            for _, caller, _ in method.get_xref_from():
+                if caller not in next_hop:
+                    next_hop[caller] = method
+                    distance[caller] = distance[method] + 1
+                    queue_.append(caller)
+        self._next_hop, self._distance = next_hop, distance
+
+    def _entry_methods(self, class_descriptor):
+        found = {}
+        for descriptor in self._superclasses(class_descriptor):
+            ca = self.dx.get_class_analysis(descriptor)
+            if ca is None or ca.is_external():
+                break
+            for method in ca.get_methods():
+                if method.name in ACTIVITY_ENTRY_METHODS and method.name not in found:
+                    found[method.name] = method
+        return found.values()
+
+    def activity(self, activity_name):
+        """
+        :param activity_name: 全限定类名，如 com.example.MainActivity
+        :return: {"reachable": bool, "path": [入口方法, ..., 汇点方法]}（不可达时 path 为空列表）
+        """
+        self.build()
+        best = None
+        for entry in self._entry_methods(self.descriptor(activity_name)):
+            if entry in self._distance and (best is None or self._distance[entry] < self._distance[best]):
+                best = entry
+        path = []
+        while best is not None:
+            path.append(best.full_name)
+            best = self._next_hop[best]
+        return {"reachable": bool(path), "path": path}
+
+
+class AppAnalyzer:
+    def __init__(self, apk_path, manifest_only=False, cache=None, split_workers=None):
+        """
+        初始化
+        :param apk_path: 代分析的apk的路径；也可以是 .xapk/.apks 安装包或 split 目录（见 ApkBundle），
+                         此时 self.apk / self.dx 对应 base APK，analyze_components() 合并各 split 中声明的组件
+        :param manifest_only: 为 True 时只构造 APK 对象（仅解析 AndroidManifest.xml），
+                              不做 DEX 反编译与交叉引用分析；self.d / self.dx 在第一次被访问时才构建
+        :param cache: AnalysisCache 对象。缓存命中时不解析 APK，
+                      analyze_components()/analyze_activities() 直接使用缓存结果，self.apk 等在首次访问时才加载
+        :param split_workers: 并行解析 split Manifest 的进程数，见 ApkBundle.split_components()
+        """
+        self.apk_path = apk_path
+        self.cache = cache
+        self.bundle = ApkBundle(apk_path) if ApkBundle.is_bundle(apk_path) else None
+        self.split_workers = split_workers
+        self.sha256 = None
+        self._apk = None
+        self._d = None
+        self._dx = None
+        self._components = None
+        self._reachability = None
+
+        if cache is not None:
+            self.sha256 = AnalysisCache.file_sha256(apk_path)
+            hit = cache.get(self.sha256)
+            if hit is not None:
+                self.package_name, self._components = hit
+                return
+
+        self._load_apk(manifest_only)
+
+    def _load_apk(self, manifest_only):
+        if manifest_only:
+            # 只解析 APK 容器与 Manifest，跳过 DEX 分析
+            self._apk = self.bundle.load_base() if self.bundle else load_apk(self.apk_path)
+        else:
+            # 加载并解析 APK 文件，a 为 APK 对象，d 为 DalvikVMFormat 对象，dx 为 Analysis 对象
+            self._apk, self._d, self._dx = self.bundle.analyze_base() if self.bundle else analyze_apk(self.apk_path)
+
+        self.package_name = self._apk.get_package()
+
+    @property
+    def apk(self):
+        """
+        APK 对象，缓存命中时首次访问才加载
+        """
+        if self._apk is None:
+            self._load_apk(manifest_only=True)
+        return self._apk
+
+    @property
+    def manifest_xml(self):
+        """
+        lxml 根元素，直接交给 ManifestExtractor 遍历
+        """
+        return self.apk.get_android_manifest_xml()
+
+    @property
+    def d(self):
+        """
+        DalvikVMFormat 对象列表，manifest_only 模式下首次访问时才构建
+        """
+        if self._dx is None:
+            self._load_dex()
+        return self._d
+
+    @property
+    def dx(self):
+        """
+        Analysis 对象，manifest_only 模式下首次访问时才构建
+        """
+        if self._dx is None:
+            self._load_dex()
+        return self._dx
+
+    def _load_dex(self):
+        """
+        按需执行完整的 DEX 分析。已有的 APK 对象（及其 Manifest 解析结果）保持不变。
+        安装包只分析 base APK 的 DEX，feature split 中的代码不在调用图内。
+        """
+        _, self._d, self._dx = self.bundle.analyze_base() if self.bundle else analyze_apk(self.apk_path)
+
+    def release(self):
+        """
+        释放 DEX 分析结果（self.d / self.dx），它们通常占分析过程内存的绝大部分。
+        已得到的组件与可达性分析结果保留；之后再访问 self.d / self.dx 会重新分析。
+        """
+        self._d = None
+        self._dx = None
+
+    def analyze_activities(self):
+        """
+        返回一个包含所有Activity信息的列表。
+        每个元素形如：
+        {
+          "activityName": <str>,
+          "exported": <"true"|"false"|""(未显式)>,
+          "permission": <str或None>,
+          "intent_filters": [
+              {
+                  "actions": [...],
+                  "categories": [...],
+                  "datas": [ {scheme=xx,host=xx,...} ... ]
+              },
+              ...
+          ]
+        }
+        """
+        return self.activities_from_components(self.analyze_components())
+
+    def analyze_components(self):
+        """
+        单次遍历 Manifest，返回所有组件信息：
+        {"activities": [...], "activity_aliases": [...], "services": [...], "receivers": [...], "providers": [...]}
+        每个组件的结构见 ManifestExtractor.extract_components()，其中未显式设置的字段记为 None。
+        """
+        if self._components is not None:
+            return self._components
+
+        extractor = ManifestExtractor(self.manifest_xml, self.package_name)
+        extracted = extractor.extract_components()
+        if self.bundle is not None:
+            # base 的 Manifest 只解析一次，各 split 只解析自己的 Manifest 后合并
+            splits = self.bundle.split_components(self.package_name, workers=self.split_workers)
+            extracted = ApkBundle.merge_components(extracted, splits)
+        components = {}
+        for key, items in extracted.items():
+            # 未显式设置的字段记为 None
+            components[key] = [{k: (v if v else None) for k, v in item.items()} for item in items]
+
+        self._components = components
+        if self.cache is not None:
+            self.cache.put(self.sha256, self.package_name, components)
+        return components
+
+    def analyze_webview_reachability(self):
+        """
+        对 DEX 做一次 WebViewReachability 分析（manifest_only 模式下会在此时构建 self.dx），
+        返回 {activity_name: {"reachable": bool, "path": [...]}}
+        """
+        if self._reachability is None:
+            index = WebViewReachability(self.dx)
+            self._reachability = {
+                activity["name"]: index.activity(activity["name"])
+                for activity in self.analyze_components()["activities"]
+            }
+        return self._reachability
+
+    @staticmethod
+    def activities_from_components(components):
+        """
+        由 analyze_components() 的结果得到 analyze_activities() 格式的列表
+        """
+        return [
+            {
+                "activityName": activity["name"],
+                "exported": activity["exported"],
+                "permission": activity["permission"],
+                "intent_filters": activity["intent_filters"],
+            }
+            for activity in components["activities"]
+        ]
+
+    def store_activities_in_db(self, db_path='./all.db', writer=None, reachability=False):
+        """
+        执行 analyze_activities() 并且将结果存入数据库。同一次 Manifest 遍历得到的
+        activity-alias/service/receiver/provider 一并写入各自的组件表。
         表：activity_info
         列：(package_name, activity_name, exported, permission, intent_filters)
         键：(package_name, activity_name)
-        若表不存在就创建；
+        若表不存在就创建（每个数据库只建一次，见 create_schema）；
         若有重复键则替换（INSERT OR REPLACE）。
+        同一线程对同一数据库的连接在调用之间保持打开，需要释放时调用 close_store_connections()。
+        :param db_path: 数据库路径
+        :param writer: ActivityDBWriter 对象。指定时结果交给它合并批量写入，db_path 被忽略
+        :param reachability: 为 True 时同时写入 analyze_webview_reachability() 的结果（activity_reachability 表）
         """
-        db_path = './all.db'
-
         # 获取所有 Activity 信息
-        activities_info = self.analyze_activities()
+        components = self.analyze_components()
+        activities_info = self.activities_from_components(components)
+        reach = self.analyze_webview_reachability() if reachability else None
 
-        # 连接数据库，不存在则会自动创建
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        if writer is not None:
+            writer.add(self.package_name, activities_info, components, reach)
+            return
 
-        # 创建表（如果不存在）
-        create_table_sql = """
-        CREATE TABLE IF NOT EXISTS activity_info (
-            package_name   TEXT NOT NULL,
-            activity_name  TEXT NOT NULL,
-            exported       TEXT,
-            permission     TEXT,
-            intent_filters TEXT,
-            PRIMARY KEY (package_name, activity_name)
-        )
+        # 复用当前线程中该数据库的连接，不存在则会自动创建
+        conn = _store_connection(db_path)
+        with transaction(conn):
+            save_activities(conn, self.package_name, activities_info, components, reach)
+
+
+# activity_info 表结构
+ACTIVITY_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS activity_info (
+    package_name   TEXT NOT NULL,
+    activity_name  TEXT NOT NULL,
+    exported       TEXT,
+    permission     TEXT,
+    intent_filters TEXT,
+    PRIMARY KEY (package_name, activity_name)
+)
+"""
+
+# 插入或替换数据
+ACTIVITY_INSERT_SQL = """
+INSERT OR REPLACE INTO activity_info 
+    (package_name, activity_name, exported, permission, intent_filters)
+VALUES 
+    (?, ?, ?, ?, ?)
+"""
+
+# intent-filter 规范化表，均以 (package_name, activity_name) 关联回 activity_info。
+# 例：哪些导出的 Activity 接受 scheme=http、host=* 的 Intent
+#   SELECT DISTINCT a.package_name, a.activity_name
+#   FROM intent_filter_data d
+#   JOIN activity_info a USING (package_name, activity_name)
+#   WHERE d.scheme = 'http' AND d.host = '*' AND a.exported = 'true'
+INTENT_FILTER_SCHEMA_SQL = (
+    """
+    CREATE TABLE IF NOT EXISTS intent_filter (
+        package_name  TEXT NOT NULL,
+        activity_name TEXT NOT NULL,
+        filter_index  INTEGER NOT NULL,
+        PRIMARY KEY (package_name, activity_name, filter_index)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS intent_filter_action (
+        package_name  TEXT NOT NULL,
+        activity_name TEXT NOT NULL,
+        filter_index  INTEGER NOT NULL,
+        action        TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS intent_filter_category (
+        package_name  TEXT NOT NULL,
+        activity_name TEXT NOT NULL,
+        filter_index  INTEGER NOT NULL,
+        category      TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS intent_filter_data (
+        package_name  TEXT NOT NULL,
+        activity_name TEXT NOT NULL,
+        filter_index  INTEGER NOT NULL,
+        data_index    INTEGER NOT NULL,
+        scheme        TEXT,
+        host          TEXT,
+        port          TEXT,
+        path          TEXT,
+        path_prefix   TEXT,
+        path_pattern  TEXT,
+        mime_type     TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_intent_filter_action_owner ON intent_filter_action (package_name, activity_name)",
+    "CREATE INDEX IF NOT EXISTS idx_intent_filter_action_action ON intent_filter_action (action)",
+    "CREATE INDEX IF NOT EXISTS idx_intent_filter_category_owner ON intent_filter_category (package_name, activity_name)",
+    "CREATE INDEX IF NOT EXISTS idx_intent_filter_category_category ON intent_filter_category (category)",
+    "CREATE INDEX IF NOT EXISTS idx_intent_filter_data_owner ON intent_filter_data (package_name, activity_name)",
+    "CREATE INDEX IF NOT EXISTS idx_intent_filter_data_scheme ON intent_filter_data (scheme, host)",
+    "CREATE INDEX IF NOT EXISTS idx_intent_filter_data_host ON intent_filter_data (host)",
+    "CREATE INDEX IF NOT EXISTS idx_intent_filter_data_mime_type ON intent_filter_data (mime_type)",
+)
+
+# 其他组件各自一张表，结构与 activity_info 对应，provider/activity-alias 另有专属列
+COMPONENT_SCHEMA_SQL = (
+    """
+    CREATE TABLE IF NOT EXISTS activity_alias_info (
+        package_name    TEXT NOT NULL,
+        alias_name      TEXT NOT NULL,
+        target_activity TEXT,
+        exported        TEXT,
+        permission      TEXT,
+        intent_filters  TEXT,
+        PRIMARY KEY (package_name, alias_name)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS service_info (
+        package_name   TEXT NOT NULL,
+        service_name   TEXT NOT NULL,
+        exported       TEXT,
+        permission     TEXT,
+        intent_filters TEXT,
+        PRIMARY KEY (package_name, service_name)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS receiver_info (
+        package_name   TEXT NOT NULL,
+        receiver_name  TEXT NOT NULL,
+        exported       TEXT,
+        permission     TEXT,
+        intent_filters TEXT,
+        PRIMARY KEY (package_name, receiver_name)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS provider_info (
+        package_name          TEXT NOT NULL,
+        provider_name         TEXT NOT NULL,
+        authorities           TEXT,
+        exported              TEXT,
+        permission            TEXT,
+        read_permission       TEXT,
+        write_permission      TEXT,
+        grant_uri_permissions TEXT,
+        intent_filters        TEXT,
+        PRIMARY KEY (package_name, provider_name)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_activity_alias_info_target ON activity_alias_info (package_name, target_activity)",
+    "CREATE INDEX IF NOT EXISTS idx_activity_alias_info_exported ON activity_alias_info (exported, permission)",
+    "CREATE INDEX IF NOT EXISTS idx_service_info_exported ON service_info (exported, permission)",
+    "CREATE INDEX IF NOT EXISTS idx_receiver_info_exported ON receiver_info (exported, permission)",
+    "CREATE INDEX IF NOT EXISTS idx_provider_info_exported ON provider_info (exported, permission)",
+    "CREATE INDEX IF NOT EXISTS idx_provider_info_authorities ON provider_info (authorities)",
+)
+
+# WebViewReachability 的结果，每个 Activity 一行；sink_path 为入口方法到 WebView 加载方法的最短调用链（JSON）
+REACHABILITY_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS activity_reachability (
+    package_name    TEXT NOT NULL,
+    activity_name   TEXT NOT NULL,
+    reaches_webview TEXT NOT NULL,
+    sink_path       TEXT,
+    PRIMARY KEY (package_name, activity_name)
+)
+"""
+
+# CorpusIngestor 分析失败的 APK，每个路径一行（保留最近一次失败）；
+# kind 为 timeout/memory/crash/error，peak_rss_mb 为失败时工作进程的峰值 RSS（可能未知）
+APK_FAILURES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS apk_failures (
+    apk_path    TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    reason      TEXT,
+    peak_rss_mb REAL,
+    attempts    INTEGER NOT NULL DEFAULT 1,
+    failed_at   REAL NOT NULL
+)
+"""
+
+# 每个包最近一次写入 activity_info 及 intent-filter 规范化表时分配的全局递增版本号。
+# IntentFilterIndex 以 (MAX(version), 行数) 为水位判断数据库是否变化，只重读版本号变大的包
+PACKAGE_VERSION_SCHEMA_SQL = (
+    """
+    CREATE TABLE IF NOT EXISTS package_version (
+        package_name TEXT PRIMARY KEY,
+        version      INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_package_version_version ON package_version (version)",
+)
+
+APK_FAILURES_UPSERT_SQL = """
+INSERT INTO apk_failures (apk_path, kind, reason, peak_rss_mb, failed_at) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (apk_path) DO UPDATE SET
+    kind = excluded.kind, reason = excluded.reason, peak_rss_mb = excluded.peak_rss_mb,
+    attempts = attempts + 1, failed_at = excluded.failed_at
+"""
+
+# analyze_components() 中的键 -> (表名, 该组件各列依次取值的字段)
+COMPONENT_TABLES = {
+    "activity_aliases": ("activity_alias_info", ("name", "targetActivity", "exported", "permission")),
+    "services": ("service_info", ("name", "exported", "permission")),
+    "receivers": ("receiver_info", ("name", "exported", "permission")),
+    "providers": ("provider_info", ("name", "authorities", "exported", "permission",
+                                    "readPermission", "writePermission", "grantUriPermissions")),
+}
+
+# 各表的插入语句，键与 build_rows() 返回的 dict 一致
+INSERT_SQL = {
+    "activity_info": ACTIVITY_INSERT_SQL,
+    "intent_filter": "INSERT INTO intent_filter VALUES (?, ?, ?)",
+    "intent_filter_action": "INSERT INTO intent_filter_action VALUES (?, ?, ?, ?)",
+    "intent_filter_category": "INSERT INTO intent_filter_category VALUES (?, ?, ?, ?)",
+    "intent_filter_data": "INSERT INTO intent_filter_data VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "activity_alias_info": "INSERT OR REPLACE INTO activity_alias_info VALUES (?, ?, ?, ?, ?, ?)",
+    "service_info": "INSERT OR REPLACE INTO service_info VALUES (?, ?, ?, ?, ?)",
+    "receiver_info": "INSERT OR REPLACE INTO receiver_info VALUES (?, ?, ?, ?, ?)",
+    "provider_info": "INSERT OR REPLACE INTO provider_info VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "activity_reachability": "INSERT OR REPLACE INTO activity_reachability VALUES (?, ?, ?, ?)",
+}
+
+# 以 (package_name, activity_name) 为键的子表：重新写入某个 Activity 前先删除它的旧行，
+# 与 activity_info 的 INSERT OR REPLACE 语义保持一致
+ACTIVITY_CHILD_TABLES = ("intent_filter", "intent_filter_action", "intent_filter_category", "intent_filter_data")
+
+# create_schema() 建立的表结构版本，记录在数据库的 user_version 中
+SCHEMA_VERSION = 2
+
+# 连接建立后执行的 PRAGMA：WAL 允许读写并发，synchronous=NORMAL 在 WAL 下每次提交不再 fsync
+DB_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA busy_timeout=30000",
+)
+
+
+def connect_db(db_path):
+    """
+    打开数据库连接并应用 DB_PRAGMAS。
+    连接处于 autocommit 模式（isolation_level=None），事务由 transaction() 显式控制。
+    """
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    for pragma in DB_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+# store_activities_in_db 复用的连接，按线程保存：{数据库路径: (连接, 文件标识)}
+_store_connections = threading.local()
+
+
+def _store_connection(db_path):
+    """
+    返回当前线程中 db_path 对应的复用连接（首次使用时建表）。
+    WAL 模式下关闭最后一个连接会触发一次检查点，每个 APK 开关一次连接时它占了写入耗时的一半以上，
+    因此同一线程对同一数据库的连接保持打开；数据库文件被删除或替换（inode 变化）、
+    或处于 fork 出的子进程中时重新连接。
+    """
+    if getattr(_store_connections, "pid", None) != os.getpid():
+        # 不关闭从父进程继承的连接，只是不再使用
+        _store_connections.cache = {}
+        _store_connections.pid = os.getpid()
+    cache = _store_connections.cache
+
+    def identity():
+        try:
+            st = os.stat(db_path)
+        except OSError:
+            return None
+        return st.st_dev, st.st_ino
+
+    conn, ident = cache.get(db_path, (None, None))
+    if conn is not None and identity() == ident:
+        return conn
+    if conn is not None:
+        conn.close()
+    conn = connect_db(db_path)
+    create_schema(conn)
+    cache[db_path] = (conn, identity())
+    return conn
+
+
+def close_store_connections():
+    """
+    关闭当前线程中 store_activities_in_db 复用的全部连接（如需删除或移动数据库文件之前）
+    """
+    for conn, _ in getattr(_store_connections, "cache", {}).values():
+        conn.close()
+    _store_connections.cache = {}
+
+
+@contextmanager
+def transaction(conn):
+    """
+    在 connect_db() 返回的连接上执行一个显式事务：正常退出时提交，出现异常时回滚。
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def create_schema(conn):
+    """
+    创建 activity_info、intent-filter 规范化表及其他组件表（若不存在）。
+    建表完成后把 SCHEMA_VERSION 写入数据库的 user_version，之后的调用只读取这一个值即返回，
+    不再逐条执行 DDL；表结构变化时递增 SCHEMA_VERSION 即可让已有数据库补建新表。
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+    conn.execute(ACTIVITY_TABLE_SQL)
+    conn.execute(REACHABILITY_TABLE_SQL)
+    conn.execute(APK_FAILURES_TABLE_SQL)
+    for sql in INTENT_FILTER_SCHEMA_SQL + COMPONENT_SCHEMA_SQL + PACKAGE_VERSION_SCHEMA_SQL:
+        conn.execute(sql)
+    # 引入 package_version 之前入库的包补一个初始版本号
+    conn.execute("INSERT OR IGNORE INTO package_version SELECT DISTINCT package_name, 1 FROM activity_info")
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def build_rows(package_name, activities_info, components=None, reachability=None):
+    """
+    将 analyze_activities() 的结果（以及可选的 analyze_components() 结果中的其他组件、
+    analyze_webview_reachability() 的结果）转换为各表的行。
+    :return: {表名: [行元组, ...]}，键与 INSERT_SQL 一致
+    """
+    rows = {table: [] for table in INSERT_SQL}
+    for activity in activities_info:
+        activity_name = activity["activityName"]
+        intent_filters = activity["intent_filters"]
+        # 将 intent_filters 转成 JSON 字符串存储
+        intent_filters_json = json.dumps(intent_filters) if intent_filters else None
+        rows["activity_info"].append((
+            package_name,
+            activity_name,
+            activity["exported"],
+            activity["permission"],
+            intent_filters_json
+        ))
+
+        for filter_index, f in enumerate(intent_filters or ()):
+            owner = (package_name, activity_name, filter_index)
+            rows["intent_filter"].append(owner)
+            rows["intent_filter_action"].extend(owner + (action,) for action in f["actions"])
+            rows["intent_filter_category"].extend(owner + (category,) for category in f["categories"])
+            for data_index, data_attrs in enumerate(f["datas"]):
+                values = tuple(data_attrs.get(attr) for attr in DATA_ATTRS)
+                # 没有 <data> 标签时补的空数据不入库
+                if any(v is not None for v in values):
+                    rows["intent_filter_data"].append(owner + (data_index,) + values)
+
+    for key, (table, fields) in COMPONENT_TABLES.items():
+        for component in (components or {}).get(key, ()):
+            intent_filters = component["intent_filters"]
+            rows[table].append(
+                (package_name,)
+                + tuple(component.get(field) for field in fields)
+                + (json.dumps(intent_filters) if intent_filters else None,)
+            )
+
+    for activity_name, reach in (reachability or {}).items():
+        rows["activity_reachability"].append((
+            package_name,
+            activity_name,
+            "true" if reach["reachable"] else "false",
+            json.dumps(reach["path"]) if reach["path"] else None
+        ))
+    return rows
+
+
+def write_rows(conn, rows):
+    """
+    写入 build_rows() 生成的行（不提交事务）。先删除这些 Activity 在子表中的旧行，再批量插入，
+    并为涉及的包分配新的版本号。
+    """
+    keys = [(row[0], row[1]) for row in rows["activity_info"]]
+    for table in ACTIVITY_CHILD_TABLES:
+        conn.executemany(f"DELETE FROM {table} WHERE package_name = ? AND activity_name = ?", keys)
+    for table, sql in INSERT_SQL.items():
+        if rows[table]:
+            conn.executemany(sql, rows[table])
+    bump_package_versions(conn, {package_name for package_name, _ in keys})
+
+
+def bump_package_versions(conn, package_names):
+    """
+    为 package_names 分配比现有版本号都大的新版本号（不提交事务）
+    """
+    package_names = sorted(package_names)
+    if not package_names:
+        return
+    base = conn.execute("SELECT COALESCE(MAX(version), 0) FROM package_version").fetchone()[0]
+    conn.executemany(
+        "INSERT OR REPLACE INTO package_version (package_name, version) VALUES (?, ?)",
+        [(package_name, base + i) for i, package_name in enumerate(package_names, 1)]
+    )
+
+
+def save_activities(conn, package_name, activities_info, components=None, reachability=None):
+    """
+    将 analyze_activities() 的结果写入 activity_info 及 intent-filter 规范化表（不提交事务）。
+    指定 components 时同时写入其中 activity-alias/service/receiver/provider 对应的组件表，
+    指定 reachability 时同时写入 activity_reachability 表。
+    若表不存在就创建；若有重复键则替换（INSERT OR REPLACE）。
+    """
+    create_schema(conn)
+    write_rows(conn, build_rows(package_name, activities_info, components, reachability))
+
+
+def save_apk_failures(conn, failures, succeeded=()):
+    """
+    记录分析失败的 APK 到 apk_failures 表，并删除本次已成功分析的 APK 的旧失败记录（不提交事务）。
+    :param failures: [(apk_path, kind, reason, peak_rss_mb), ...]
+    :param succeeded: 本次分析成功的 APK 路径
+    """
+    conn.execute(APK_FAILURES_TABLE_SQL)
+    conn.executemany("DELETE FROM apk_failures WHERE apk_path = ?", [(path,) for path in succeeded])
+    now = time.time()
+    conn.executemany(APK_FAILURES_UPSERT_SQL, [failure + (now,) for failure in failures])
+
+
+def rebuild_intent_filter_tables(db_path='./all.db'):
+    """
+    由 activity_info.intent_filters 中已有的 JSON 重新生成 intent-filter 规范化表，
+    用于在引入这些表之前入库的数据库。
+    :return: 处理的 Activity 数量
+    """
+    conn = connect_db(db_path)
+    try:
+        create_schema(conn)
+        with transaction(conn):
+            for table in ACTIVITY_CHILD_TABLES:
+                conn.execute(f"DELETE FROM {table}")
+            count = 0
+            rows = conn.execute("SELECT package_name, activity_name, intent_filters FROM activity_info")
+            for package_name, activity_name, intent_filters_json in rows:
+                activity = {
+                    "activityName": activity_name,
+                    "exported": None,
+                    "permission": None,
+                    "intent_filters": json.loads(intent_filters_json) if intent_filters_json else None,
+                }
+                child_rows = build_rows(package_name, [activity])
+                for table in ACTIVITY_CHILD_TABLES:
+                    if child_rows[table]:
+                        conn.executemany(INSERT_SQL[table], child_rows[table])
+                count += 1
+            bump_package_versions(conn, [row[0] for row in conn.execute(
+                "SELECT DISTINCT package_name FROM activity_info")])
+        return count
+    finally:
+        conn.close()
+
+
+class ActivityDBWriter:
+    """
+    activity_info、intent-filter 规范化表及其他组件表的批量写入器。
+      - 任意线程通过 add() 提交结果，放入有界队列
+      - 唯一的后台写线程从队列取数据，积累到 batch_size 行或距上次提交超过 flush_interval 秒时，
+        在一个显式事务中用 executemany 一次写入
+      - 连接开启 WAL 与 DB_PRAGMAS 中的调优参数
+    用法：
+        with ActivityDBWriter('./all.db') as writer:
+            writer.add(package_name, activities_info)
+    """
+
+    _STOP = object()
+
+    def __init__(self, db_path='./all.db', batch_size=5000, flush_interval=1.0, queue_size=1024):
+        """
+        :param db_path: 数据库路径
+        :param batch_size: 每个事务最多写入的行数（各表合计）
+        :param flush_interval: 队列中有数据时，最长多少秒提交一次
+        :param queue_size: 待写入队列的容量（按 add() 调用计），队满时 add() 阻塞以形成背压
         """
-        cursor.execute(create_table_sql)
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.rows_written = 0
+        self.error = None
+        self._thread = None
 
-        # 插入或替换数据
-        insert_sql = """
-        INSERT OR REPLACE INTO activity_info 
-            (package_name, activity_name, exported, permission, intent_filters)
-        VALUES 
-            (?, ?, ?, ?, ?)
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ActivityDBWriter", daemon=True)
+            self._thread.start()
+        return self
+
+    def add(self, package_name, activities_info, components=None, reachability=None):
+        """
+        提交一个包的 analyze_activities() 结果（及可选的 analyze_components()、analyze_webview_reachability() 结果），
+        可在任意线程调用
         """
+        if self.error is not None:
+            raise RuntimeError("ActivityDBWriter 写线程已异常退出") from self.error
+        self.queue.put((package_name, build_rows(package_name, activities_info, components, reachability)))
 
-        for activity in activities_info:
-            # 将 intent_filters 转成 JSON 字符串存储
-            # 如果你不需要存储 intent_filters，可以去掉
-            intent_filters_json = json.dumps(activity["intent_filters"]) if activity["intent_filters"] else None
+    def close(self):
+        """
+        写入队列中剩余的数据并结束写线程
+        """
+        if self._thread is not None:
+            self.queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+        if self.error is not None:
+            raise RuntimeError("ActivityDBWriter 写入失败") from self.error
 
-            cursor.execute(insert_sql, (
-                self.package_name,
-                activity["activityName"],
-                activity["exported"],
-                activity["permission"],
-                intent_filters_json
-            ))
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        conn = connect_db(self.db_path)
+        try:
+            create_schema(conn)
+            # 同一批次中同一个包出现多次时（如同一 APK 的不同副本）只保留最后一次结果
+            pending = {}
+            pending_count = 0
+            deadline = None
+            stopping = False
+            while not stopping:
+                timeout = None if deadline is None else max(0, deadline - time.monotonic())
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is self._STOP:
+                    stopping = True
+                elif item is not None:
+                    package_name, rows = item
+                    replaced = pending.pop(package_name, None)
+                    if replaced is not None:
+                        pending_count -= sum(len(r) for r in replaced.values())
+                    pending[package_name] = rows
+                    pending_count += sum(len(r) for r in rows.values())
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+
+                if pending and (stopping or pending_count >= self.batch_size or time.monotonic() >= deadline):
+                    self._write(conn, pending.values())
+                    pending = {}
+                    pending_count = 0
+                    deadline = None
+        except BaseException as e:
+            self.error = e
+            # 让阻塞在 put() 上的生产者得以继续，随后在 add() 中看到异常
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+        finally:
+            conn.close()
+
+    def _write(self, conn, batches):
+        rows = {table: [] for table in INSERT_SQL}
+        for batch in batches:
+            for table, table_rows in batch.items():
+                rows[table].extend(table_rows)
+        with transaction(conn):
+            write_rows(conn, rows)
+        self.rows_written += len(rows["activity_info"])
+
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError("APK 分析超时")
+
+
+def _ingest_worker(apk_path, timeout, cache_path=None, cache_max_bytes=None, reachability=False):
+    """
+    进程池中执行的单个 APK 分析任务，返回 (package_name, components, reach)，components 为 analyze_components() 的结果，
+    reach 为 analyze_webview_reachability() 的结果（reachability=False 时为 None，此时不做 DEX 分析）。
+    通过 SIGALRM 在工作进程内部限制分析时长，超时抛出 TimeoutError。
+    指定 cache_path 时先按文件 SHA-256 查询 AnalysisCache，命中则不解析 APK。
+    """
+    use_alarm = timeout and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.alarm(max(1, int(math.ceil(timeout))))
+    cache = AnalysisCache(cache_path, max_bytes=cache_max_bytes) if cache_path else None
+    try:
+        # 已在进程池中，安装包的 split 在本进程中依次解析
+        analyzer = AppAnalyzer(apk_path, manifest_only=True, cache=cache, split_workers=1)
+        components = analyzer.analyze_components()
+        reach = analyzer.analyze_webview_reachability() if reachability else None
+        analyzer.release()
+        return analyzer.package_name, components, reach
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+        if cache is not None:
+            cache.close()
+
+
+def _peak_rss_mb():
+    """
+    当前进程的峰值 RSS（MB）；不支持 resource 模块的平台返回 None
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 下 ru_maxrss 单位为 KB，macOS 下为字节
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def _process_peak_rss_mb(pid):
+    """
+    从 /proc/<pid>/status 读取其他进程的峰值 RSS（VmHWM，MB）；无法读取时返回 None
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _isolated_worker(conn, memory_limit_mb, max_jobs, rss_high_water_mb, timeout, cache_path, cache_max_bytes,
+                     reachability):
+    """
+    IsolatedWorkerPool 的工作进程主循环：逐个接收 APK 路径（None 表示退出），执行 _ingest_worker 后回复
+    (status, payload, peak_rss_mb, retire)。status 为 ok 时 payload 为 _ingest_worker 的返回值，
+    否则 status 为 timeout/memory/error，payload 为失败原因；retire 为 True 表示本进程回复后即退出。
+    """
+    if memory_limit_mb:
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    jobs = 0
+    while True:
+        apk_path = conn.recv()
+        if apk_path is None:
+            break
+        retire = False
+        try:
+            status, payload = "ok", _ingest_worker(apk_path, timeout, cache_path, cache_max_bytes, reachability)
+        except MemoryError:
+            # 分配失败后堆已高度碎片化，继续使用只会更早触顶
+            status, payload, retire = "memory", f"内存超限（RLIMIT_AS={memory_limit_mb}MB）", True
+        except TimeoutError:
+            status, payload = "timeout", "超时"
+        except Exception as e:
+            status, payload = "error", repr(e)
+        # androguard 的对象间存在大量循环引用，及时回收
+        gc.collect()
+
+        jobs += 1
+        peak = _peak_rss_mb()
+        if max_jobs and jobs >= max_jobs:
+            retire = True
+        if rss_high_water_mb and peak is not None and peak >= rss_high_water_mb:
+            retire = True
+        conn.send((status, payload, peak, retire))
+        if retire:
+            break
+    conn.close()
+
+
+class IsolatedWorkerPool:
+    """
+    在受资源限制的独立工作进程中逐个分析 APK，使每个核的内存占用可预测。
+      - 工作进程启动时设置 RLIMIT_AS（地址空间上限），超限时分配失败抛出 MemoryError，记为 memory 失败
+      - 每个工作进程同时只执行一个任务：超时后主进程只强制结束该进程，崩溃（包括被系统 OOM killer 结束）
+        也能准确定位到对应的 APK，不影响其他在途任务
+      - 工作进程完成 max_jobs 个任务、峰值 RSS 超过 rss_high_water_mb 或发生 MemoryError 后退出，由主进程补充新进程
+      - 工作进程由 forkserver 派生（预先导入 PRELOAD），不继承主进程的内存与数据库连接
+    注意 RLIMIT_AS 限制的是虚拟地址空间，需比期望的 RSS 上限留出余量（解释器与 androguard 本身约占数百 MB）。
+    """
+
+    # 工作进程内超时未生效时（如卡在 C 扩展中），主进程额外等待的秒数
+    KILL_GRACE = 10
+    # forkserver 预先导入的模块，工作进程 fork 后无需重复导入
+    PRELOAD = ["androguard.core.apk", "androguard.misc"]
+
+    def __init__(self, workers=None, timeout=600, memory_limit_mb=None, max_jobs=None, rss_high_water_mb=None,
+                 cache_path=None, cache_max_bytes=None, reachability=False):
+        """
+        :param workers: 工作进程数，默认为 CPU 核数
+        :param timeout: 单个 APK 的分析超时（秒），None 或 0 表示不限制
+        :param memory_limit_mb: 每个工作进程的地址空间上限（MB），None 表示不限制
+        :param max_jobs: 每个工作进程最多执行的任务数，None 表示不限制
+        :param rss_high_water_mb: 工作进程峰值 RSS 超过该值（MB）后退出，None 表示不限制
+        :param cache_path: AnalysisCache 数据库路径，None 表示不使用缓存
+        :param cache_max_bytes: 缓存大小上限，见 AnalysisCache
+        :param reachability: 为 True 时额外做 DEX 分析，见 _ingest_worker
+        """
+        import multiprocessing
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.worker_args = (memory_limit_mb, max_jobs, rss_high_water_mb, timeout, cache_path, cache_max_bytes,
+                            reachability)
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._ctx = multiprocessing.get_context("forkserver")
+            self._ctx.set_forkserver_preload(self.PRELOAD)
+        else:
+            self._ctx = multiprocessing.get_context("spawn")
+        self.spawned = 0
+
+    def run(self, apk_paths, on_result, on_failure):
+        """
+        分析 apk_paths 中的所有 APK。
+        :param on_result: on_result(apk_path, package_name, components, reach)
+        :param on_failure: on_failure(apk_path, kind, reason, peak_rss_mb)，kind 为 timeout/memory/crash/error
+        """
+        from multiprocessing.connection import wait as wait_connections
+
+        pending = deque(apk_paths)
+        workers = [self._spawn() for _ in range(min(self.workers, len(pending)))]
+        try:
+            while True:
+                for worker in workers:
+                    if worker["apk_path"] is None and not worker["retire"] and pending:
+                        self._submit(worker, pending.popleft())
+                busy = [w for w in workers if w["apk_path"] is not None]
+                if not busy:
+                    break
+
+                deadlines = [w["deadline"] for w in busy if w["deadline"] is not None]
+                wait_timeout = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+                ready = wait_connections([w["conn"] for w in busy], timeout=wait_timeout)
+
+                now = time.monotonic()
+                for worker in busy:
+                    if worker["conn"] in ready:
+                        self._collect(worker, on_result, on_failure)
+                    elif worker["deadline"] is not None and worker["deadline"] <= now:
+                        # 硬超时：只结束这一个工作进程
+                        peak = _process_peak_rss_mb(worker["proc"].pid)
+                        worker["proc"].kill()
+                        on_failure(worker["apk_path"], "timeout", "超时（强制结束）", peak)
+                        worker["apk_path"] = None
+                        worker["retire"] = True
+
+                for i, worker in enumerate(workers):
+                    if worker["retire"]:
+                        self._reap(worker)
+                        workers[i] = self._spawn() if pending else None
+                workers = [w for w in workers if w is not None]
+        finally:
+            for worker in workers:
+                self._reap(worker)
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_isolated_worker, args=(child_conn,) + self.worker_args, daemon=True)
+        proc.start()
+        # 关闭主进程中的子端，工作进程退出后 parent_conn 才能读到 EOF
+        child_conn.close()
+        self.spawned += 1
+        return {"proc": proc, "conn": parent_conn, "apk_path": None, "deadline": None, "retire": False}
+
+    def _submit(self, worker, apk_path):
+        worker["conn"].send(apk_path)
+        worker["apk_path"] = apk_path
+        worker["deadline"] = time.monotonic() + self.timeout + self.KILL_GRACE if self.timeout else None
+
+    def _collect(self, worker, on_result, on_failure):
+        apk_path = worker["apk_path"]
+        worker["apk_path"] = None
+        try:
+            status, payload, peak, retire = worker["conn"].recv()
+        except (EOFError, OSError):
+            # 工作进程未回复就退出了
+            worker["proc"].join()
+            code = worker["proc"].exitcode
+            if code == -signal.SIGKILL:
+                # 主进程只会结束已超时的工作进程，此处的 SIGKILL 通常来自系统 OOM killer
+                on_failure(apk_path, "memory", "工作进程被 SIGKILL 结束（通常为系统 OOM killer）", None)
+            else:
+                on_failure(apk_path, "crash", f"工作进程崩溃（exitcode={code}）", None)
+            worker["retire"] = True
+            return
+        if status == "ok":
+            on_result(apk_path, *payload)
+        else:
+            on_failure(apk_path, status, payload, peak)
+        worker["retire"] = retire
+
+    @staticmethod
+    def _reap(worker):
+        proc = worker["proc"]
+        if proc.is_alive() and not worker["retire"]:
+            try:
+                worker["conn"].send(None)
+            except OSError:
+                pass
+        proc.join(timeout=5)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+        worker["conn"].close()
+
+
+def _report_worker_pid(pid_queue):
+    pid_queue.put(os.getpid())
+
+
+class WorkerPids:
+    """
+    记录 ProcessPoolExecutor 工作进程的 pid：作为进程池的 initializer，每个工作进程启动时上报自己的 os.getpid()。
+    主进程需要强制结束进程池（硬超时）时据此 kill 工作进程，不依赖 ProcessPoolExecutor 的私有属性。
+    用法：
+        pids = WorkerPids()
+        pool = ProcessPoolExecutor(max_workers=4, **pids.pool_kwargs())
+        ...
+        CorpusIngestor._kill_pool(pool, pids)
+    """
+
+    def __init__(self, mp_context=None):
+        """
+        :param mp_context: 进程池使用的 multiprocessing 上下文，None 表示默认上下文
+        """
+        import multiprocessing
+        self._queue = (mp_context or multiprocessing.get_context()).SimpleQueue()
+        self.pids = set()
+
+    def pool_kwargs(self):
+        """
+        创建 ProcessPoolExecutor 时需要传入的 initializer/initargs
+        """
+        return {"initializer": _report_worker_pid, "initargs": (self._queue,)}
+
+    def collect(self):
+        """
+        读取已上报的 pid，返回迄今启动过的全部工作进程 pid
+        """
+        while not self._queue.empty():
+            self.pids.add(self._queue.get())
+        return self.pids
+
+    def kill(self):
+        for pid in self.collect():
+            try:
+                os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+            except OSError:
+                # 工作进程已经退出
+                pass
+        self.pids = set()
+
+
+class CorpusIngestor:
+    """
+    批量分析整个 APK 语料并写入 activity_info。
+      - 使用 ProcessPoolExecutor 在多个进程中并行执行 AppAnalyzer（manifest_only 模式）
+      - 每个 APK 有独立的超时：工作进程内用 SIGALRM 中断，若仍未返回则由主进程强制结束进程池
+      - 工作进程崩溃导致进程池损坏时，重建进程池；受影响的 APK 逐个单独重试以定位真正的崩溃者
+      - isolated=True 时改用 IsolatedWorkerPool：每个工作进程有地址空间上限与独立的超时，并按任务数/峰值 RSS 回收
+      - 所有结果只由主进程中的唯一一个 ActivityDBWriter 批量写入；失败的 APK 记录到 apk_failures 表
+    """
+
+    # 工作进程内超时未生效时（如卡在 C 扩展中），主进程额外等待的秒数
+    KILL_GRACE = 10
+
+    def __init__(self, db_path='./all.db', workers=None, timeout=600, cache_path=None, cache_max_bytes=None,
+                 reachability=False, isolated=False, memory_limit_mb=None, max_jobs_per_worker=None,
+                 rss_high_water_mb=None):
+        """
+        :param db_path: 结果数据库路径
+        :param workers: 工作进程数，默认为 CPU 核数
+        :param timeout: 单个 APK 的分析超时（秒），None 或 0 表示不限制
+        :param cache_path: AnalysisCache 数据库路径，None 表示不使用缓存
+        :param cache_max_bytes: 缓存大小上限，见 AnalysisCache
+        :param reachability: 为 True 时额外做 DEX 分析，写入 WebViewReachability 结果（明显更慢）
+        :param isolated: 为 True 时使用 IsolatedWorkerPool，以下三个参数只在此模式下生效
+        :param memory_limit_mb: 每个工作进程的地址空间上限（MB）
+        :param max_jobs_per_worker: 每个工作进程最多分析的 APK 数
+        :param rss_high_water_mb: 工作进程峰值 RSS 超过该值（MB）后回收
+        """
+        self.db_path = db_path
+        self.reachability = reachability
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.cache_max_bytes = cache_max_bytes
+        self.isolated = isolated
+        self.memory_limit_mb = memory_limit_mb
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.rss_high_water_mb = rss_high_water_mb
+        self.failures = []  # [(apk_path, kind, reason, peak_rss_mb), ...]
+
+    @staticmethod
+    def collect_apk_paths(inputs):
+        """
+        展开输入路径：
+          - 目录：递归收集其中所有 .apk/.xapk/.apks 文件；split 目录（见 ApkBundle）整体作为一个安装包
+          - .apk/.xapk/.apks 文件：直接加入
+          - 其他文件：视为 APK 路径列表文件，每行一个路径（忽略空行与 # 注释）
+        返回去重后的路径列表（保持输入顺序）。
+        """
+        extensions = (".apk",) + ApkBundle.EXTENSIONS
+        apk_paths = []
+        for item in inputs:
+            if os.path.isdir(item):
+                for root, dirs, files in os.walk(item):
+                    if ApkBundle.is_split_dir(root):
+                        apk_paths.append(root)
+                        dirs[:] = []
+                        continue
+                    dirs.sort()
+                    for name in sorted(files):
+                        if name.lower().endswith(extensions):
+                            apk_paths.append(os.path.join(root, name))
+            elif item.lower().endswith(extensions):
+                apk_paths.append(item)
+            else:
+                with open(item, encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if line and not line.startswith("#"):
+                            apk_paths.append(line)
+        return list(dict.fromkeys(apk_paths))
+
+    def ingest(self, inputs):
+        """
+        分析 inputs 中的所有 APK 并入库。
+        :return: 统计信息 dict：{"total", "ok", "failed", "activities", "seconds"}，isolated 模式下另有 "workers_spawned"
+        """
+        apk_paths = self.collect_apk_paths(inputs)
+        self.failures = []
+        stats = {"total": len(apk_paths), "ok": 0, "failed": 0, "activities": 0, "seconds": 0.0}
+        start = time.perf_counter()
+
+        writer = ActivityDBWriter(self.db_path).start()
+        succeeded = []
+
+        def on_result(apk_path, package_name, components, reach):
+            activities_info = AppAnalyzer.activities_from_components(components)
+            writer.add(package_name, activities_info, components, reach)
+            succeeded.append(apk_path)
+            stats["ok"] += 1
+            stats["activities"] += len(activities_info)
+            print(f"[+] {package_name}: {len(activities_info)} 个 Activity ({apk_path})")
+
+        try:
+            if self.isolated:
+                pool = IsolatedWorkerPool(
+                    workers=self.workers,
+                    timeout=self.timeout,
+                    memory_limit_mb=self.memory_limit_mb,
+                    max_jobs=self.max_jobs_per_worker,
+                    rss_high_water_mb=self.rss_high_water_mb,
+                    cache_path=self.cache_path,
+                    cache_max_bytes=self.cache_max_bytes,
+                    reachability=self.reachability
+                )
+                pool.run(apk_paths, on_result, self._record_failure)
+                stats["workers_spawned"] = pool.spawned
+            else:
+                pending = deque(apk_paths)
+                while pending:
+                    broken = self._run_pool(pending, self.workers, on_result)
+                    # 进程池崩溃时无法确定是哪个 APK 导致的，逐个单独重试
+                    for apk_path in broken:
+                        if self._run_pool(deque([apk_path]), 1, on_result):
+                            self._record_failure(apk_path, "crash", "工作进程崩溃")
+        finally:
+            writer.close()
+            conn = connect_db(self.db_path)
+            try:
+                with transaction(conn):
+                    save_apk_failures(conn, self.failures, succeeded)
+            finally:
+                conn.close()
+
+        stats["failed"] = len(self.failures)
+        stats["seconds"] = time.perf_counter() - start
+        return stats
+
+    def _run_pool(self, pending, max_in_flight, on_result):
+        """
+        在一个进程池中消费 pending，直到其为空或进程池不可用。
+        同时在途的任务数不超过 max_in_flight，使得提交时间即开始执行时间，便于判断硬超时。
+        :return: 因进程池损坏而未完成的 APK 路径列表
+        """
+        # concurrent.futures.process 会连带导入 multiprocessing，只在批量分析时才需要
+        from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+        from concurrent.futures.process import BrokenProcessPool
+
+        broken = []
+        in_flight = {}  # future -> (apk_path, deadline)
+        worker_pids = WorkerPids()
+        with ProcessPoolExecutor(max_workers=max_in_flight, **worker_pids.pool_kwargs()) as pool:
+            while pending or in_flight:
+                while pending and not broken and len(in_flight) < max_in_flight:
+                    apk_path = pending.popleft()
+                    try:
+                        future = pool.submit(_ingest_worker, apk_path, self.timeout,
+                                             self.cache_path, self.cache_max_bytes, self.reachability)
+                    except BrokenProcessPool:
+                        broken.append(apk_path)
+                        break
+                    deadline = time.monotonic() + self.timeout + self.KILL_GRACE if self.timeout else None
+                    in_flight[future] = (apk_path, deadline)
+
+                if not in_flight:
+                    break
+
+                deadlines = [d for _, d in in_flight.values() if d is not None]
+                wait_timeout = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+                done, _ = wait(in_flight, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+
+                if not done:
+                    # 硬超时：强制结束进程池，超时的 APK 记为失败，其余在途任务放回队列
+                    now = time.monotonic()
+                    for future, (apk_path, deadline) in in_flight.items():
+                        if deadline is not None and deadline <= now:
+                            self._record_failure(apk_path, "timeout", "超时（强制结束）")
+                        else:
+                            pending.appendleft(apk_path)
+                    self._kill_pool(pool, worker_pids)
+                    return broken
+
+                for future in done:
+                    apk_path, _ = in_flight.pop(future)
+                    try:
+                        package_name, components, reach = future.result()
+                    except BrokenProcessPool:
+                        broken.append(apk_path)
+                        continue
+                    except TimeoutError:
+                        self._record_failure(apk_path, "timeout", "超时")
+                        continue
+                    except MemoryError:
+                        self._record_failure(apk_path, "memory", "内存不足")
+                        continue
+                    except Exception as e:
+                        self._record_failure(apk_path, "error", repr(e))
+                        continue
+                    on_result(apk_path, package_name, components, reach)
+
+                if broken and not in_flight:
+                    return broken
+
+        return broken
+
+    @staticmethod
+    def _kill_pool(pool, worker_pids):
+        """
+        强制结束进程池：kill worker_pids（WorkerPids）记录的全部工作进程，再关闭进程池
+        """
+        worker_pids.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _record_failure(self, apk_path, kind, reason, peak_rss_mb=None):
+        self.failures.append((apk_path, kind, reason, peak_rss_mb))
+        peak = f"，峰值 RSS {peak_rss_mb:.0f}MB" if peak_rss_mb is not None else ""
+        print(f"[!] 分析失败: {apk_path}: {reason}{peak}")
 
-        # 提交更改并关闭连接
-        conn.commit()
-        conn.close()
 
 class AttackSurfaceInspector:
     """
     从all.db中获取相关数据后分析。并插入分析结果。
     """
-    def __init__(self, package_name):
-        self.db_path = './all.db'
+
+    # 集合式分类第一步：批量查出每个 activity 所用权限的保护级别
+    SET_BASED_PROT_LEVEL_SQL = """
+    UPDATE activity_info
+    SET prot_level = {prot_level_expr}
+    {where}
+    """
+
+    # 集合式分类第二步：按 activity_inspector 中的规则一次性计算三列。
+    # SET 右侧引用的 prot_level 均为第一步写入的值
+    SET_BASED_CLASSIFY_SQL = """
+    UPDATE activity_info
+    SET is_attack_surface = CASE
+            WHEN lower(exported) = 'true'
+                 AND (permission IS NULL OR trim(permission) = ''
+                      OR prot_level IS NULL OR instr(lower(prot_level), 'normal') > 0)
+            THEN 'true' ELSE 'false' END,
+        used_free_permission = CASE
+            WHEN lower(exported) = 'true'
+                 AND permission IS NOT NULL AND trim(permission) != ''
+                 AND prot_level IS NULL
+            THEN 'true' ELSE 'false' END,
+        prot_level = CASE
+            WHEN lower(exported) = 'true' AND (permission IS NULL OR trim(permission) = '')
+            THEN NULL ELSE prot_level END
+    {where}
+    """
+
+    def __init__(self, package_name=None, db_path='./all.db'):
+        """
+        :param package_name: 待分析的包名。集合式分类下为 None 表示分析整个数据库
+        :param db_path: 数据库路径
+        """
+        self.db_path = db_path
         self.package_name = package_name
 
-    def activity_inspector(self):
+    def activity_inspector(self, set_based=False):
         '''
         从 activity_info 表中读取 self.package_name 的 activity 信息。然后分析各个活动是否是攻击面。
         1. 在 activity_info 中的列 is_attack_surface (如果不存在则新建此列)记录分析结果。
@@ -234,7 +1879,18 @@ class AttackSurfaceInspector:
         如果一个 activity 满足下面所有条件，则它是攻击面（第三方普通应用无条件调用该 Activity）：
             1. android:exported="true"（明确允许导出。在 Android 12+ 中，如果存在 <intent-filter> ，则必须显式声明是否导出。所以这里不再考虑未设置 exported 属性的隐式调用情况）
             2. 权限设置允许调用：要么没有设置 android:permission，要么设置的权限是普通（normal）级别，要么设置的权限不存在（游离权限）
+
+        :param set_based: 为 True 时用两条 UPDATE 语句在数据库内完成整个包（或整个数据库）的分类，
+                          activity_info 与带索引的 permission_info 关联查询，不再逐行查询、逐行更新
         '''
+        if set_based:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                self._classify_set_based(conn)
+            finally:
+                conn.close()
+            return
+
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
@@ -253,36 +1909,15 @@ class AttackSurfaceInspector:
         for row in rows:
             package_name, activity_name, exported, permission = row
 
-            # 默认分析结果
-            is_attack_surface = "false"
-            prot_level_result = None
-            used_free_permission = "false"
-
             # 获取该权限的保护级别
             perm_level = self._check_permission(permission)
-
-            # 判断条件1：必须明确导出
-            if exported is not None and exported.lower() == "true":
-                # 判断条件2：权限允许调用
-                if permission is None or permission.strip() == "":
-                    # 未设置权限，允许调用
-                    is_attack_surface = "true"
-                    used_free_permission = "false"
-
-                else:
-                    if perm_level is None:
-                        # 权限未在 permission_info 中找到，视为游离权限
-                        is_attack_surface = "true"
-                        used_free_permission = "true"
-                    elif "normal" in perm_level.lower():
-                        is_attack_surface = "true"
-                        prot_level_result = perm_level
-                    else:
-                        # 权限保护级别不为 normal ，则不允许第三方调用
-                        prot_level_result = perm_level
-            else:
-                prot_level_result = self._check_permission(permission)
-
+            is_attack, used_free = self.classify(exported, permission, perm_level)
+            is_attack_surface = "true" if is_attack else "false"
+            used_free_permission = "true" if used_free else "false"
+            # 导出且未设置权限时不记录保护级别
+            exported_without_permission = (exported is not None and exported.lower() == "true"
+                                           and (permission is None or permission.strip() == ""))
+            prot_level_result = None if exported_without_permission else perm_level
 
             # 更新数据库中对应的记录
             update_sql = """
@@ -303,13 +1938,182 @@ class AttackSurfaceInspector:
         conn.commit()
         conn.close()
 
+    @staticmethod
+    def classify(exported, permission, prot_level):
+        """
+        单个 Activity 的攻击面判定，规则同 activity_inspector() 与 SET_BASED_CLASSIFY_SQL，不读写数据库：
+        导出，且未设置权限、权限为 normal 级别或权限不存在（游离权限）时为攻击面。
+        :param prot_level: permission 在 permission_info 中的保护级别，未找到时为 None
+        :return: (is_attack_surface, used_free_permission)
+        """
+        if exported is None or exported.lower() != "true":
+            return False, False
+        if permission is None or permission.strip() == "":
+            return True, False
+        if prot_level is None:
+            return True, True
+        return "normal" in prot_level.lower(), False
+
+    def prot_levels(self, permissions):
+        """
+        一次查询 permission_info 中各权限的保护级别，返回 {权限名: prot_level}。
+        数据库或 permission_info 表不存在时返回空 dict（全部视为游离权限，与 _check_permission 一致）
+        """
+        names = sorted({p for p in permissions if p})
+        if not names or not os.path.exists(self.db_path):
+            return {}
+        conn = sqlite3.connect(self.db_path)
+        try:
+            if not self._has_table(conn, "permission_info"):
+                return {}
+            placeholders = ", ".join("?" * len(names))
+            return dict(conn.execute(
+                f"SELECT permission_name, prot_level FROM permission_info WHERE permission_name IN ({placeholders})",
+                names
+            ))
+        finally:
+            conn.close()
+
+    def inspect_corpus(self, only_changed=False, chunk_size=500, progress=None):
+        """
+        在一个连接中对整个数据库的所有包做集合式分类（忽略 self.package_name）。
+        每个包的输入指纹（各 activity 的 exported、permission 以及该权限在 permission_info 中的保护级别）
+        记录在 inspection_state 表中；only_changed=True 时只重新分类指纹发生变化、从未分类过，
+        或存在未分类行（重新入库后结果列为 NULL）的包，因此 permission_info 更新后只有真正受影响的包会被重新分类。
+        :param only_changed: 是否只分类输入发生变化的包
+        :param chunk_size: 每条 UPDATE 覆盖的包数量，每批提交一次
+        :param progress: 回调 progress(stats)，每批完成后调用；默认打印进度与吞吐
+        :return: 统计信息 dict：{"packages", "classified", "rows", "seconds", "rows_per_sec"}
+        """
+        if progress is None:
+            progress = self._print_progress
+
+        start = time.perf_counter()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            prot_level_expr = self._prepare_set_based(conn)
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS inspection_state (
+                package_name TEXT PRIMARY KEY,
+                input_digest TEXT NOT NULL,
+                inspected_at REAL NOT NULL
+            )
+            """)
+
+            digests = self._package_digests(conn, prot_level_expr)
+            if only_changed:
+                previous = dict(conn.execute("SELECT package_name, input_digest FROM inspection_state"))
+                # 重新入库（INSERT OR REPLACE）会把结果列重置为 NULL 而指纹不变，这些包同样需要重新分类
+                unclassified = {pkg for (pkg,) in conn.execute(
+                    "SELECT DISTINCT package_name FROM activity_info WHERE is_attack_surface IS NULL")}
+                targets = [pkg for pkg, digest in digests.items()
+                           if previous.get(pkg) != digest or pkg in unclassified]
+            else:
+                targets = list(digests)
+
+            stats = {"packages": len(digests), "classified": 0, "rows": 0, "seconds": 0.0, "rows_per_sec": 0.0}
+            for i in range(0, len(targets), chunk_size):
+                chunk = targets[i:i + chunk_size]
+                where = f"WHERE package_name IN ({', '.join('?' * len(chunk))})"
+                stats["rows"] += self._classify_where(conn, prot_level_expr, where, chunk)
+                now = time.time()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO inspection_state (package_name, input_digest, inspected_at) VALUES (?, ?, ?)",
+                    [(pkg, digests[pkg], now) for pkg in chunk]
+                )
+                conn.commit()
+
+                stats["classified"] += len(chunk)
+                stats["seconds"] = time.perf_counter() - start
+                stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+                progress(dict(stats, targets=len(targets)))
+
+            stats["seconds"] = time.perf_counter() - start
+            stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+            return stats
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _print_progress(stats):
+        print(f"[*] 已分类 {stats['classified']}/{stats['targets']} 个包，"
+              f"{stats['rows']} 个 Activity，{stats['rows_per_sec']:.0f} 行/秒")
+
+    @staticmethod
+    def _package_digests(conn, prot_level_expr):
+        """
+        一次扫描 activity_info，计算每个包的分类输入指纹
+        :return: {package_name: sha1 十六进制}
+        """
+        digests = {}
+        current, h = None, None
+        rows = conn.execute(f"""
+        SELECT package_name, activity_name, exported, permission, {prot_level_expr}
+        FROM activity_info
+        ORDER BY package_name, activity_name
+        """)
+        for package_name, activity_name, exported, permission, prot_level in rows:
+            if package_name != current:
+                if current is not None:
+                    digests[current] = h.hexdigest()
+                current, h = package_name, hashlib.sha1()
+            h.update(json.dumps([activity_name, exported, permission, prot_level]).encode("utf-8"))
+        if current is not None:
+            digests[current] = h.hexdigest()
+        return digests
+
+    def _classify_set_based(self, conn):
+        """
+        集合式分类：self.package_name 为 None 时分类整个数据库，否则只分类该包。
+        permission_info 表不存在时所有权限均视为游离权限（与 _check_permission 的行为一致）。
+        """
+        prot_level_expr = self._prepare_set_based(conn)
+
+        if self.package_name is None:
+            where, params = "", ()
+        else:
+            where, params = "WHERE package_name = ?", (self.package_name,)
+
+        rowcount = self._classify_where(conn, prot_level_expr, where, params)
+        conn.commit()
+        return rowcount
+
+    def _prepare_set_based(self, conn):
+        """
+        新增结果列、为 permission_info 建索引。
+        :return: 在 activity_info 上下文中查询保护级别的 SQL 表达式
+        """
+        self._insert_column(conn, "activity_info", ["is_attack_surface", "prot_level", "used_free_permission"])
+
+        if not self._has_table(conn, "permission_info"):
+            return "NULL"
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_permission_info_name ON permission_info (permission_name)")
+        return """(
+            SELECT p.prot_level FROM permission_info p
+            WHERE p.permission_name = activity_info.permission
+            LIMIT 1
+        )"""
+
+    def _classify_where(self, conn, prot_level_expr, where, params):
+        cursor = conn.cursor()
+        cursor.execute(self.SET_BASED_PROT_LEVEL_SQL.format(prot_level_expr=prot_level_expr, where=where), params)
+        cursor.execute(self.SET_BASED_CLASSIFY_SQL.format(where=where), params)
+        return cursor.rowcount
+
+    @staticmethod
+    def _has_table(conn, table_name):
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+        ).fetchone()
+        return row is not None
+
     def _insert_column(self, conn, table_name, column_names, column_type="TEXT"):
         """
         检查 table_name 表是否存在 column 列，
         若不存在则通过 ALTER TABLE 添加。
         """
         cursor = conn.cursor()
-        cursor.execute(f"PRAGMA table_info{table_name}")
+        cursor.execute(f"PRAGMA table_info({table_name})")
         existing_columns = [row[1] for row in cursor.fetchall()]  # row[1] 是列名
         for column_name in column_names:
             if column_name not in existing_columns:
@@ -337,6 +2141,393 @@ class AttackSurfaceInspector:
         return prot_level
 
 
+def simple_glob_match(pattern, path):
+    """
+    按 android:pathPattern（PatternMatcher.PATTERN_SIMPLE_GLOB）的规则匹配整个 path，逐行移植自
+    PatternMatcher.matchGlobPattern：'.' 匹配任意字符，'x*' 贪婪吃掉连续的 x，'\\' 转义下一个字符
+    （只影响 '*' 的含义，单独的 "\\." 仍匹配任意字符）；
+    ".*" 不回溯，只吃到下一个模式字符在 path 中第一次出现的位置，因此 ".*\\.pdf" 不匹配 "/a.b.pdf"，
+    "a*a" 也不匹配 "aa"。与正则语义不同，不能用 re 代替
+    """
+    np, nm = len(pattern), len(path)
+    if np == 0:
+        return nm == 0
+    ip = im = 0
+    next_char = pattern[0]
+    while ip < np and im < nm:
+        c = next_char
+        ip += 1
+        next_char = pattern[ip] if ip < np else None
+        escaped = c == "\\"
+        if escaped:
+            c = next_char
+            ip += 1
+            next_char = pattern[ip] if ip < np else None
+        if next_char == "*":
+            if not escaped and c == ".":
+                if ip >= np - 1:
+                    # 模式以 ".*" 结尾，剩下的 path 都能匹配
+                    return True
+                ip += 1
+                next_char = pattern[ip]
+                if next_char == "\\":
+                    ip += 1
+                    next_char = pattern[ip] if ip < np else None
+                # 吃到下一个模式字符第一次出现的位置为止
+                while im < nm and path[im] != next_char:
+                    im += 1
+                if im == nm:
+                    return False
+                ip += 1
+                next_char = pattern[ip] if ip < np else None
+                im += 1
+            else:
+                # 只吃与 '*' 前字符相同的字符
+                while im < nm and path[im] == c:
+                    im += 1
+                ip += 1
+                next_char = pattern[ip] if ip < np else None
+        else:
+            if c != "." and path[im] != c:
+                return False
+            im += 1
+
+    if ip >= np and im >= nm:
+        return True
+    # path 已经用完，模式只剩结尾的 ".*" 时仍算匹配
+    return ip == np - 2 and pattern[ip] == "." and pattern[ip + 1] == "*"
+
+
+class IntentFilterIndex:
+    """
+    全库 intent-filter 的 URL 匹配索引，回答"哪些 Activity 能接收 https://evil.example/a/b 这样的 data"。
+    数据来自 intent_filter_data 规范化表（不解析 intent_filters JSON），匹配规则同 Android IntentFilter.matchData：
+      - 每个 filter 的 scheme/host/path 声明合并为集合；声明了 mimeType 的 filter 不接受不带类型的 URL，不入索引
+      - 索引结构为 scheme -> host：精确 host 用 dict，"*" 开头的通配 host 按反转后缀存入字符 trie
+      - 未声明 host 的 filter 匹配该 scheme 下的任意 URL；声明了 host 时才检查 port 与 path/pathPrefix/pathPattern，
+        pathPattern 按 simple_glob_match（PatternMatcher 的不回溯语义）匹配
+    索引记录每个包的 package_version 版本号及整张表的水位 (MAX(version), 行数)：水位不变时 refresh() 只执行
+    一条查询即返回，否则只重读版本号变大的包；被删除的 filter 先做墓碑标记，数量过多时再整体重建查找结构。
+    整个索引可用 save()/load() 持久化。
+    用法：
+        index = IntentFilterIndex.open("./all.db")
+        index.match("https://evil.example/a/b")  # -> [(package_name, activity_name, filter_index), ...]
+    """
+
+    FORMAT_VERSION = 3
+
+    FILTER_DATA_SQL = """
+    SELECT d.package_name, d.activity_name, d.filter_index, a.exported,
+           d.scheme, d.host, d.port, d.path, d.path_prefix, d.path_pattern, d.mime_type
+    FROM intent_filter_data d
+    LEFT JOIN activity_info a USING (package_name, activity_name)
+    WHERE d.package_name = ?
+    ORDER BY d.activity_name, d.filter_index, d.data_index
+    """
+
+    def __init__(self):
+        self.filters = {}           # fid -> filter 描述，见 _add_filter
+        self.package_filters = {}   # package_name -> [fid]
+        self.versions = {}          # package_name -> package_version.version
+        self.watermark = (0, 0)     # package_version 的 (MAX(version), 行数)
+        self._next_id = 0
+        self._dead = set()
+        self._schemes = {}          # scheme -> {"any": [fid], "exact": {host: [(fid, port)]}, "wild": trie}
+
+    @classmethod
+    def open(cls, db_path='./all.db', index_path=None):
+        """
+        加载 index_path（默认 <db_path>.filter_index）中持久化的索引，按数据库当前内容增量刷新，有变化时写回
+        """
+        index_path = index_path or db_path + ".filter_index"
+        index = cls.load(index_path) if os.path.exists(index_path) else None
+        if index is None:
+            index = cls()
+        stats = index.refresh(db_path)
+        if stats["changed"] or stats["removed"] or not os.path.exists(index_path):
+            index.save(index_path)
+        return index
+
+    @classmethod
+    def load(cls, index_path):
+        """
+        读取 save() 写出的索引；格式版本不一致时返回 None
+        """
+        with open(index_path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != cls.FORMAT_VERSION:
+            return None
+        index = cls()
+        index.filters = state["filters"]
+        index.package_filters = state["package_filters"]
+        index.versions = state["versions"]
+        index.watermark = state["watermark"]
+        index._next_id = state["next_id"]
+        index._relink()
+        return index
+
+    def save(self, index_path):
+        # 查找结构可由 filters 重建，只持久化 filter 描述；先写临时文件再替换，避免中途失败留下半个文件
+        self._relink()
+        state = {
+            "version": self.FORMAT_VERSION,
+            "filters": self.filters,
+            "package_filters": self.package_filters,
+            "versions": self.versions,
+            "watermark": self.watermark,
+            "next_id": self._next_id,
+        }
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, index_path)
+
+    def refresh(self, db_path='./all.db'):
+        """
+        按数据库当前内容增量更新索引：package_version 水位不变时直接返回；否则重建版本号变大的包，
+        package_version 行数与索引中的包数不一致时再移除数据库中已不存在的包。
+        :return: {"packages", "changed", "removed", "filters", "seconds"}
+        """
+        start = time.perf_counter()
+        conn = connect_db(db_path)
+        try:
+            if conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'intent_filter_data'"
+            ).fetchone() is None:
+                raise RuntimeError(f"{db_path} 中没有 intent_filter_data 表，请先执行 --rebuild-filter-tables")
+            # 补建 package_version（旧数据库只在这里升级一次）
+            create_schema(conn)
+
+            changed = 0
+            removed = []
+            watermark = conn.execute("SELECT COALESCE(MAX(version), 0), COUNT(*) FROM package_version").fetchone()
+            if watermark != self.watermark:
+                updates = conn.execute(
+                    "SELECT package_name, version FROM package_version WHERE version > ?", (self.watermark[0],)
+                ).fetchall()
+                for package_name, version in updates:
+                    if self.versions.get(package_name) == version:
+                        continue
+                    self._remove_package(package_name)
+                    self._add_package(package_name, conn.execute(self.FILTER_DATA_SQL, (package_name,)).fetchall())
+                    self.versions[package_name] = version
+                    changed += 1
+                if len(self.versions) != watermark[1]:
+                    present = {row[0] for row in conn.execute("SELECT package_name FROM package_version")}
+                    removed = [package_name for package_name in self.versions if package_name not in present]
+                self.watermark = tuple(watermark)
+        finally:
+            conn.close()
+
+        for package_name in removed:
+            self._remove_package(package_name)
+            del self.versions[package_name]
+
+        if len(self._dead) > len(self.filters):
+            self._relink()
+        return {
+            "packages": len(self.versions),
+            "changed": changed,
+            "removed": len(removed),
+            "filters": len(self.filters),
+            "seconds": time.perf_counter() - start,
+        }
+
+    def match(self, url, exported_only=False):
+        """
+        返回 data 能匹配 url 的 filter：[(package_name, activity_name, filter_index), ...]
+        :param exported_only: 只返回 exported 为 true 的 Activity
+        """
+        parts = urlsplit(url)
+        bucket = self._schemes.get(parts.scheme)
+        if bucket is None:
+            return []
+        try:
+            port = parts.port
+        except ValueError:
+            return []
+        port = str(port) if port is not None else None
+        host = parts.hostname or ""
+        path = parts.path
+
+        hits = []
+        seen = set()
+
+        def accept(fid, check_path):
+            if fid in seen or fid in self._dead:
+                return
+            seen.add(fid)
+            package_name, activity_name, filter_index, exported, _, _, paths = self.filters[fid]
+            if exported_only and (exported or "").lower() != "true":
+                return
+            if check_path and paths is not None and not self._match_path(paths, path):
+                return
+            hits.append((package_name, activity_name, filter_index))
+
+        for fid in bucket["any"]:
+            accept(fid, False)
+        candidates = list(bucket["exact"].get(host, ()))
+        node = bucket["wild"]
+        candidates.extend(node.get(None, ()))
+        for ch in reversed(host):
+            node = node.get(ch)
+            if node is None:
+                break
+            candidates.extend(node.get(None, ()))
+        for fid, filter_port in candidates:
+            if filter_port is None or filter_port == port:
+                accept(fid, True)
+        return hits
+
+    def match_many(self, urls, exported_only=False):
+        """
+        批量查询，返回 {url: match(url) 的结果}
+        """
+        return {url: self.match(url, exported_only) for url in urls}
+
+    @staticmethod
+    def _match_path(paths, path):
+        literals, prefixes, patterns = paths
+        return (path in literals
+                or any(path.startswith(prefix) for prefix in prefixes)
+                or any(simple_glob_match(pattern, path) for pattern in patterns))
+
+    def _add_package(self, package_name, package_rows):
+        fids = []
+        for (activity_name, filter_index), filter_rows in itertools.groupby(package_rows, key=lambda r: (r[1], r[2])):
+            fid = self._add_filter(package_name, activity_name, filter_index, list(filter_rows))
+            if fid is not None:
+                fids.append(fid)
+        self.package_filters[package_name] = fids
+
+    def _add_filter(self, package_name, activity_name, filter_index, filter_rows):
+        schemes, authorities = [], []
+        literals, prefixes, patterns = set(), [], []
+        exported = filter_rows[0][3]
+        for _, _, _, _, scheme, host, port, path, path_prefix, path_pattern, mime_type in filter_rows:
+            if mime_type:
+                return None
+            if scheme and scheme not in schemes:
+                schemes.append(scheme)
+            if host and (host.lower(), port) not in authorities:
+                authorities.append((host.lower(), port))
+            if path:
+                literals.add(path)
+            if path_prefix:
+                prefixes.append(path_prefix)
+            if path_pattern:
+                patterns.append(path_pattern)
+        # 未声明 scheme 的 filter 只接受不带 scheme 的 data，任何 URL 都不会匹配
+        if not schemes:
+            return None
+
+        paths = (frozenset(literals), tuple(prefixes), tuple(patterns)) if literals or prefixes or patterns else None
+        fid = self._next_id
+        self._next_id += 1
+        self.filters[fid] = (package_name, activity_name, filter_index, exported,
+                             tuple(schemes), tuple(authorities), paths)
+        self._link(fid)
+        return fid
+
+    def _link(self, fid):
+        _, _, _, _, schemes, authorities, _ = self.filters[fid]
+        for scheme in schemes:
+            bucket = self._schemes.setdefault(scheme, {"any": [], "exact": {}, "wild": {}})
+            if not authorities:
+                bucket["any"].append(fid)
+                continue
+            for host, port in authorities:
+                if host.startswith("*"):
+                    node = bucket["wild"]
+                    for ch in reversed(host[1:]):
+                        node = node.setdefault(ch, {})
+                    node.setdefault(None, []).append((fid, port))
+                else:
+                    bucket["exact"].setdefault(host, []).append((fid, port))
+
+    def _remove_package(self, package_name):
+        for fid in self.package_filters.pop(package_name, ()):
+            del self.filters[fid]
+            self._dead.add(fid)
+
+    def _relink(self):
+        self._schemes = {}
+        self._dead = set()
+        for fid in self.filters:
+            self._link(fid)
+
+
 if __name__ == "__main__":
-    analyzer = AppAnalyzer('./base.apk')
-    analyzer.store_activities_in_db()
+    import argparse
+    parser = argparse.ArgumentParser(description="批量分析 APK 的 Activity 信息并写入数据库")
+    parser.add_argument("inputs", nargs="*", default=["./base.apk"],
+                        help="APK/.xapk/.apks 文件、包含 APK 的目录（split 目录视为一个安装包），或每行一个路径的列表文件")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="并行工作进程数(默认CPU核数)")
+    parser.add_argument("-t", "--timeout", type=int, default=600, help="单个APK分析超时(秒)，0表示不限制")
+    parser.add_argument("--db", default="./all.db", help="结果数据库路径")
+    parser.add_argument("--cache", default="./analysis_cache.db", help="分析结果缓存数据库路径")
+    parser.add_argument("--no-cache", action="store_true", help="不使用分析结果缓存")
+    parser.add_argument("--cache-max-mb", type=int, default=512, help="分析结果缓存大小上限(MB)")
+    parser.add_argument("--inspect", action="store_true", help="入库后对整个数据库做攻击面分类")
+    parser.add_argument("--inspect-only", action="store_true", help="不分析APK，只对整个数据库做攻击面分类")
+    parser.add_argument("--changed-only", action="store_true", help="攻击面分类时只处理输入发生变化的包")
+    parser.add_argument("--rebuild-filter-tables", action="store_true",
+                        help="由 activity_info 中已有的 intent_filters JSON 重建 intent-filter 规范化表后退出")
+    parser.add_argument("--reachability", action="store_true",
+                        help="额外做 DEX 分析，记录各 Activity 入口能否经调用链到达 WebView 加载方法")
+    parser.add_argument("--isolated", action="store_true",
+                        help="每个工作进程设置内存上限并按任务数/峰值 RSS 回收（指定以下任一参数时自动启用）")
+    parser.add_argument("--memory-limit-mb", type=int, default=None, help="每个工作进程的地址空间上限(MB)")
+    parser.add_argument("--max-jobs-per-worker", type=int, default=None, help="每个工作进程最多分析的APK数")
+    parser.add_argument("--rss-high-water-mb", type=int, default=None, help="工作进程峰值RSS超过该值(MB)后回收")
+    parser.add_argument("--match-url", action="append", default=[],
+                        help="查询全库中 data 能匹配该 URL 的 Activity（可多次指定），查询后退出")
+    parser.add_argument("--match-file", help="每行一个待查询 URL 的文件，同 --match-url")
+    parser.add_argument("--exported-only", action="store_true", help="URL 查询只返回导出的 Activity")
+    parser.add_argument("--filter-index", default=None, help="intent-filter 索引文件路径(默认 <db>.filter_index)")
+    args = parser.parse_args()
+
+    if args.match_url or args.match_file:
+        urls = list(args.match_url)
+        if args.match_file:
+            with open(args.match_file, "r", encoding="utf-8") as f:
+                urls.extend(line.strip() for line in f if line.strip())
+        index = IntentFilterIndex.open(args.db, args.filter_index)
+        start = time.perf_counter()
+        results = index.match_many(urls, exported_only=args.exported_only)
+        elapsed = time.perf_counter() - start
+        for url, hits in results.items():
+            print(f"[*] {url}: {len(hits)} 个 intent-filter")
+            for package_name, activity_name, filter_index in hits:
+                print(f"    {package_name}/{activity_name} #{filter_index}")
+        print(f"[*] 共 {len(urls)} 个 URL，查询耗时 {elapsed * 1000:.2f}ms")
+        exit(0)
+
+    if args.rebuild_filter_tables:
+        count = rebuild_intent_filter_tables(args.db)
+        print(f"[*] 已重建 {count} 个 Activity 的 intent-filter 规范化表")
+        exit(0)
+
+    if not args.inspect_only:
+        ingestor = CorpusIngestor(
+            db_path=args.db,
+            workers=args.workers,
+            timeout=args.timeout,
+            cache_path=None if args.no_cache else args.cache,
+            cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+            reachability=args.reachability,
+            isolated=args.isolated or any(v is not None for v in (
+                args.memory_limit_mb, args.max_jobs_per_worker, args.rss_high_water_mb)),
+            memory_limit_mb=args.memory_limit_mb,
+            max_jobs_per_worker=args.max_jobs_per_worker,
+            rss_high_water_mb=args.rss_high_water_mb
+        )
+        stats = ingestor.ingest(args.inputs)
+        print(f"[*] 完成：共 {stats['total']} 个 APK，成功 {stats['ok']}，失败 {stats['failed']}，"
+              f"入库 {stats['activities']} 个 Activity，耗时 {stats['seconds']:.1f}s")
+
+    if args.inspect or args.inspect_only:
+        inspector = AttackSurfaceInspector(db_path=args.db)
+        stats = inspector.inspect_corpus(only_changed=args.changed_only)
+        print(f"[*] 攻击面分类完成：{stats['classified']}/{stats['packages']} 个包，"
+              f"{stats['rows']} 个 Activity，耗时 {stats['seconds']:.1f}s（{stats['rows_per_sec']:.0f} 行/秒）")
@@ -0,0 +1,351 @@
+#coding = 'utf-8'
+"""
+性能基准脚本。每个子命令对应一项基准测试，结果直接打印到终端。
+
+用法示例：
+    python bench.py constructor ./base.apk
+    python bench.py writer -p 500 -a 40
+    python bench.py reporter -n 10000 100000 1000000 -f legacy xlsx csv jsonl parquet
+    python bench.py importtime -r 5
+"""
+import os
+import sys
+import time
+import statistics
+import subprocess
+import resource
+import multiprocessing
+
+
+def _peak_rss_mb():
+    """
+    返回当前进程的峰值 RSS（MB）。Linux 下 ru_maxrss 单位为 KB，macOS 下为字节。
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if os.uname().sysname == "Darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def _run_isolated(target, args):
+    """
+    在独立的子进程中执行 target(*args)，以便每次测量的峰值 RSS 互不影响。
+    target 需返回一个 dict，子进程会附加 peak_rss_mb 后传回。
+    """
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_isolated_entry, args=(child_conn, target, args))
+    proc.start()
+    child_conn.close()
+    result = parent_conn.recv()
+    proc.join()
+    return result
+
+
+def _isolated_entry(conn, target, args):
+    try:
+        result = target(*args)
+        result["peak_rss_mb"] = _peak_rss_mb()
+    except Exception as e:
+        result = {"error": repr(e)}
+    conn.send(result)
+    conn.close()
+
+
+# ---------------------------------------------------------------------------
+# constructor：AppAnalyzer 完整构造 vs manifest_only 构造
+# ---------------------------------------------------------------------------
+
+def _construct_analyzer(apk_path, manifest_only):
+    from AA import AppAnalyzer
+    start = time.perf_counter()
+    analyzer = AppAnalyzer(apk_path, manifest_only=manifest_only)
+    activities_info = analyzer.analyze_activities()
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "activities": len(activities_info)}
+
+
+def bench_constructor(apk_path, repeat=1):
+    print(f"[*] AppAnalyzer 构造基准: {apk_path}")
+    print(f"{'mode':<16}{'run':>4}{'wall(s)':>12}{'peak RSS(MB)':>16}{'activities':>12}")
+    for mode, manifest_only in (("full", False), ("manifest_only", True)):
+        for i in range(repeat):
+            r = _run_isolated(_construct_analyzer, (apk_path, manifest_only))
+            if "error" in r:
+                print(f"{mode:<16}{i:>4}  error: {r['error']}")
+                continue
+            print(f"{mode:<16}{i:>4}{r['seconds']:>12.3f}{r['peak_rss_mb']:>16.1f}{r['activities']:>12}")
+
+
+# ---------------------------------------------------------------------------
+# writer：activity_info 写入吞吐（行/秒）
+# ---------------------------------------------------------------------------
+
+def _fake_activities(package_index, activities_per_package):
+    package_name = f"com.bench.app{package_index}"
+    activities_info = []
+    for i in range(activities_per_package):
+        activities_info.append({
+            "activityName": f"{package_name}.Activity{i}",
+            "exported": "true" if i % 3 == 0 else None,
+            "permission": None,
+            "intent_filters": [{
+                "actions": ["android.intent.action.VIEW"],
+                "categories": ["android.intent.category.DEFAULT", "android.intent.category.BROWSABLE"],
+                "datas": [{"scheme": "https", "host": f"h{i}.example.com", "port": None, "path": None,
+                           "pathPrefix": "/p", "pathPattern": None, "mimeType": None}]
+            }] if i % 2 == 0 else None,
+        })
+    return package_name, activities_info
+
+
+def _legacy_store(db_path, package_name, activities_info):
+    """
+    旧版 store_activities_in_db 的写入方式：每个 APK 新建连接，逐行 execute，默认日志模式
+    """
+    import json
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS activity_info (
+        package_name   TEXT NOT NULL,
+        activity_name  TEXT NOT NULL,
+        exported       TEXT,
+        permission     TEXT,
+        intent_filters TEXT,
+        PRIMARY KEY (package_name, activity_name)
+    )
+    """)
+    for activity in activities_info:
+        intent_filters_json = json.dumps(activity["intent_filters"]) if activity["intent_filters"] else None
+        cursor.execute(
+            "INSERT OR REPLACE INTO activity_info "
+            "(package_name, activity_name, exported, permission, intent_filters) VALUES (?, ?, ?, ?, ?)",
+            (package_name, activity["activityName"], activity["exported"], activity["permission"],
+             intent_filters_json)
+        )
+    conn.commit()
+    conn.close()
+
+
+def bench_writer(packages, activities_per_package, producers):
+    import tempfile
+    import threading
+    from AA import AppAnalyzer, ActivityDBWriter, close_store_connections
+
+    batches = [_fake_activities(i, activities_per_package) for i in range(packages)]
+    total_rows = packages * activities_per_package
+
+    class _Prepared(AppAnalyzer):
+        # 跳过 APK 解析，只测写入路径
+        def __init__(self, package_name, activities_info):
+            self.package_name = package_name
+            self._components = {"activities": [
+                {
+                    "name": a["activityName"],
+                    "exported": a["exported"],
+                    "permission": a["permission"],
+                    "intent_filters": a["intent_filters"],
+                }
+                for a in activities_info
+            ]}
+            self.cache = None
+
+    def run_legacy(db_path):
+        for package_name, activities_info in batches:
+            _legacy_store(db_path, package_name, activities_info)
+
+    def run_store(db_path):
+        for package_name, activities_info in batches:
+            _Prepared(package_name, activities_info).store_activities_in_db(db_path=db_path)
+        close_store_connections()
+
+    def run_writer(db_path):
+        with ActivityDBWriter(db_path) as writer:
+            chunks = [batches[i::producers] for i in range(producers)]
+
+            def produce(chunk):
+                for package_name, activities_info in chunk:
+                    writer.add(package_name, activities_info)
+
+            threads = [threading.Thread(target=produce, args=(c,)) for c in chunks]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+    print(f"[*] activity_info 写入基准: {packages} 个包 x {activities_per_package} 个 Activity = {total_rows} 行")
+    # 旧版只写 activity_info，新版还写 intent-filter 子表，rows/s 按各模式实际写入的全部表的行数计算
+    print(f"{'mode':<28}{'seconds':>10}{'rows':>10}{'rows/s':>14}{'activities/s':>14}")
+    for mode, fn in (("legacy (per-row execute)", run_legacy),
+                     ("store_activities_in_db", run_store),
+                     (f"ActivityDBWriter x{producers}", run_writer)):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "all.db")
+            start = time.perf_counter()
+            fn(db_path)
+            elapsed = time.perf_counter() - start
+            rows = _count_rows(db_path)
+        print(f"{mode:<28}{elapsed:>10.3f}{rows:>10}{rows / elapsed:>14.0f}{total_rows / elapsed:>14.0f}")
+
+
+def _count_rows(db_path):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        return sum(conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables)
+    finally:
+        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# reporter：各输出格式写入 N 行测试结果的耗时与峰值内存
+# ---------------------------------------------------------------------------
+
+def _write_report(fmt, rows, out_dir):
+    import test as intent_test
+    path = os.path.join(out_dir, "bench." + ("xlsx" if fmt == "legacy" else fmt))
+    if fmt == "legacy":
+        reporter = intent_test.ExcelReporter(path)
+    else:
+        reporter = intent_test.create_reporter(path)
+    start = time.perf_counter()
+    for i in range(rows):
+        # 与 test.py main() 一致：每完成一条写入一条
+        reporter.write_test_result([{
+            "activityName": f"com.bench.app{i % 100}.Activity{i}",
+            "filterIndex": i % 4,
+            "actions": ["android.intent.action.VIEW"],
+            "categories": ["android.intent.category.DEFAULT", "android.intent.category.BROWSABLE"],
+            "dataAttrs": {"scheme": "https", "host": f"h{i}.example.com", "pathPrefix": "/p"},
+            "constructedIntent": f"adb shell am start -n com.bench.app{i % 100}/.Activity{i} "
+                                 f"-a android.intent.action.VIEW -d 'https://h{i}.example.com/p'",
+            "testResult": "Pending" if i % 7 else "Failed: Error: Activity not started",
+        }])
+    reporter.save()
+    elapsed = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+    return {"seconds": elapsed, "size_mb": size / (1024 * 1024)}
+
+
+def bench_reporter(row_counts, formats):
+    import tempfile
+    print("[*] Reporter 写入基准（每种格式在独立子进程中运行）")
+    print(f"{'format':<10}{'rows':>10}{'wall(s)':>12}{'rows/s':>12}{'peak RSS(MB)':>16}{'file(MB)':>12}")
+    for rows in row_counts:
+        for fmt in formats:
+            with tempfile.TemporaryDirectory() as tmp:
+                r = _run_isolated(_write_report, (fmt, rows, tmp))
+            if "error" in r:
+                print(f"{fmt:<10}{rows:>10}  error: {r['error']}")
+                continue
+            print(f"{fmt:<10}{rows:>10}{r['seconds']:>12.2f}{rows / r['seconds']:>12.0f}"
+                  f"{r['peak_rss_mb']:>16.1f}{r['size_mb']:>12.1f}")
+
+
+# ---------------------------------------------------------------------------
+# importtime：模块导入耗时（python -X importtime）与回归阈值
+# ---------------------------------------------------------------------------
+
+# 模块 -> 累计导入耗时上限（ms）。编排系统会启动大量只查库/出报告的短任务，导入时间即主要开销
+IMPORTTIME_THRESHOLDS_MS = {
+    "AA": 150,
+    "test": 200,
+    "server": 50,
+}
+
+# 这些依赖只应在用到它们的路径上导入，出现在模块级导入中即视为回归
+HEAVY_IMPORTS = ("androguard", "openpyxl", "lxml", "pyarrow", "asyncio")
+
+
+def _importtime(module):
+    """
+    在新解释器中执行 python -X importtime -c "import <module>"，
+    返回 (module 的累计导入耗时 ms, 导入过程中加载的所有顶层包名集合)
+    """
+    env = dict(os.environ)
+    # 允许写入 .pyc，避免每次都把编译时间计入导入耗时
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    cumulative = None
+    loaded = set()
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum_us, name = line[len("import time:"):].split("|", 2)
+        if not cum_us.strip().isdigit():
+            continue
+        loaded.add(name.strip().split(".")[0])
+        if name == " " + module:
+            cumulative = int(cum_us) / 1000
+    return cumulative, loaded
+
+
+def bench_importtime(modules, repeat=5):
+    """
+    :return: 超过阈值或导入了重量级依赖的模块数，作为进程退出码
+    """
+    print(f"[*] 导入耗时基准（python -X importtime，每个模块 {repeat} 次取中位数，首次运行仅用于生成 .pyc）")
+    print(f"{'module':<10}{'median(ms)':>12}{'min(ms)':>10}{'limit(ms)':>12}  heavy imports")
+    failed = 0
+    for module in modules:
+        try:
+            _importtime(module)
+            runs = [_importtime(module) for _ in range(repeat)]
+        except RuntimeError as e:
+            print(f"{module:<10}  error: {e}")
+            failed += 1
+            continue
+        times = [t for t, _ in runs]
+        heavy = sorted(set().union(*(loaded for _, loaded in runs)) & set(HEAVY_IMPORTS))
+        limit = IMPORTTIME_THRESHOLDS_MS.get(module)
+        median = statistics.median(times)
+        regressed = heavy or (limit is not None and median > limit)
+        failed += bool(regressed)
+        print(f"{module:<10}{median:>12.1f}{min(times):>10.1f}{limit if limit is not None else '-':>12}  "
+              f"{', '.join(heavy) or '-'}{'  [!] 超出阈值' if regressed else ''}")
+    return failed
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="性能基准测试")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p_ctor = sub.add_parser("constructor", help="AppAnalyzer 完整构造与 manifest_only 构造的耗时/峰值内存对比")
+    p_ctor.add_argument("apk", help="待分析的APK文件路径")
+    p_ctor.add_argument("-r", "--repeat", type=int, default=1, help="每种模式重复次数")
+
+    p_writer = sub.add_parser("writer", help="activity_info 写入吞吐：旧版逐行写入 vs 批量事务写入")
+    p_writer.add_argument("-p", "--packages", type=int, default=500, help="模拟的包数量")
+    p_writer.add_argument("-a", "--activities", type=int, default=40, help="每个包的 Activity 数量")
+    p_writer.add_argument("--producers", type=int, default=4, help="并发提交结果的线程数")
+
+    p_reporter = sub.add_parser("reporter", help="ExcelReporter（legacy）与流式 xlsx/csv/jsonl/parquet 输出的耗时与峰值内存")
+    p_reporter.add_argument("-n", "--rows", type=int, nargs="+", default=[10000, 100000, 1000000], help="写入行数")
+    p_reporter.add_argument("-f", "--formats", nargs="+", default=["legacy", "xlsx", "csv", "jsonl", "parquet"],
+                            choices=["legacy", "xlsx", "csv", "jsonl", "parquet"], help="参与对比的输出格式")
+
+    p_import = sub.add_parser("importtime", help="各模块导入耗时（python -X importtime），超出阈值时退出码非 0")
+    p_import.add_argument("-m", "--modules", nargs="+", default=list(IMPORTTIME_THRESHOLDS_MS), help="待测模块")
+    p_import.add_argument("-r", "--repeat", type=int, default=5, help="每个模块重复次数")
+
+    args = parser.parse_args()
+
+    if args.bench == "constructor":
+        bench_constructor(args.apk, repeat=args.repeat)
+    elif args.bench == "writer":
+        bench_writer(args.packages, args.activities, args.producers)
+    elif args.bench == "reporter":
+        bench_reporter(args.rows, args.formats)
+    elif args.bench == "importtime":
+        exit(1 if bench_importtime(args.modules, repeat=args.repeat) else 0)
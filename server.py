@@ -0,0 +1,324 @@
+#coding = 'utf-8'
+"""
+常驻分析服务：解释器、androguard/lxml/openpyxl 只加载一次，工作进程池预先 fork 并完成预热，
+之后每个 APK 只需付出真正的分析时间。
+
+协议为 JSON Lines，每行一个请求、每行一个响应（按完成顺序返回，用 id 对应）：
+    请求：{"id": 1, "apk": "/path/a.apk", "store": false, "reachability": false}
+          {"id": 2, "op": "ping"}    {"op": "shutdown"}
+    响应：{"id": 1, "ok": true, "package_name": ..., "activities": [...], "attack_surface": [...], "seconds": ...}
+          {"id": 1, "ok": false, "error": "..."}
+activities 的格式同 AppAnalyzer.analyze_activities()，每项额外带有 isAttackSurface 与 usedFreePermission
+（AttackSurfaceInspector 的权限感知规则，权限保护级别取自服务数据库中的 permission_info），
+attack_surface 为其中判定为攻击面的 Activity 名称列表。apk 也可以是 .xapk/.apks 安装包或 split 目录。
+
+用法示例：
+    python server.py serve --socket ./aa.sock -j 4          # Unix socket 服务
+    python server.py serve --stdio < jobs.jsonl              # stdin/stdout 服务
+    python server.py submit a.apk b.apk --socket ./aa.sock   # 客户端
+客户端只依赖标准库，不导入 androguard，启动开销很小。
+"""
+import os
+import sys
+import json
+import time
+import socket
+
+
+DEFAULT_SOCKET = "./aa.sock"
+
+
+def _noop():
+    return os.getpid()
+
+
+class AnalysisServer:
+    """
+    常驻分析服务。
+      - 工作进程由 forkserver 派生：forkserver 预先导入 PRELOAD 中的模块，之后 fork 出的工作进程无需重复导入；
+        同时避免工作进程继承服务端已打开的客户端连接（直接 fork 时连接无法被关闭）
+      - 启动时向进程池提交空任务，强制所有工作进程立即就绪
+      - 每个请求在工作进程中执行 AA._ingest_worker（带 SIGALRM 超时与可选的 AnalysisCache）
+      - 工作进程崩溃时重建进程池，受影响的请求在新进程池中重试一次；超时未返回的请求直接返回错误
+      - store=true 的结果交给唯一的 ActivityDBWriter 批量写入数据库
+    """
+
+    # 工作进程内超时未生效时，额外等待的秒数（同 CorpusIngestor.KILL_GRACE）
+    KILL_GRACE = 10
+    # forkserver 预先导入的模块
+    PRELOAD = ["AA", "androguard.core.apk", "androguard.misc"]
+
+    def __init__(self, workers=None, timeout=600, db_path='./all.db', cache_path=None, cache_max_bytes=None):
+        """
+        :param workers: 工作进程数，默认为 CPU 核数
+        :param timeout: 单个 APK 的分析超时（秒），0 表示不限制
+        :param db_path: store=true 时写入的数据库
+        :param cache_path: AnalysisCache 数据库路径，None 表示不使用缓存
+        :param cache_max_bytes: 缓存大小上限
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.db_path = db_path
+        self.cache_path = cache_path
+        self.cache_max_bytes = cache_max_bytes
+        self.pool = None
+        self._worker_pids = None
+        self.writer = None
+        self._stopping = None
+        self._slots = None
+
+    def start(self):
+        import multiprocessing
+        from AA import ActivityDBWriter
+        self._mp_context = multiprocessing.get_context("forkserver")
+        self._mp_context.set_forkserver_preload(self.PRELOAD)
+        self._start_pool()
+        self.writer = ActivityDBWriter(self.db_path).start()
+
+    def _start_pool(self):
+        from concurrent.futures import ProcessPoolExecutor, wait
+        from AA import WorkerPids
+        self._worker_pids = WorkerPids(self._mp_context)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._mp_context,
+                                        **self._worker_pids.pool_kwargs())
+        wait([self.pool.submit(_noop) for _ in range(self.workers)])
+
+    def _restart_pool(self):
+        from AA import CorpusIngestor
+        CorpusIngestor._kill_pool(self.pool, self._worker_pids)
+        self._start_pool()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def handle(self, request):
+        """
+        处理一个请求 dict，返回响应 dict
+        """
+        response = {"id": request.get("id")}
+        op = request.get("op", "analyze")
+        if op == "ping":
+            return dict(response, ok=True, pid=os.getpid(), workers=self.workers)
+        if op == "shutdown":
+            self._stopping.set()
+            return dict(response, ok=True)
+        if op != "analyze":
+            return dict(response, ok=False, error=f"未知操作: {op}")
+
+        apk_path = request.get("apk")
+        if not apk_path or not os.path.exists(apk_path):
+            return dict(response, ok=False, error=f"APK 文件不存在: {apk_path}")
+
+        async with self._slots:
+            return await self._analyze(response, apk_path, bool(request.get("store")),
+                                       bool(request.get("reachability")))
+
+    async def _analyze(self, response, apk_path, store, reachability):
+        """
+        在进程池中分析一个 APK；进程池崩溃时重建并重试一次
+        """
+        import asyncio
+        from concurrent.futures.process import BrokenProcessPool
+        from AA import AppAnalyzer, AttackSurfaceInspector, _ingest_worker
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        hard_timeout = self.timeout + self.KILL_GRACE if self.timeout else None
+        for attempt in range(2):
+            pool = self.pool
+            try:
+                future = loop.run_in_executor(pool, _ingest_worker, apk_path, self.timeout, self.cache_path,
+                                              self.cache_max_bytes, reachability)
+                # 不用 wait_for：3.11 起 asyncio.TimeoutError 即 TimeoutError，无法与工作进程内的超时区分
+                done, _ = await asyncio.wait([future], timeout=hard_timeout)
+                if not done:
+                    # 强制结束进程池后该 future 以 BrokenProcessPool 结束，取走异常避免告警
+                    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                    if self.pool is pool:
+                        self._restart_pool()
+                    return dict(response, ok=False, error="超时（强制结束）")
+                package_name, components, reach = future.result()
+                break
+            except BrokenProcessPool:
+                # 崩溃可能由同一进程池中的其他任务引起，本请求在新进程池中重试
+                if self.pool is pool:
+                    self._restart_pool()
+            except TimeoutError:
+                return dict(response, ok=False, error="超时")
+            except Exception as e:
+                return dict(response, ok=False, error=repr(e))
+        else:
+            return dict(response, ok=False, error="工作进程崩溃")
+
+        activities_info = AppAnalyzer.activities_from_components(components)
+        if store:
+            self.writer.add(package_name, activities_info, components, reach)
+
+        # 与入库后 AttackSurfaceInspector 的分类结果一致：权限保护级别取自 permission_info，找不到视为游离权限
+        inspector = AttackSurfaceInspector(package_name, self.db_path)
+        prot_levels = inspector.prot_levels(activity["permission"] for activity in activities_info)
+        attack_surface = []
+        for activity in activities_info:
+            permission = activity["permission"]
+            is_attack, used_free = inspector.classify(activity["exported"], permission, prot_levels.get(permission))
+            activity["isAttackSurface"] = is_attack
+            activity["usedFreePermission"] = used_free
+            if reach is not None:
+                activity["reachesWebView"] = reach.get(activity["activityName"], {}).get("reachable", False)
+            if is_attack:
+                attack_surface.append(activity["activityName"])
+
+        return dict(response, ok=True, package_name=package_name, activities=activities_info,
+                    attack_surface=attack_surface, seconds=time.perf_counter() - start)
+
+    async def _serve_stream(self, reader, writer):
+        """
+        处理一个连接：并发执行其中的所有请求，按完成顺序逐行写回
+        """
+        import asyncio
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def run(line):
+            try:
+                response = await self.handle(json.loads(line))
+            except json.JSONDecodeError as e:
+                response = {"id": None, "ok": False, "error": f"无法解析请求: {e}"}
+            async with lock:
+                writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+                await writer.drain()
+
+        try:
+            while not self._stopping.is_set():
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.ensure_future(run(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def serve_unix(self, socket_path=DEFAULT_SOCKET):
+        import asyncio
+        self._stopping = asyncio.Event()
+        # 同时在途的任务数不超过工作进程数：提交即开始执行，进程池崩溃时波及的请求最少
+        self._slots = asyncio.Semaphore(self.workers)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(self._serve_stream, path=socket_path)
+        print(f"[*] 分析服务已启动: {socket_path}（{self.workers} 个工作进程）", file=sys.stderr)
+        try:
+            await self._stopping.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+    async def serve_stdio(self):
+        import asyncio
+        self._stopping = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.workers)
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+        writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+        await self._serve_stream(reader, writer)
+
+
+def submit(apk_paths, socket_path=DEFAULT_SOCKET, store=False, reachability=False, timeout=None):
+    """
+    客户端：通过一个连接提交多个 APK，按完成顺序产出响应 dict
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(socket_path)
+    try:
+        requests = [
+            {"id": i, "apk": os.path.abspath(path), "store": store, "reachability": reachability}
+            for i, path in enumerate(apk_paths)
+        ]
+        sock.sendall("".join(json.dumps(r) + "\n" for r in requests).encode("utf-8"))
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+    finally:
+        sock.close()
+
+
+def _request(socket_path, request, timeout=30):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(socket_path)
+    try:
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("r", encoding="utf-8") as f:
+            return json.loads(f.readline())
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="常驻 APK 分析服务与客户端")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="启动分析服务")
+    p_serve.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket 路径")
+    p_serve.add_argument("--stdio", action="store_true", help="从 stdin 读取请求、向 stdout 写出响应，而不是监听 socket")
+    p_serve.add_argument("-j", "--workers", type=int, default=None, help="工作进程数(默认CPU核数)")
+    p_serve.add_argument("-t", "--timeout", type=int, default=600, help="单个APK分析超时(秒)，0表示不限制")
+    p_serve.add_argument("--db", default="./all.db", help="store=true 时写入的数据库")
+    p_serve.add_argument("--cache", default="./analysis_cache.db", help="分析结果缓存数据库路径")
+    p_serve.add_argument("--no-cache", action="store_true", help="不使用分析结果缓存")
+    p_serve.add_argument("--cache-max-mb", type=int, default=512, help="分析结果缓存大小上限(MB)")
+
+    p_submit = sub.add_parser("submit", help="向服务提交 APK，逐行输出 JSON 结果")
+    p_submit.add_argument("apks", nargs="+", help="APK 文件路径")
+    p_submit.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket 路径")
+    p_submit.add_argument("--store", action="store_true", help="同时由服务写入数据库")
+    p_submit.add_argument("--reachability", action="store_true", help="同时做 WebView 调用链可达性分析")
+
+    p_ping = sub.add_parser("ping", help="检查服务是否在线")
+    p_ping.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket 路径")
+    p_stop = sub.add_parser("shutdown", help="停止服务")
+    p_stop.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket 路径")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        import asyncio
+        server = AnalysisServer(
+            workers=args.workers,
+            timeout=args.timeout,
+            db_path=args.db,
+            cache_path=None if args.no_cache else args.cache,
+            cache_max_bytes=args.cache_max_mb * 1024 * 1024
+        )
+        server.start()
+        try:
+            asyncio.run(server.serve_stdio() if args.stdio else server.serve_unix(args.socket))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+    elif args.command == "submit":
+        failed = 0
+        for response in submit(args.apks, args.socket, store=args.store, reachability=args.reachability):
+            failed += not response.get("ok")
+            print(json.dumps(response, ensure_ascii=False))
+        exit(1 if failed else 0)
+    else:
+        print(json.dumps(_request(args.socket, {"op": args.command}), ensure_ascii=False))
@@ -2,21 +2,26 @@
 import os
 import subprocess
 import time
+import re
 import json
-from xml.dom.minidom import Element
-from xml.dom import  minidom
-from lxml import etree
-from concurrent.futures import ThreadPoolExecutor
-
-import openpyxl  # pip install openpyxl
-from androguard.core.apk import APK
+import csv
+import hashlib
+import queue
+import itertools
+import threading
+import tempfile
+from urllib.parse import urlsplit, quote, unquote
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from AA import ManifestExtractor, AppAnalyzer, AnalysisCache, ApkBundle, simple_glob_match, connect_db, load_apk
 
 class APKAnalyzer:
     """
-    使用Androguard解析APK，获取以下信息：
+    使用Androguard解析APK（或 .xapk/.apks/split 目录安装包，见 AA.ApkBundle），获取以下信息：
       - 应用包名
-      - 所有 <activity> 标签的详细信息：
-         * activityName (全限定名)
+      - 所有 <activity> 与 <activity-alias> 标签的详细信息（一次遍历 Manifest 得到）：
+         * activityName (全限定名；activity-alias 为别名本身，可直接用于 am start -n)
          * android:exported 显式设置值（true/false/空字符串）
          * android:permission（若有）
          * intent-filters 列表，每个intent-filter包含:
@@ -47,128 +52,35 @@ class APKAnalyzer:
           ]
         }
         """
-        apk = APK(self.apk_path)
+        from lxml import etree
+
+        bundle = ApkBundle(self.apk_path) if ApkBundle.is_bundle(self.apk_path) else None
+        apk = bundle.load_base() if bundle else load_apk(self.apk_path)
         self.package_name = apk.get_package()
         manifest_xml = apk.get_android_manifest_xml()
-        # manifest_xml_str = apk.get_android_manifest_xml()
-        # print(type(manifest_xml_str)) #<class 'lxml.etree._Element'>
-        # manifest_xml = minidom.parseString(manifest_xml_str)
+        print(etree.tostring(manifest_xml, pretty_print=True, encoding="unicode"))
 
-        #将<class 'lxml.etree._Element'>转换成minidom
-        manifest_xml = minidom.parseString(etree.tostring(manifest_xml, encoding="unicode"))
-        print(manifest_xml.toprettyxml(indent=""))
+        # 直接在 lxml 树上单次遍历提取，不再转换成 minidom
         activities_info = []
-        activity_elements = manifest_xml.getElementsByTagName("activity")
-
-        for activity in activity_elements:
-            # 1) 获取 activityName(可能是相对路径，也可能是绝对路径)
-            raw_name = activity.getAttribute("android:name")
-            full_name = self._normalize_activity_name(raw_name, self.package_name)
-
-            # 2) 获取 exported / permission
-            exported_val = activity.getAttribute("android:exported").lower().strip()
-            permission_val = activity.getAttribute("android:permission").strip()
-            if not permission_val:
-                permission_val = None  # 便于后续判断
-
-            # 3) 获取所有 intent-filter
-            intent_filters = self._parse_intent_filters(activity)
-
+        tags = ("activity", "activity-alias")
+        extractor = ManifestExtractor(manifest_xml, self.package_name)
+        components = extractor.extract_components(tags)
+        if bundle is not None:
+            # 安装包：合并各 split（如 feature 模块）中声明的 Activity
+            components = ApkBundle.merge_components(components, bundle.split_components(self.package_name, tags))
+        for component in components["activities"] + components["activity_aliases"]:
             activity_info = {
-                "activityName": full_name,
-                "exported": exported_val,
-                "permission": permission_val,
-                "intent_filters": intent_filters
+                "activityName": component["name"],
+                "exported": component["exported"],
+                "permission": component["permission"] or None,  # 便于后续判断
+                "intent_filters": component["intent_filters"]
             }
+            if "targetActivity" in component:
+                activity_info["targetActivity"] = component["targetActivity"]
             activities_info.append(activity_info)
 
         return activities_info
 
-    def _normalize_activity_name(self, raw_name, package_name):
-        """
-        将可能是 .MainActivity 等相对路径的 Activity 名称转换成全限定类名
-        """
-        if raw_name.startswith("."):
-            return package_name + raw_name
-        elif "." not in raw_name:
-            # 不包含 '.' 则视为相对路径
-            return f"{package_name}.{raw_name}"
-        else:
-            # 已经是绝对路径
-            return raw_name
-
-    def _parse_intent_filters(self, activity_element: Element):
-        """
-        解析 <activity> 下的 <intent-filter> 信息。
-        每个 intent-filter 返回结构：
-        {
-          "actions": [...],
-          "categories": [...],
-          "datas": [
-             {
-                "scheme": <str或None>,
-                "host": <str或None>,
-                "port": <str或None>,
-                "path": <str或None>,
-                "pathPrefix": <str或None>,
-                "pathPattern": <str或None>,
-                "mimeType": <str或None>
-             }, ...
-          ]
-        }
-        """
-        result = []
-        intent_filters = activity_element.getElementsByTagName("intent-filter")
-        for f in intent_filters:
-            # 1) 收集 actions
-            action_list = []
-            for act in f.getElementsByTagName("action"):
-                action_name = act.getAttribute("android:name")
-                if action_name:
-                    action_list.append(action_name)
-
-            # 2) 收集 categories
-            category_list = []
-            for cat in f.getElementsByTagName("category"):
-                cat_name = cat.getAttribute("android:name")
-                if cat_name:
-                    category_list.append(cat_name)
-
-            # 3) 收集 data
-            data_list = []
-            for d in f.getElementsByTagName("data"):
-                data_attrs = {
-                    "scheme": d.getAttribute("android:scheme") or None,
-                    "host": d.getAttribute("android:host") or None,
-                    "port": d.getAttribute("android:port") or None,
-                    "path": d.getAttribute("android:path") or None,
-                    "pathPrefix": d.getAttribute("android:pathPrefix") or None,
-                    "pathPattern": d.getAttribute("android:pathPattern") or None,
-                    "mimeType": d.getAttribute("android:mimeType") or None
-                }
-                data_list.append(data_attrs)
-
-            # 若没有 <data> 标签，也加一个空数据，以便后续构造 Intent 时考虑
-            if not data_list:
-                data_list.append({
-                    "scheme": None,
-                    "host": None,
-                    "port": None,
-                    "path": None,
-                    "pathPrefix": None,
-                    "pathPattern": None,
-                    "mimeType": None
-                })
-
-            filter_obj = {
-                "actions": action_list,
-                "categories": category_list,
-                "datas": data_list
-            }
-            result.append(filter_obj)
-
-        return result
-
 
 class ActivityInspector:
     """
@@ -193,97 +105,414 @@ class ActivityInspector:
         return False
 
 
+ANALYSIS_SHEET = "Activity_Analysis"
+TEST_SHEET = "AttackSurfaceTest"
+
+ANALYSIS_HEADERS = [
+    "ActivityName",
+    "Exported(Raw)",
+    "Permission",
+    "IntentFilterCount",
+    "IsAttackSurface",
+    "IntentFilters(JSON)"
+]
+
+TEST_HEADERS = [
+    "ActivityName",
+    "FilterIndex",
+    "Actions",
+    "Categories",
+    "DataAttrs(JSON)",
+    "ConstructedIntent",
+    "TestResult"
+]
+
+
+def analysis_row(activity_info):
+    """
+    将一条 Activity 信息转换为 Activity_Analysis 的一行，'IsAttackSurface' 列通过 ActivityInspector 判定
+    """
+    is_attack = ActivityInspector.is_attack_surface(activity_info)
+    return [
+        activity_info["activityName"],
+        activity_info["exported"] if activity_info["exported"] else "",
+        activity_info["permission"] if activity_info["permission"] else "",
+        len(activity_info["intent_filters"]),
+        str(is_attack),
+        json.dumps(activity_info["intent_filters"], ensure_ascii=False)
+    ]
+
+
+def test_result_row(item):
+    """
+    将一条测试结果转换为 AttackSurfaceTest 的一行。item 格式：
+    {
+      "activityName": ...,
+      "filterIndex": int,
+      "actions": [...],
+      "categories": [...],
+      "dataAttrs": { ... },
+      "constructedIntent": <str>,
+      "testResult": <str>
+    }
+    """
+    return [
+        item["activityName"],
+        item["filterIndex"],
+        ", ".join(item["actions"]) if item["actions"] else "",
+        ", ".join(item["categories"]) if item["categories"] else "",
+        json.dumps(item["dataAttrs"], ensure_ascii=False),
+        item["constructedIntent"],
+        item["testResult"]
+    ]
+
+
 class ExcelReporter:
     """
     将结果输出到 Excel 文件，包含两个工作表：
       1) Activity_Analysis：每个 Activity 详细信息（是否攻击面）
       2) AttackSurfaceTest：对攻击面 Activity 做测试时的 Intent 及结果
+    整个工作簿保存在内存中，save() 时才写入文件；大批量结果请使用 StreamingExcelReporter 或其他 *Reporter。
     """
 
     def __init__(self, output_xlsx):
+        import openpyxl  # pip install openpyxl
+
         self.output_xlsx = output_xlsx
         # 创建工作簿与工作表
         self.wb = openpyxl.Workbook()
         # 第一个表：记录 Activity 详情
         self.ws_analysis = self.wb.active
-        self.ws_analysis.title = "Activity_Analysis"
+        self.ws_analysis.title = ANALYSIS_SHEET
 
         # 第二个表：记录测试情况
-        self.ws_test = self.wb.create_sheet("AttackSurfaceTest")
+        self.ws_test = self.wb.create_sheet(TEST_SHEET)
 
         # 初始化表头
         self._init_sheets()
 
     def _init_sheets(self):
-        # Activity_Analysis
-        headers_analysis = [
-            "ActivityName",
-            "Exported(Raw)",
-            "Permission",
-            "IntentFilterCount",
-            "IsAttackSurface",
-            "IntentFilters(JSON)"
-        ]
-        self.ws_analysis.append(headers_analysis)
-
-        # AttackSurfaceTest
-        headers_test = [
-            "ActivityName",
-            "FilterIndex",
-            "Actions",
-            "Categories",
-            "DataAttrs(JSON)",
-            "ConstructedIntent",
-            "TestResult"
-        ]
-        self.ws_test.append(headers_test)
+        self.ws_analysis.append(ANALYSIS_HEADERS)
+        self.ws_test.append(TEST_HEADERS)
 
     def write_analysis(self, activities_info):
         """
         将所有 Activity 信息写入 'Activity_Analysis' 表。
-        其中 'IsAttackSurface' 列通过 ActivityInspector 判定。
         """
         for activity_info in activities_info:
-            is_attack = ActivityInspector.is_attack_surface(activity_info)
-            row_data = [
-                activity_info["activityName"],
-                activity_info["exported"] if activity_info["exported"] else "",
-                activity_info["permission"] if activity_info["permission"] else "",
-                len(activity_info["intent_filters"]),
-                str(is_attack),
-                json.dumps(activity_info["intent_filters"], ensure_ascii=False)
-            ]
-            self.ws_analysis.append(row_data)
+            self.ws_analysis.append(analysis_row(activity_info))
 
     def write_test_result(self, test_results):
         """
-        将测试结果写入 'AttackSurfaceTest' 表。
-        test_results 中的每一条记录格式：
-        {
-          "activityName": ...,
-          "filterIndex": int,
-          "actions": [...],
-          "categories": [...],
-          "dataAttrs": { ... },
-          "constructedIntent": <str>,
-          "testResult": <str>
-        }
+        将测试结果写入 'AttackSurfaceTest' 表，每条记录的格式见 test_result_row。
         """
         for item in test_results:
-            row_data = [
-                item["activityName"],
-                item["filterIndex"],
-                ", ".join(item["actions"]) if item["actions"] else "",
-                ", ".join(item["categories"]) if item["categories"] else "",
-                json.dumps(item["dataAttrs"], ensure_ascii=False),
-                item["constructedIntent"],
-                item["testResult"]
-            ]
-            self.ws_test.append(row_data)
+            self.ws_test.append(test_result_row(item))
 
     def save(self):
         self.wb.save(self.output_xlsx)
 
+    def output_files(self):
+        """
+        save() 写出的文件路径列表
+        """
+        return [self.output_xlsx]
+
+
+class StreamingExcelReporter(ExcelReporter):
+    """
+    基于 openpyxl write-only 工作簿的 ExcelReporter。
+    每行追加后即序列化到工作表的临时文件中，内存占用与行数无关；save() 时把临时文件组装成 xlsx。
+    注意 xlsx 只能在 save() 时一次性生成，进程中途崩溃仍会丢失结果，需要崩溃安全时请使用 JSONL/CSV。
+    """
+
+    def __init__(self, output_xlsx):
+        import openpyxl  # pip install openpyxl
+
+        self.output_xlsx = output_xlsx
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.ws_analysis = self.wb.create_sheet(ANALYSIS_SHEET)
+        self.ws_test = self.wb.create_sheet(TEST_SHEET)
+        self._init_sheets()
+
+
+class _SheetFileReporter:
+    """
+    按工作表拆分为多个文件的输出基类：<输出文件名去掉扩展名>_<工作表名><扩展名>，
+    例如 result.csv -> result_Activity_Analysis.csv、result_AttackSurfaceTest.csv。
+    子类实现 _open_sheet / _write_rows / _close_sheet。
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        stem, ext = os.path.splitext(output_path)
+        self.paths = {sheet: f"{stem}_{sheet}{ext}" for sheet in (ANALYSIS_SHEET, TEST_SHEET)}
+        self._sheets = {
+            ANALYSIS_SHEET: self._open_sheet(self.paths[ANALYSIS_SHEET], ANALYSIS_HEADERS),
+            TEST_SHEET: self._open_sheet(self.paths[TEST_SHEET], TEST_HEADERS),
+        }
+
+    def write_analysis(self, activities_info):
+        self._write_rows(self._sheets[ANALYSIS_SHEET], [analysis_row(a) for a in activities_info])
+
+    def write_test_result(self, test_results):
+        self._write_rows(self._sheets[TEST_SHEET], [test_result_row(item) for item in test_results])
+
+    def save(self):
+        for sheet in self._sheets.values():
+            self._close_sheet(sheet)
+        self._sheets = {}
+
+    def output_files(self):
+        return list(self.paths.values())
+
+    def _open_sheet(self, path, headers):
+        raise NotImplementedError
+
+    def _write_rows(self, sheet, rows):
+        raise NotImplementedError
+
+    def _close_sheet(self, sheet):
+        raise NotImplementedError
+
+
+class CsvReporter(_SheetFileReporter):
+    """
+    每个工作表一个 CSV 文件，每次写入后立即 flush，进程崩溃时已写入的行不会丢失。
+    """
+
+    def _open_sheet(self, path, headers):
+        f = open(path, "w", newline="", encoding="utf-8-sig")
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        f.flush()
+        return f, writer
+
+    def _write_rows(self, sheet, rows):
+        f, writer = sheet
+        writer.writerows(rows)
+        f.flush()
+
+    def _close_sheet(self, sheet):
+        sheet[0].close()
+
+
+class JsonlReporter(_SheetFileReporter):
+    """
+    每个工作表一个 JSON Lines 文件，每行一个以表头为键的对象，每次写入后立即 flush。
+    """
+
+    def _open_sheet(self, path, headers):
+        return open(path, "w", encoding="utf-8"), headers
+
+    def _write_rows(self, sheet, rows):
+        f, headers = sheet
+        for row in rows:
+            f.write(json.dumps(dict(zip(headers, row)), ensure_ascii=False) + "\n")
+        f.flush()
+
+    def _close_sheet(self, sheet):
+        sheet[0].close()
+
+
+class ParquetReporter(_SheetFileReporter):
+    """
+    每个工作表一个 Parquet 文件（需要 pyarrow）。行先缓存在内存中，满 row_group_size 行写出一个 row group，
+    内存占用受 row_group_size 限制；Parquet 文件尾在 save() 时写入，崩溃时文件不可读。
+    """
+
+    INT_COLUMNS = {"IntentFilterCount", "FilterIndex"}
+
+    def __init__(self, output_path, row_group_size=50000):
+        try:
+            import pyarrow  # 可选，仅 .parquet 输出需要
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("输出 Parquet 需要安装 pyarrow: pip install pyarrow")
+        self.pa, self.pq = pyarrow, pyarrow.parquet
+        self.row_group_size = row_group_size
+        super().__init__(output_path)
+
+    def _open_sheet(self, path, headers):
+        pa = self.pa
+        schema = pa.schema([(h, pa.int64() if h in self.INT_COLUMNS else pa.string()) for h in headers])
+        return {"writer": self.pq.ParquetWriter(path, schema), "schema": schema, "rows": []}
+
+    def _write_rows(self, sheet, rows):
+        sheet["rows"].extend(rows)
+        if len(sheet["rows"]) >= self.row_group_size:
+            self._flush(sheet)
+
+    def _flush(self, sheet):
+        if not sheet["rows"]:
+            return
+        columns = list(zip(*sheet["rows"]))
+        table = self.pa.Table.from_arrays(
+            [self.pa.array(col, type=field.type) for col, field in zip(columns, sheet["schema"])],
+            schema=sheet["schema"]
+        )
+        sheet["writer"].write_table(table)
+        sheet["rows"] = []
+
+    def _close_sheet(self, sheet):
+        self._flush(sheet)
+        sheet["writer"].close()
+
+
+REPORTERS = {
+    ".xlsx": StreamingExcelReporter,
+    ".csv": CsvReporter,
+    ".jsonl": JsonlReporter,
+    ".parquet": ParquetReporter,
+}
+
+
+def create_reporter(output_path):
+    """
+    按输出文件扩展名选择 Reporter：.xlsx / .csv / .jsonl / .parquet
+    """
+    ext = os.path.splitext(output_path)[1].lower()
+    if ext not in REPORTERS:
+        raise ValueError(f"不支持的输出格式: {ext}（可选 {', '.join(REPORTERS)}）")
+    return REPORTERS[ext](output_path)
+
+
+def simple_glob_example(pattern):
+    """
+    为 simple glob 生成一个能匹配它的路径示例：带 '*' 的部分取零次，'.' 取 'a'。
+    路径总以 '/' 开头，开头的 ".*" 取零次会丢掉 '/'（如 ".*\\.pdf" 得到 ".pdf"），
+    因此依次尝试最短示例、前面补 "/a"、前面补 "/"，返回第一个以 '/' 开头且确实匹配的
+    """
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\" and i + 1 < len(pattern):
+            i += 1
+            c = pattern[i]
+        elif c == ".":
+            c = "a"
+        i += 1
+        if i < len(pattern) and pattern[i] == "*":
+            i += 1
+            continue
+        out.append(c)
+    example = "".join(out)
+    for candidate in (example, "/a" + example, "/" + example):
+        if candidate.startswith("/") and simple_glob_match(pattern, candidate):
+            return candidate
+    return "/" + example.lstrip("/")
+
+
+def merge_data_attrs(datas):
+    """
+    把一个 intent-filter 的全部 <data> 合并为一个属性 dict（与 IntentFilterData 一样按属性取并集，而不是只看第一条）：
+    某属性只有一个取值时保留该值，有多个不同取值时为按出现顺序排列的列表，都未声明时为 None
+    """
+    merged = {}
+    for d in datas:
+        for key, value in d.items():
+            values = merged.setdefault(key, [])
+            if value is not None and value not in values:
+                values.append(value)
+    return {key: values[0] if len(values) == 1 else values or None for key, values in merged.items()}
+
+
+class IntentFilterData:
+    """
+    一个 intent-filter 的全部 <data> 条目，按 Android IntentFilter.matchData 的规则判断 URI 能否匹配：
+      - 同一 filter 内各 <data> 的 scheme/host/path 属性合并为集合，而不是逐条组合
+      - 未声明 scheme 时只接受无 scheme 的 data；若声明了 mimeType，另外隐式接受 content: 与 file:
+      - 声明了 host 时 URI 必须匹配其中之一（"*" 开头为后缀通配，忽略大小写），声明了 port 时端口必须相同
+      - 只有声明了 host 时才检查 path/pathPrefix/pathPattern
+    """
+
+    def __init__(self, datas):
+        self.schemes = []
+        self.authorities = []   # [(host, port)]
+        self.paths = []         # [(kind, value)]，kind 为 path/pathPrefix/pathPattern
+        self.types = []
+        for d in datas:
+            if d["scheme"] and d["scheme"] not in self.schemes:
+                self.schemes.append(d["scheme"])
+            if d["host"] and (d["host"].lower(), d["port"]) not in self.authorities:
+                self.authorities.append((d["host"].lower(), d["port"]))
+            for kind in ("path", "pathPrefix", "pathPattern"):
+                if d[kind] and (kind, d[kind]) not in self.paths:
+                    self.paths.append((kind, d[kind]))
+            if d["mimeType"] and d["mimeType"] not in self.types:
+                self.types.append(d["mimeType"])
+
+    def match(self, uri):
+        parts = urlsplit(uri)
+        if not self.schemes:
+            return parts.scheme in (("", "content", "file") if self.types else ("",))
+        if parts.scheme not in self.schemes:
+            return False
+        if not self.authorities:
+            return True
+        try:
+            port = parts.port
+        except ValueError:
+            return False
+        host = parts.hostname or ""
+        if not any(self._match_host(h, host) and (p is None or str(port) == p) for h, p in self.authorities):
+            return False
+        return not self.paths or any(self._match_path(kind, value, parts.path) for kind, value in self.paths)
+
+    @staticmethod
+    def _match_host(filter_host, host):
+        if filter_host.startswith("*"):
+            return host.endswith(filter_host[1:])
+        return host == filter_host
+
+    def _match_path(self, kind, value, path):
+        if kind == "path":
+            return path == value
+        if kind == "pathPrefix":
+            return path.startswith(value)
+        return simple_glob_match(value, path)
+
+    def synthesize(self, payloads, target_url):
+        """
+        根据 payload 列表生成该 filter 能匹配的 data URI（去重并保持顺序）。
+        payload 为普通 URL 时只做匹配检查；含 {} 占位符时视为模板，用 filter 声明的属性展开后再检查：
+          {scheme} {host} {port}（":端口" 或空） {path} {target_url} {url}（URL 编码后的 target_url）
+        """
+        # 未声明 scheme 时，只有声明了 mimeType 的 filter 才能接受 content:/file: 形式的 data
+        schemes = self.schemes or (["content", "file"] if self.types else [])
+        target = urlsplit(target_url)
+        default_host = target.hostname or "localhost"
+        hosts = [(self._example_host(h, default_host), p) for h, p in self.authorities] or [(default_host, None)]
+        paths = [simple_glob_example(v) if kind == "pathPattern" else v for kind, v in self.paths]
+        paths = paths or [target.path or "/"]
+
+        uris = []
+        for payload in payloads:
+            if "{" not in payload:
+                candidates = [payload]
+            else:
+                candidates = [
+                    payload.format(scheme=scheme, host=host, port=f":{port}" if port else "", path=path,
+                                   target_url=target_url, url=quote(target_url, safe=""))
+                    for scheme in schemes
+                    for host, port in hosts
+                    for path in paths
+                ]
+            for uri in candidates:
+                if uri not in uris and self.match(uri):
+                    uris.append(uri)
+        return uris
+
+    @staticmethod
+    def _example_host(filter_host, default_host):
+        if filter_host == "*":
+            return default_host
+        if filter_host.startswith("*"):
+            suffix = filter_host[1:]
+            return "www" + suffix if suffix.startswith(".") else "www." + suffix
+        return filter_host
+
 
 class IntentBuilder:
     """
@@ -291,11 +520,19 @@ class IntentBuilder:
     每个 Activity 可能有多个 intent-filter，每个 filter 可能有多个 actions/categories/datas。
     示例中我们仅选用 '第一个 action' + '全部 category' + '每个 data组合' 去构造 Intent，
     并添加多种变体（data 传递URL、extra 传递URL等）。
+    指定 payloads 时进入 payload 矩阵模式：按每个 filter 的 data 声明生成它能匹配的 URI（见 IntentFilterData），
+    不能匹配的组合在构造阶段即被剔除。
     你可以根据需要自由扩展。
     """
-    def __init__(self, package_name, target_url):
+    def __init__(self, package_name, target_url, payloads=None):
+        """
+        :param package_name: 应用包名
+        :param target_url: 测试时使用的 URL
+        :param payloads: payload 矩阵模式下的 URL 或 URL 模板列表，None 表示使用固定的 A~D 四种变体
+        """
         self.package_name = package_name
         self.target_url = target_url
+        self.payloads = payloads
 
     def build_intents_for_activity(self, activity_info):
         """
@@ -309,89 +546,872 @@ class IntentBuilder:
            "dataAttrs": { ... },
            "constructedIntent": <str>
         }
+        需要逐条消费时请使用 iter_intents_for_activity，避免一次性生成全部命令。
+        """
+        return list(self.iter_intents_for_activity(activity_info))
+
+    def _variants(self, intent_filter):
+        """
+        演示多种 URL 传递方式，返回 [(data, mimeType, extras), ...]，extras 为 ((类型参数, 键, 值), ...)：
+          (A) data 直接传递 URL
+          (B) extra 传递 URL
+          (C) JSON 封装后放 extra
+          (D) data + extra 组合
+        payload 矩阵模式下对该 filter 能匹配的每个 URI 生成 (A)(D)，filter 声明了 mimeType 时一并带上 -t；
+        (B)(C) 不带 data，只有未声明 scheme 的 filter（包括没有任何 <data> 的 filter）能匹配，
+        filter 声明了 mimeType 时同样带上 -t
+        """
+        json_payload = json.dumps({"url": self.target_url})
+        url_extra = (("-e", "url", f'"{self.target_url}"'),)
+        json_extra = (("-e", "json", f"'{json_payload}'"),)
+        target_extra = (("-e", "target", f'"{self.target_url}"'),)
+        if self.payloads is not None:
+            data_spec = IntentFilterData(intent_filter["datas"])
+            mime = data_spec.types[0] if data_spec.types else None
+            variants = []
+            if not data_spec.schemes:
+                variants.append((None, mime, url_extra))
+                variants.append((None, mime, json_extra))
+            for uri in data_spec.synthesize(self.payloads, self.target_url):
+                variants.append((uri, mime, ()))
+                variants.append((uri, mime, target_extra))
+            return variants
+
+        return [
+            (self.target_url, None, ()),
+            (None, None, url_extra),
+            (None, None, json_extra),
+            (self.target_url, None, target_extra),
+        ]
+
+    def iter_intents_for_activity(self, activity_info):
+        """
+        build_intents_for_activity 的生成器版本，按需逐条产出命令。
+          - 同一 Activity 内按实际生效的 (component, action, categories, data, extras) 去重：
+            命令只使用第一个 action，category 与顺序无关，data 项本身不影响命令，
+            因此只在这些属性上有差别的 filter/data 不会重复发送
+          - dataAttrs 为该 filter 全部 <data> 合并后的属性（见 merge_data_attrs），同一 filter 的各条命令共用；
+            actions/categories 直接引用 filter 中的对象，不做拷贝，调用方不应修改
+        """
+        if not ActivityInspector.is_attack_surface(activity_info):
+            return  # 非攻击面就不构造任何命令
+
+        component = f"{self.package_name}/{activity_info['activityName']}"
+        seen = set()
+        for idx, f in enumerate(activity_info["intent_filters"]):
+            # 固定变体总是携带 data，没有 <data> 的 filter 无法匹配；payload 矩阵模式下仍可生成只带 extra 的变体
+            if not f["datas"] and self.payloads is None:
+                continue
+            # 仅使用第一个 action；没有 action 时只能显式启动
+            action = f["actions"][0] if f["actions"] else ""
+            categories = tuple(sorted(set(f["categories"])))
+
+            base_cmd = f"adb shell am start -n {component}"
+            if action:
+                base_cmd += f" -a {action}"
+            for cat in f["categories"]:
+                base_cmd += f" -c {cat}"
+
+            data_attrs = merge_data_attrs(f["datas"])
+            for data, mime, extras in self._variants(f):
+                key = (component, action, categories, (data, mime), extras)
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                cmd = base_cmd
+                if data is not None:
+                    cmd += f' -d "{data}"'
+                if mime is not None:
+                    cmd += f" -t {mime}"
+                for flag, name, value in extras:
+                    cmd += f" {flag} {name} {value}"
+                yield {
+                    "activityName": activity_info["activityName"],
+                    "filterIndex": idx,
+                    "actions": f["actions"],     # 记录下来便于查看
+                    "categories": f["categories"],
+                    "dataAttrs": data_attrs,
+                    "constructedIntent": cmd
+                }
+
+
+# IntentBuilder 生成的命令形如 "adb shell am start ..."，该前缀之后的部分在设备 shell 中执行
+ADB_SHELL_PREFIX = "adb shell "
+
+
+def device_command(cmd):
+    """
+    去掉 "adb shell " 前缀，返回需要在设备 shell 中执行的命令串
+    """
+    return cmd[len(ADB_SHELL_PREFIX):] if cmd.startswith(ADB_SHELL_PREFIX) else cmd
+
+
+def judge_output(returncode, out):
+    """
+    根据退出码与输出判断 am start 是否执行成功，返回 (success, output)
+    """
+    if returncode != 0:
+        return False, out
+    # 若输出中包含异常信息也视为失败
+    if "Exception" in out or "Error" in out:
+        return False, out
+    return True, out
+
+
+class AdbSessionError(Exception):
+    """
+    adb shell 会话断开或命令超时
+    """
+
+
+class AdbShellSession:
+    """
+    一个长期存活的 adb shell 会话。
+    命令经 stdin 逐条写入，每条命令后追加 echo <哨兵>:$?，
+    从 stdout 中读到哨兵即得到该命令的完整输出与退出码，无需为每条命令重新启动 adb 与建立设备连接。
+    """
+
+    def __init__(self, adb="adb", serial=None):
+        """
+        :param adb: adb 可执行文件路径（测试时可指向模拟 adb 的脚本）
+        :param serial: 设备序列号，None 表示使用 adb 默认设备
+        """
+        self.adb = adb
+        self.serial = serial
+        self.proc = None
+        self._lines = None
+        self._counter = itertools.count()
+        self.start()
+
+    def start(self):
+        args = [self.adb] + (["-s", self.serial] if self.serial else []) + ["shell"]
+        self.proc = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            bufsize=1
+        )
+        self._lines = queue.Queue()
+        threading.Thread(target=self._pump, args=(self.proc, self._lines), daemon=True).start()
+
+    @staticmethod
+    def _pump(proc, lines):
+        # 后台线程持续读取 stdout，使 run() 可以带超时地等待输出
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def run(self, command, timeout=30):
+        """
+        在会话中执行一条设备端命令，返回 (returncode, output)。
+        会话断开或超时时关闭会话并抛出 AdbSessionError。
         """
-        is_attack = ActivityInspector.is_attack_surface(activity_info)
-        if not is_attack:
-            return []  # 非攻击面就不构造任何命令
+        token = f"__AA_DONE_{next(self._counter)}__:"
+        try:
+            self.proc.stdin.write(f"{command} 2>&1; echo {token}$?\n")
+            self.proc.stdin.flush()
+        except (OSError, ValueError) as e:
+            self.close()
+            raise AdbSessionError(f"写入 adb shell 失败: {e}")
+
+        deadline = time.monotonic() + timeout
+        out = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.close()
+                raise AdbSessionError(f"命令超时({timeout}s): {command}")
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                self.close()
+                raise AdbSessionError("adb shell 会话已断开: " + "".join(out))
+            pos = line.find(token)
+            if pos >= 0:
+                out.append(line[:pos])
+                code = line[pos + len(token):].strip()
+                return int(code) if code.lstrip("-").isdigit() else 1, "".join(out)
+            out.append(line)
+
+    def close(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+
+
+class AdbSessionPool:
+    """
+    同一设备上的一组 AdbShellSession，最多 size 个，按需创建并复用；断开的会话会被丢弃并在需要时重建。
+    """
+
+    def __init__(self, size=1, adb="adb", serial=None, timeout=30):
+        self.size = size
+        self.adb = adb
+        self.serial = serial
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def run(self, command):
+        """
+        借用一个会话执行设备端命令，返回 (returncode, output)；会话出错时 returncode 为 None
+        """
+        session = self._acquire()
+        try:
+            returncode, out = session.run(command, self.timeout)
+        except AdbSessionError as e:
+            self._discard()
+            return None, str(e)
+        except Exception:
+            session.close()
+            self._discard()
+            raise
+        self._idle.put(session)
+        return returncode, out
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return AdbShellSession(self.adb, self.serial)
+            except Exception:
+                self._discard()
+                raise
+        return self._idle.get()
+
+    def _discard(self):
+        with self._lock:
+            self._created -= 1
+
+    def close(self):
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            session.close()
+            self._discard()
+
+
+# adb 输出中表示设备已断开/不可用的特征
+DEVICE_LOST_PATTERN = re.compile(
+    r"device '[^']*' not found|device offline|no devices/emulators found|device unauthorized|adb shell 会话已断开"
+)
+
+
+def list_adb_devices(adb="adb"):
+    """
+    执行 adb devices，返回状态为 device（已连接且已授权）的设备序列号列表
+    """
+    proc = subprocess.run([adb, "devices"], capture_output=True, text=True, timeout=30)
+    serials = []
+    for line in proc.stdout.splitlines()[1:]:
+        parts = line.split()
+        if len(parts) >= 2 and parts[1] == "device":
+            serials.append(parts[0])
+    return serials
+
+
+def is_device_lost(output):
+    return DEVICE_LOST_PATTERN.search(output) is not None
+
+
+def target_package(item):
+    """
+    从构造的命令（"... am start -n <package>/<activity> ..."）中取出目标应用包名
+    """
+    match = re.search(r"-n\s+([^/\s]+)/", item["constructedIntent"])
+    return match.group(1) if match else item["activityName"]
+
+
+class DeviceScheduler:
+    """
+    将 Intent 分片到多台设备上执行。
+      - 每台设备有 workers_per_device 个工作线程，空闲时才向调度器取任务，处理快的设备自然分到更多任务
+      - 任务按目标应用分组：设备优先继续处理它已经在跑的应用（应用进程已热），
+        否则领取剩余任务最多且尚无设备负责的应用，都没有时再从其他设备负责的应用中分担
+      - 执行结果判定为设备断开时，该设备下线，任务放回队首由其他设备重试（最多 max_attempts 次）
+      - 输入按需读取，缓冲的任务数不超过 buffer_size
+    """
+
+    def __init__(self, devices, run, workers_per_device=1, max_attempts=3, buffer_size=None):
+        """
+        :param devices: 设备序列号列表
+        :param run: run(serial, item) -> (success, output, transient)，transient 表示 adb 层面的失败（设备断开、超时等）
+        """
+        self.devices = list(devices)
+        self.run = run
+        self.workers_per_device = workers_per_device
+        self.max_attempts = max_attempts
+        self.buffer_size = buffer_size or 64 * max(1, len(self.devices))
+        self.dead = set()
+        self._cond = threading.Condition()
+
+    def run_all(self, items):
+        """
+        生成器：按完成顺序产出 (serial, item, success, output, transient)
+        """
+        self._items = iter(items)
+        self._exhausted = False
+        self._queues = {}          # package -> deque[(item, attempts)]
+        self._buffered = 0
+        self._affinity = {serial: set() for serial in self.devices}
+        self._owner_count = {}     # package -> 负责它的设备数
+        self._in_flight = 0
+        self._results = queue.Queue()
+
+        threads = []
+        for serial in self.devices:
+            for _ in range(self.workers_per_device):
+                t = threading.Thread(target=self._worker, args=(serial,), daemon=True)
+                t.start()
+                threads.append(t)
+
+        finished = 0
+        while finished < len(threads):
+            result = self._results.get()
+            if result is None:
+                finished += 1
+                continue
+            yield result
+
+        # 所有设备都已下线时，剩余任务直接记为失败
+        with self._cond:
+            self._refill(force_all=True)
+            remaining = [item for package_queue in self._queues.values() for item, _ in package_queue]
+            self._queues.clear()
+        for item in remaining:
+            yield None, item, False, "无可用设备", True
+
+    def _worker(self, serial):
+        try:
+            while True:
+                entry = self._next_for(serial)
+                if entry is None:
+                    return
+                item, attempts = entry
+                try:
+                    success, output, transient = self.run(serial, item)
+                except Exception as e:
+                    success, output, transient = False, str(e), False
+
+                if transient and is_device_lost(output):
+                    self._device_lost(serial, item, attempts, output)
+                    return
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+                self._results.put((serial, item, success, output, transient))
+        finally:
+            self._results.put(None)
+
+    def _device_lost(self, serial, item, attempts, output):
+        with self._cond:
+            self._in_flight -= 1
+            first_report = serial not in self.dead
+            self.dead.add(serial)
+            for package in self._affinity.pop(serial, ()):
+                self._owner_count[package] -= 1
+            if attempts + 1 < self.max_attempts:
+                package = target_package(item)
+                self._queues.setdefault(package, deque()).appendleft((item, attempts + 1))
+                self._buffered += 1
+            else:
+                self._results.put((serial, item, False, output, True))
+            self._cond.notify_all()
+        if first_report:
+            print(f"[!] 设备 {serial} 已断开，其任务将由其他设备重试")
+
+    def _refill(self, force_all=False):
+        while not self._exhausted and (force_all or self._buffered < self.buffer_size):
+            item = next(self._items, None)
+            if item is None:
+                self._exhausted = True
+                break
+            self._queues.setdefault(target_package(item), deque()).append((item, 0))
+            self._buffered += 1
+
+    def _next_for(self, serial):
+        with self._cond:
+            while True:
+                if serial in self.dead:
+                    return None
+                self._refill()
+                package = self._pick_package(serial)
+                if package is not None:
+                    entry = self._queues[package].popleft()
+                    self._buffered -= 1
+                    self._in_flight += 1
+                    return entry
+                if self._exhausted and self._in_flight == 0:
+                    self._cond.notify_all()
+                    return None
+                # 队列暂空，但在途任务可能因设备断开被放回
+                self._cond.wait()
+
+    def _pick_package(self, serial):
+        warm = [p for p in self._affinity[serial] if self._queues.get(p)]
+        if warm:
+            return max(warm, key=lambda p: len(self._queues[p]))
+        candidates = [p for p, q in self._queues.items() if q]
+        if not candidates:
+            return None
+        # 优先无人负责的应用，其次负责设备最少、剩余任务最多的应用
+        package = min(candidates, key=lambda p: (self._owner_count.get(p, 0), -len(self._queues[p])))
+        self._affinity[serial].add(package)
+        self._owner_count[package] = self._owner_count.get(package, 0) + 1
+        return package
+
+
+BATCH_BEGIN = "__AA_BEGIN__:"
+BATCH_END = "__AA_END__:"
+BATCH_REMOTE_DIR = "/data/local/tmp"
+
+
+def render_batch_script(commands, delay=0):
+    """
+    将一组设备端命令渲染为一个 sh 脚本。
+    每条命令前后输出带序号的起止标记，结束标记附带退出码，相邻命令之间在设备端 sleep delay 秒：
+        echo __AA_BEGIN__:0
+        am start ... 2>&1
+        echo __AA_END__:0:$?
+        sleep 2
+    """
+    lines = []
+    for index, command in enumerate(commands):
+        if index and delay > 0:
+            lines.append(f"sleep {delay:g}")
+        lines.append(f"echo {BATCH_BEGIN}{index}")
+        lines.append(f"{command} 2>&1")
+        lines.append(f"echo {BATCH_END}{index}:$?")
+    return "\n".join(lines) + "\n"
+
+
+def parse_batch_output(out, count):
+    """
+    解析 render_batch_script 生成的脚本输出，返回长度为 count 的 [(returncode, output), ...]。
+    未执行完（只有开始标记或没有任何标记）的命令 returncode 为 None。
+    命令输出不以换行结尾时结束标记紧跟在输出后面，因此与 AdbShellSession 一样在行内查找标记而不是只看行首；
+    序号不在 [0, count) 内的开始标记当作普通输出。
+    """
+    results = [(None, "")] * count
+    index, buf = None, []
+    for line in out.splitlines(keepends=True):
+        if index is not None:
+            end = f"{BATCH_END}{index}:"
+            pos = line.find(end)
+            if pos >= 0:
+                buf.append(line[:pos])
+                code = line[pos + len(end):].strip()
+                results[index] = (int(code) if code.lstrip("-").isdigit() else 1, "".join(buf))
+                index = None
+                continue
+        pos = line.find(BATCH_BEGIN)
+        if pos >= 0:
+            value = line[pos + len(BATCH_BEGIN):].strip()
+            if value.isdigit() and int(value) < count:
+                index, buf = int(value), []
+                results[index] = (None, "")
+                continue
+        if index is not None:
+            buf.append(line)
+            results[index] = (None, "".join(buf))
+    return results
+
+
+class BatchIntentRunner:
+    """
+    批量模式：把一批 Intent 渲染成一个 shell 脚本，一次 adb 往返执行完，再按标记把输出拆回每条 Intent。
+      - mode="pipe"：脚本经 stdin 交给 adb shell sh 执行
+      - mode="push"：脚本先 adb push 到设备 /data/local/tmp，再 adb shell sh 执行并删除
+    相邻 Intent 之间的间隔在设备端用 sleep 实现，不再占用主机与设备之间的往返。
+    """
+
+    def __init__(self, adb="adb", delay=0, mode="pipe", command_timeout=30):
+        """
+        :param adb: adb 可执行文件路径
+        :param delay: 脚本中相邻两条命令之间的 sleep 秒数
+        :param mode: "pipe" 或 "push"
+        :param command_timeout: 单条命令的超时（秒），整批的超时按条数累加
+        """
+        self.adb = adb
+        self.delay = delay
+        self.mode = mode
+        self.command_timeout = command_timeout
+
+    def run(self, serial, items):
+        """
+        在 serial 指定的设备上执行一批 Intent，返回与 items 一一对应的 [(item, success, output, transient), ...]，
+        未执行到或超时的命令 transient 为 True。
+        脚本输出按行流式读取，每条 item 的 "sentAt"/"doneAt" 记为主机收到其起止标记的时间，
+        供 logcat 按条划分窗口；未执行到的命令使用整批的起止时间
+        """
+        script = render_batch_script([device_command(item["constructedIntent"]) for item in items], self.delay)
+        timeout = len(items) * (self.command_timeout + self.delay)
+        base = [self.adb] + (["-s", serial] if serial else [])
+        sent_at = time.time()
+        try:
+            if self.mode == "push":
+                lines, timed_out = self._run_pushed(base, script, timeout)
+            else:
+                lines, timed_out = self._stream(base + ["shell", "sh"], timeout, script)
+            out = "".join(line for _, line in lines)
+            reason = f"批处理超时({timeout:g}s)" if timed_out else "脚本未执行到该命令: " + out[-200:]
+        except Exception as e:
+            lines, out, reason = [], "", str(e)
+        done_at = time.time()
+
+        begins, ends = {}, {}
+        for ts, line in lines:
+            pos = line.find(BATCH_BEGIN)
+            if pos >= 0:
+                begins.setdefault(line[pos + len(BATCH_BEGIN):].strip(), ts)
+            pos = line.find(BATCH_END)
+            if pos >= 0:
+                ends.setdefault(line[pos + len(BATCH_END):].split(":", 1)[0], ts)
 
         results = []
-        filters = activity_info["intent_filters"]
-        for idx, f in enumerate(filters):
-            # 根据第一个action + 全部category + 每个data进行组合
-            actions = f["actions"]
-            categories = f["categories"]
-            datas = f["datas"]
-
-            # 如果没有 actions，则可能只能显式启动
-            # 这里也可以考虑：若无 actions 就填 ACTION_VIEW 等默认值
-            if not actions:
-                # 直接构造一个显式启动的指令即可
-                actions = [""]  # 用空串代表无 action
-
-            for data_index, data_attrs in enumerate(datas):
-                # 先获取第一个action(示例只用第一个)
-                action_to_use = actions[0] if actions else None
-                # 构造基本 cmd
-                component = f"{self.package_name}/{activity_info['activityName']}"
-                base_cmd = f"adb shell am start -n {component}"
-
-                if action_to_use:
-                    base_cmd += f" -a {action_to_use}"
-
-                # 添加 category
-                for cat in categories:
-                    base_cmd += f" -c {cat}"
-
-                # 然后演示多种 URL 传递方式 (此处和之前思路相似):
-                # 1. data 传 URL
-                # 2. extra 传 URL
-                # 3. json 封装
-                # 4. data+extra 组合
-
-                constructed_cmds = []
-
-                # (A) data 直接传递 URL
-                cmd_a = base_cmd + f' -d "{self.target_url}"'
-                constructed_cmds.append(cmd_a)
-
-                # (B) extra 传递 URL
-                cmd_b = base_cmd + f' -e url "{self.target_url}"'
-                constructed_cmds.append(cmd_b)
-
-                # (C) JSON 封装后放 extra
-                json_payload = json.dumps({"url": self.target_url})
-                cmd_c = base_cmd + f" -e json '{json_payload}'"
-                constructed_cmds.append(cmd_c)
-
-                # (D) data + extra 组合
-                cmd_d = base_cmd + f' -d "{self.target_url}" -e target "{self.target_url}"'
-                constructed_cmds.append(cmd_d)
-
-                for c in constructed_cmds:
-                    results.append({
-                        "activityName": activity_info["activityName"],
-                        "filterIndex": idx,
-                        "actions": f["actions"],     # 记录下来便于查看
-                        "categories": f["categories"],
-                        "dataAttrs": data_attrs,
-                        "constructedIntent": c
-                    })
+        for index, (item, (returncode, output)) in enumerate(zip(items, parse_batch_output(out, len(items)))):
+            item["sentAt"] = begins.get(str(index), sent_at)
+            item["doneAt"] = ends.get(str(index), done_at)
+            if returncode is None:
+                results.append((item, False, output or reason, True))
+            else:
+                results.append((item, *judge_output(returncode, output), False))
         return results
 
+    @staticmethod
+    def _stream(args, timeout, stdin_text=None):
+        """
+        运行命令并逐行读取输出（stderr 合并到 stdout），返回 ([(收到该行的主机时间, 行), ...], 是否超时)
+        """
+        proc = subprocess.Popen(args, stdin=subprocess.PIPE if stdin_text is not None else subprocess.DEVNULL,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace")
+        lines = []
+
+        def pump():
+            for line in proc.stdout:
+                lines.append((time.time(), line))
+
+        reader = threading.Thread(target=pump, daemon=True)
+        reader.start()
+        if stdin_text is not None:
+            try:
+                proc.stdin.write(stdin_text)
+                proc.stdin.close()
+            except OSError:
+                pass  # adb 已退出（如设备不存在），输出中有原因
+        timed_out = False
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            proc.kill()
+            proc.wait()
+        reader.join(5)
+        return lines, timed_out
+
+    def _run_pushed(self, base, script, timeout):
+        remote = f"{BATCH_REMOTE_DIR}/aa_batch_{os.getpid()}_{threading.get_ident()}.sh"
+        with tempfile.NamedTemporaryFile("w", suffix=".sh", delete=False) as f:
+            f.write(script)
+            local = f.name
+        try:
+            push = subprocess.run(base + ["push", local, remote], capture_output=True, text=True,
+                                  timeout=self.command_timeout)
+            if push.returncode != 0:
+                return [(time.time(), push.stdout + push.stderr)], False
+        except subprocess.TimeoutExpired:
+            return [], True
+        finally:
+            os.remove(local)
+        return self._stream(base + ["shell", f"sh {remote}; rm -f {remote}"], timeout)
+
+
+# logcat -v threadtime 的行格式：MM-DD HH:MM:SS.mmm  PID  TID L TAG: message
+LOGCAT_LINE_PATTERN = re.compile(r"^\d\d-\d\d\s+[\d:.]+\s+(\d+)\s+(\d+)\s+([VDIWEFA])\s+(.*?)\s*: (.*)$")
+# ActivityManager 启动应用进程时的日志：Start proc 12345:com.example.app/u0a123 for activity ...
+# 第 2 组为包名，不含 ":" 之后的进程名后缀，应用的子进程（如 com.a:web）同样记在包名下
+START_PROC_PATTERN = re.compile(r"Start proc (\d+):([^/\s:]+)")
+SYSTEM_TAGS = ("ActivityManager", "ActivityTaskManager")
+
+
+class LogcatCollector:
+    """
+    一台设备上常驻的 adb logcat -v threadtime，后台线程逐行解析，事件存入有界环形缓冲区。
+    事件时间使用主机收到该行的时间，与发送 Intent 时记录的主机时间直接比较，不受设备时钟偏差影响。
+    另外在整个日志流上维护 包名 -> pid 的映射（来自 Start proc 行），不受缓冲区与发送窗口的限制；
+    收集器启动前就已在运行的进程没有 Start proc 行，由 pids_of 通过 adb shell pidof 补查。
+    start=False 时不启动 adb，可以通过 feed(line, ts) 回放录制的 logcat 做离线测试。
+    """
+
+    def __init__(self, adb="adb", serial=None, buffer_size=20000, start=True):
+        """
+        :param adb: adb 可执行文件路径（也可以指向输出录制 logcat 的替身脚本）
+        :param serial: 设备序列号，None 表示使用 adb 默认设备
+        :param buffer_size: 最多保留的事件数，超出后丢弃最旧的事件
+        """
+        self.adb = adb
+        self.serial = serial
+        self.events = deque(maxlen=buffer_size)  # (ts, pid, level, tag, message)
+        self.pids = {}            # 包名 -> {pid}
+        self._looked_up = set()   # 已经用 pidof 查过的包名
+        self.proc = None
+        self._lock = threading.Lock()
+        if start:
+            self.start()
+
+    def start(self):
+        # -T 1 只输出启动之后的新日志，不回放设备上已有的缓冲
+        args = [self.adb] + (["-s", self.serial] if self.serial else []) + ["logcat", "-v", "threadtime", "-T", "1"]
+        self.proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                                     errors="replace", bufsize=1)
+        threading.Thread(target=self._pump, args=(self.proc,), daemon=True).start()
+
+    def _pump(self, proc):
+        for line in proc.stdout:
+            self.feed(line)
+
+    def feed(self, line, ts=None):
+        """
+        解析一行 logcat 并存入缓冲区，无法解析的行（如 "--------- beginning of main"）忽略
+        :param ts: 该行的接收时间，默认为当前时间
+        """
+        match = LOGCAT_LINE_PATTERN.match(line.rstrip("\r\n"))
+        if match is None:
+            return
+        pid, _, level, tag, message = match.groups()
+        started = START_PROC_PATTERN.search(message) if tag in SYSTEM_TAGS else None
+        with self._lock:
+            self.events.append((time.time() if ts is None else ts, int(pid), level, tag, message))
+            if started:
+                self.pids.setdefault(started.group(2), set()).add(int(started.group(1)))
+
+    def pids_of(self, package):
+        """
+        返回目标应用已知的全部 pid。
+        日志流中从未出现过该应用的 Start proc 时（进程在收集器启动前已在运行），用 adb shell pidof 查一次；
+        回放模式（未启动 adb）下不查询
+        """
+        with self._lock:
+            known = set(self.pids.get(package, ()))
+            lookup = not known and self.proc is not None and package not in self._looked_up
+            if lookup:
+                self._looked_up.add(package)
+        if lookup:
+            args = [self.adb] + (["-s", self.serial] if self.serial else []) + ["shell", "pidof", package]
+            try:
+                out = subprocess.run(args, capture_output=True, text=True, errors="replace", timeout=10).stdout
+            except (OSError, subprocess.SubprocessError):
+                out = ""
+            found = {int(pid) for pid in out.split() if pid.isdigit()}
+            if found:
+                with self._lock:
+                    self.pids.setdefault(package, set()).update(found)
+                known |= found
+        return known
+
+    def window(self, start, end):
+        """
+        返回接收时间在 [start, end] 内的事件（按时间顺序）
+        """
+        found = []
+        with self._lock:
+            for event in reversed(self.events):
+                if event[0] < start:
+                    break
+                if event[0] <= end:
+                    found.append(event)
+        found.reverse()
+        return found
+
+    def close(self):
+        if self.proc is None:
+            return
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.proc = None
+
+
+class LogcatClassifier:
+    """
+    根据 Intent 发送窗口内的 logcat 事件给出结论，优先级从高到低：
+      - Crashed：目标应用进程崩溃（AndroidRuntime FATAL EXCEPTION、进程死亡、ANR）
+      - Rejected：系统拒绝启动（Permission Denial、SecurityException、未导出、找不到 Activity）
+      - Loaded：目标应用进程（含其子进程）的日志中出现了命令中携带的 URL 的 host；
+        WebView 的 chromium/Console 日志由应用进程输出，其他进程的同类日志不算
+      - NoEffect：以上都没有
+    ActivityManager/ActivityTaskManager 的 START 行会原样回显 Intent 的 data，不作为加载依据。
+    """
+
+    CRASH_PATTERN = re.compile(r"FATAL EXCEPTION|has died|Force finishing activity|ANR in|Process: ")
+    REJECT_PATTERN = re.compile(
+        r"Permission Denial|SecurityException|not exported|Unable to find explicit activity|ActivityNotFoundException"
+    )
+    URL_PATTERN = re.compile(r"[a-zA-Z][a-zA-Z0-9+.-]*://([^/\s\"':?#]+)")
+
+    def classify(self, item, events, pids=()):
+        """
+        :param pids: 目标应用在窗口之前就已知的 pid（LogcatCollector.pids_of），窗口内的 Start proc 行会另外补充
+        :return: "Crashed: <日志>" / "Rejected: <日志>" / "Loaded: <日志>" / "NoEffect"
+        """
+        package = target_package(item)
+        match = re.search(r"-n\s+(\S+)", item["constructedIntent"])
+        component = match.group(1) if match else package
+        hosts = {h.lower() for h in self.URL_PATTERN.findall(unquote(item["constructedIntent"]))}
+
+        app_pids = set(pids)
+        for _, _, _, tag, message in events:
+            started = START_PROC_PATTERN.search(message)
+            if tag in SYSTEM_TAGS and started and started.group(2) == package:
+                app_pids.add(int(started.group(1)))
+
+        crashed = rejected = loaded = None
+        for _, pid, level, tag, message in events:
+            if crashed is None and (
+                (tag == "AndroidRuntime" and (pid in app_pids or package in message))
+                or (self.CRASH_PATTERN.search(message) and package in message and tag != "AndroidRuntime")
+            ):
+                crashed = message
+            elif rejected is None and self.REJECT_PATTERN.search(message) and (
+                package in message or component in message
+            ):
+                rejected = message
+            elif loaded is None and tag not in SYSTEM_TAGS and pid in app_pids and any(h in message.lower() for h in hosts):
+                loaded = message
+
+        if crashed is not None:
+            return f"Crashed: {crashed}"
+        if rejected is not None:
+            return f"Rejected: {rejected}"
+        if loaded is not None:
+            return f"Loaded: {loaded}"
+        return "NoEffect"
+
+
+class RateLimiter:
+    """
+    按键（设备或目标应用）独立计时的令牌桶：每个键每 interval 秒补充一个令牌，最多积累 burst 个。
+    acquire() 在工作线程中调用，令牌不足时只阻塞当前线程；不同键之间互不影响。
+    """
+
+    def __init__(self, interval, burst=1):
+        self.interval = interval
+        self.burst = max(1, burst)
+        self._buckets = {}  # key -> [tokens, last_refill]
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) / self.interval)
+            # 令牌不足时预约一个未来的令牌（允许为负），等待时间由欠缺的令牌数决定
+            bucket[0] = tokens - 1
+            bucket[1] = now
+            wait_time = 0 if tokens >= 1 else (1 - tokens) * self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
 
 class IntentTester:
     """
     通过 ADB 发送上面构造的 Intent，并记录执行结果。
     """
 
-    def __init__(self, interval=2, concurrency=1):
+    def __init__(self, interval=2, concurrency=1, persistent=False, adb="adb", serial=None, command_timeout=30,
+                 pace_by="device", burst=1, devices=None, batch_size=0, batch_mode="pipe", logcat=False, settle=3.0,
+                 logcat_buffer=20000):
+        """
+        :param interval: 同一设备（或同一目标应用，见 pace_by）上相邻两条 Intent 的发送间隔（秒）
+        :param concurrency: 并发线程数；多设备模式下为每台设备的并发数
+        :param persistent: 为 True 时复用常驻的 adb shell 会话（AdbSessionPool，最多 concurrency 个）发送命令，
+                           不再为每条 Intent 启动一个 adb 进程
+        :param adb: adb 可执行文件路径
+        :param serial: 设备序列号，None 表示使用 adb 默认设备
+        :param command_timeout: 单条命令的超时（秒）
+        :param pace_by: 限速维度，"device" 按设备、"app" 按目标应用分别计时
+        :param burst: 每个限速键允许的突发条数
+        :param devices: 设备序列号列表，或 "all" 表示通过 adb devices 发现所有在线设备。
+                        指定后由 DeviceScheduler 将 Intent 分片到这些设备上执行，serial 参数被忽略
+        :param batch_size: 大于 0 时启用批量模式，每 batch_size 条 Intent 渲染为一个脚本、一次 adb 往返执行（BatchIntentRunner），
+                           interval 变为脚本内相邻命令之间的设备端 sleep，限速按批次、按设备进行
+        :param batch_mode: 批量模式下脚本的下发方式，"pipe" 或 "push"
+        :param logcat: 为 True 时每台设备常驻一个 LogcatCollector，成功发送的 Intent 在 settle 秒后
+                       按发送窗口内的日志由 LogcatClassifier 判定为 Loaded/Rejected/Crashed/NoEffect，不再记为 Pending
+        :param settle: Intent 发送完成后继续收集日志的秒数
+        :param logcat_buffer: 每台设备保留的 logcat 事件数上限
+        """
         self.interval = interval
         self.concurrency = concurrency
-
-    def test_intents(self, all_intent_cmds):
+        self.pace_by = pace_by
+        self.limiter = RateLimiter(interval, burst)
+        self.adb = adb
+        self.serial = serial
+        self.command_timeout = command_timeout
+        self.persistent = persistent
+        if devices == "all":
+            devices = list_adb_devices(adb)
+        self.devices = devices
+        self.batch_size = batch_size
+        self.batch_runner = BatchIntentRunner(adb, interval, batch_mode, command_timeout) if batch_size > 0 else None
+        self._pools = {}  # serial -> AdbSessionPool
+        self._pools_lock = threading.Lock()
+        self.logcat = logcat
+        self.settle = settle
+        self.logcat_buffer = logcat_buffer
+        self.classifier = LogcatClassifier()
+        self._collectors = {}  # serial -> LogcatCollector
+
+    def close(self):
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
+        for collector in self._collectors.values():
+            collector.close()
+        self._collectors.clear()
+
+    def _session_pool(self, serial):
+        with self._pools_lock:
+            pool = self._pools.get(serial)
+            if pool is None:
+                pool = self._pools[serial] = AdbSessionPool(self.concurrency, self.adb, serial, self.command_timeout)
+            return pool
+
+    def test_intents(self, all_intent_cmds, on_result=None):
         """
         批量测试所有构造的命令，控制并发和发送间隔。
-        all_intent_cmds 是一个列表，列表元素为:
+        all_intent_cmds 是一个可迭代对象，元素为:
         {
           "activityName": ...,
           "filterIndex": ...,
@@ -400,54 +1420,451 @@ class IntentTester:
           "dataAttrs": ...,
           "constructedIntent": ...
         }
-        最终返回包含 testResult 的结构同上，但多一项 "testResult"
+        最终返回包含 testResult 的结构同上，但多一项 "testResult"（按完成顺序排列）
+        :param on_result: 每完成一条就调用 on_result(result)，便于边测边输出
         """
         results = []
+        for result in self.iter_test_intents(all_intent_cmds):
+            if on_result is not None:
+                on_result(result)
+            results.append(result)
+        return results
+
+    def iter_test_intents(self, all_intent_cmds):
+        """
+        与 test_intents 相同，但以生成器形式按完成顺序逐条产出结果。
+        限速在工作线程内按 pace_by 键进行，提交线程从不 sleep；
+        同时在途的任务数不超过 2 * concurrency，输入可以是惰性的生成器。
+        多设备模式下交给 DeviceScheduler 分片执行，结果中额外带有 "device" 字段。
+        批量模式下调度与在途窗口的单位是一批 Intent，结果仍逐条产出。
+        每条结果带有 "sentAt"/"doneAt"（主机时间），启用 logcat 时据此按日志重新判定结果。
+        """
+        if self.logcat:
+            for serial in self.devices or [self.serial]:
+                if serial not in self._collectors:
+                    self._collectors[serial] = LogcatCollector(self.adb, serial, self.logcat_buffer)
+            yield from self._classify_results(self._iter_results(all_intent_cmds))
+        else:
+            yield from self._iter_results(all_intent_cmds)
+
+    def _classify_results(self, results):
+        """
+        结果先暂存，doneAt + settle 之后再取对应设备的日志窗口分类，工作线程不必等待日志
+        """
+        pending = deque()
+        for result in results:
+            pending.append(result)
+            while pending and time.time() >= pending[0]["doneAt"] + self.settle:
+                yield self._classify(pending.popleft())
+        while pending:
+            delay = pending[0]["doneAt"] + self.settle - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            yield self._classify(pending.popleft())
+
+    def _classify(self, result):
+        # adb 层面已失败的结果保持原样
+        if result["testResult"] != "Pending":
+            return result
+        collector = self._collectors.get(result.get("device", self.serial))
+        if collector is not None:
+            events = collector.window(result["sentAt"], result["doneAt"] + self.settle)
+            pids = collector.pids_of(target_package(result))
+            result["testResult"] = self.classifier.classify(result, events, pids)
+        return result
+
+    def _iter_results(self, all_intent_cmds):
+        if self.batch_runner is not None:
+            yield from self._iter_batches(all_intent_cmds)
+            return
+
+        if self.devices:
+            scheduler = DeviceScheduler(self.devices, self._test_one, workers_per_device=self.concurrency)
+            for serial, item, success, output, transient in scheduler.run_all(all_intent_cmds):
+                result = self._make_result(item, success, output, transient)
+                result["device"] = serial
+                yield result
+            return
+
+        window = self.concurrency * 2
+        items = iter(all_intent_cmds)
         with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
-            future_map = {}
-            for i, item in enumerate(all_intent_cmds):
-                # 间隔
-                if i != 0:
-                    time.sleep(self.interval)
-
-                cmd = item["constructedIntent"]
-                future = executor.submit(self._run_adb_command, cmd)
-                future_map[future] = item
-
-            for future in future_map:
-                item = future_map[future]
-                success, output = future.result()
-
-                ret_item = item.copy()
-                if success:
-                    # 可能只是表示ADB命令执行成功，并不代表一定加载URL
-                    # 需要人工查看日志，这里暂记为 "Pending"
-                    ret_item["testResult"] = "Pending"
-                else:
-                    ret_item["testResult"] = f"Failed: {output}"
-
-                results.append(ret_item)
+            in_flight = {}
+
+            def fill():
+                while len(in_flight) < window:
+                    item = next(items, None)
+                    if item is None:
+                        return
+                    in_flight[executor.submit(self._test_one, self.serial, item)] = item
+
+            fill()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = in_flight.pop(future)
+                    yield self._make_result(item, *future.result())
+                fill()
+
+    def _iter_batches(self, all_intent_cmds):
+        items = iter(all_intent_cmds)
+        # 每批包装成一个任务，沿用第一条的 constructedIntent/activityName，DeviceScheduler 据此做应用亲和
+        batches = (
+            {"activityName": chunk[0]["activityName"], "constructedIntent": chunk[0]["constructedIntent"], "batch": chunk}
+            for chunk in iter(lambda: list(itertools.islice(items, self.batch_size)), [])
+        )
+
+        if self.devices:
+            scheduler = DeviceScheduler(self.devices, self._test_batch, workers_per_device=self.concurrency)
+            for serial, batch, success, output, transient in scheduler.run_all(batches):
+                entries = output if success else [(item, False, output, transient) for item in batch["batch"]]
+                for entry in entries:
+                    result = self._make_result(*entry)
+                    result["device"] = serial
+                    yield result
+            return
 
-        return results
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            in_flight = {}  # future -> batch
+            for batch in itertools.islice(batches, self.concurrency * 2):
+                in_flight[executor.submit(self._test_batch, self.serial, batch)] = batch
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = in_flight.pop(future)
+                    success, output, transient = future.result()
+                    # 只有一台设备，断开时无处重试，整批记为失败
+                    entries = output if success else [(item, False, output, transient) for item in batch["batch"]]
+                    for entry in entries:
+                        yield self._make_result(*entry)
+                    batch = next(batches, None)
+                    if batch is not None:
+                        in_flight[executor.submit(self._test_batch, self.serial, batch)] = batch
+
+    def _test_batch(self, serial, batch):
+        """
+        执行一批 Intent，返回 (True, [(item, success, output, transient), ...], False)，
+        每条的 sentAt/doneAt 由 BatchIntentRunner 按标记写入；
+        整批都未执行且判定为设备断开时返回 (False, output, True)，交给 DeviceScheduler 换设备重试整批
+        """
+        self.limiter.acquire(serial)
+        entries = self.batch_runner.run(serial, batch["batch"])
+        first_output = entries[0][2] if entries else ""
+        if all(transient for _, _, _, transient in entries) and is_device_lost(first_output):
+            return False, first_output, True
+        return True, entries, False
+
+    def _test_one(self, serial, item):
+        self.limiter.acquire(target_package(item) if self.pace_by == "app" else serial)
+        item["sentAt"] = time.time()
+        outcome = self._run_adb_command(item["constructedIntent"], serial)
+        item["doneAt"] = time.time()
+        return outcome
+
+    @staticmethod
+    def _make_result(item, success, output, transient=False):
+        """
+        :param transient: adb 层面的失败（设备断开、超时、未执行），记入结果的 "transient" 字段，断点恢复时会重新测试
+        """
+        ret_item = item.copy()
+        ret_item["transient"] = bool(transient)
+        if success:
+            # 可能只是表示ADB命令执行成功，并不代表一定加载URL
+            # 需要人工查看日志，这里暂记为 "Pending"
+            ret_item["testResult"] = "Pending"
+        else:
+            ret_item["testResult"] = f"Failed: {output}"
+        return ret_item
 
-    def _run_adb_command(self, cmd):
+    def _run_adb_command(self, cmd, serial=None):
         """
-        执行单条 adb shell am start 命令, 返回 (success, output)
+        在 serial 指定的设备（None 为默认设备）上执行单条 adb shell am start 命令, 返回 (success, output, transient)
         """
+        command = device_command(cmd)
+        if self.persistent:
+            returncode, out = self._session_pool(serial).run(command)
+            if returncode is None:
+                return False, out, True
+            return judge_output(returncode, out) + (False,)
+
+        # 设备端命令作为一个参数交给 adb，由设备 shell 负责解析引号
+        args = [self.adb] + (["-s", serial] if serial else []) + ["shell", command]
         try:
-            proc = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            out = proc.stdout + proc.stderr
-            if proc.returncode != 0:
-                return False, out
-            # 若输出中包含异常信息也视为失败
-            if "Exception" in out or "Error" in out:
-                return False, out
-            return True, out
+            proc = subprocess.run(args, capture_output=True, text=True, timeout=self.command_timeout)
+        except subprocess.TimeoutExpired:
+            return False, f"命令超时({self.command_timeout}s): {command}", True
         except Exception as e:
-            return False, str(e)
+            return False, str(e), False
+        out = proc.stdout + proc.stderr
+        if proc.returncode != 0 and is_device_lost(out):
+            return False, out, True
+        return judge_output(proc.returncode, out) + (False,)
+
+
+class AsyncIntentEngine:
+    """
+    基于 asyncio 的 Intent 执行引擎。
+      - 每条命令用 asyncio.create_subprocess_exec 启动 [adb, -s serial, shell, <设备端命令>]，不经过本地 shell
+      - 输入与输出各有一个有界队列：输入按需读取，消费者读取结果慢时工作协程自动等待，内存占用与任务总数无关
+      - 每条命令有超时，超时后结束 adb 进程并记为失败；cancel() 或提前退出 async for 会取消所有在途命令
+      - 同一设备上相邻命令的间隔为 interval 秒
+    用法：
+        engine = AsyncIntentEngine(devices=["emulator-5554"], concurrency=16)
+        async for result in engine.run(all_test_intents):
+            ...
+    """
+
+    _STOP = object()
+
+    def __init__(self, devices=None, concurrency=1, interval=0, adb="adb", command_timeout=30, queue_size=None):
+        """
+        :param devices: 设备序列号列表，None 表示使用 adb 默认设备
+        :param concurrency: 每台设备同时在途的命令数
+        :param interval: 同一设备上相邻两条命令的最小间隔（秒）
+        :param adb: adb 可执行文件路径
+        :param command_timeout: 单条命令的超时（秒）
+        :param queue_size: 输入/输出队列容量，默认为总并发数的 2 倍
+        """
+        self.devices = list(devices) if devices else [None]
+        self.concurrency = concurrency
+        self.interval = interval
+        self.adb = adb
+        self.command_timeout = command_timeout
+        self.queue_size = queue_size or 2 * concurrency * len(self.devices)
+        self._tasks = []
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+
+    async def run(self, items):
+        """
+        异步生成器：按完成顺序产出带 testResult（及 device）的结果。
+        items 可以是普通可迭代对象，也可以是异步可迭代对象。
+        """
+        import asyncio
+
+        inbox = asyncio.Queue(maxsize=self.queue_size)
+        outbox = asyncio.Queue(maxsize=self.queue_size)
+        next_slot = {serial: 0.0 for serial in self.devices}
+        worker_count = len(self.devices) * self.concurrency
+
+        producer = asyncio.create_task(self._produce(items, inbox, worker_count))
+        workers = [
+            asyncio.create_task(self._work(serial, inbox, outbox, next_slot))
+            for serial in self.devices
+            for _ in range(self.concurrency)
+        ]
+        self._tasks = [producer] + workers
+
+        try:
+            finished = 0
+            while finished < worker_count:
+                result = await outbox.get()
+                if result is self._STOP:
+                    finished += 1
+                    continue
+                yield result
+            await producer
+        finally:
+            self.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+
+    async def _produce(self, items, inbox, worker_count):
+        import asyncio
+
+        cancelled = False
+        try:
+            if hasattr(items, "__aiter__"):
+                async for item in items:
+                    await inbox.put(item)
+            else:
+                for item in items:
+                    await inbox.put(item)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            # 输入迭代出错时同样通知工作协程退出，否则 run() 会一直等待；异常由 run() 中的 await producer 抛出
+            if not cancelled:
+                for _ in range(worker_count):
+                    await inbox.put(self._STOP)
+
+    async def _work(self, serial, inbox, outbox, next_slot):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await inbox.get()
+            if item is self._STOP:
+                await outbox.put(self._STOP)
+                return
+
+            if self.interval > 0:
+                now = loop.time()
+                slot = max(now, next_slot[serial])
+                next_slot[serial] = slot + self.interval
+                if slot > now:
+                    await asyncio.sleep(slot - now)
+
+            outcome = await self._exec(serial, device_command(item["constructedIntent"]))
+            result = IntentTester._make_result(item, *outcome)
+            if serial is not None:
+                result["device"] = serial
+            await outbox.put(result)
+
+    async def _exec(self, serial, command):
+        import asyncio
+
+        args = ["-s", serial] if serial else []
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                self.adb, *args, "shell", command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+        except OSError as e:
+            return False, str(e), False
+        try:
+            out, _ = await asyncio.wait_for(proc.communicate(), self.command_timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return False, f"命令超时({self.command_timeout}s)", True
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.wait()
+            raise
+        out = out.decode("utf-8", errors="replace")
+        if proc.returncode != 0 and is_device_lost(out):
+            return False, out, True
+        return judge_output(proc.returncode, out) + (False,)
+
+
+class TestCheckpoint:
+    """
+    Intent 测试的断点记录：每条结果完成后立即写入 SQLite，进程崩溃、设备重启或 Ctrl-C 后可以从断点继续。
+      - 一次测试由 (APK 的 sha256, target_url + payloads 的指纹) 确定，两者都相同才视为同一次测试
+      - 待测 Intent 由 APK 与 payload 确定性地生成，因此不单独保存队列，恢复时重新生成并跳过已完成的条目
+      - 条目以 constructedIntent 的 sha1 为键，与设备、完成顺序无关
+      - adb 层面的失败（结果中 "transient" 为 True：设备断开、超时、未执行）不算完成，恢复时会重新测试
+    """
+
+    SCHEMA_SQL = (
+        """
+        CREATE TABLE IF NOT EXISTS intent_run (
+            run_key      TEXT PRIMARY KEY,
+            apk_sha256   TEXT NOT NULL,
+            payload_hash TEXT NOT NULL,
+            apk_path     TEXT,
+            started_at   REAL NOT NULL,
+            finished_at  REAL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS intent_result (
+            run_key            TEXT NOT NULL,
+            intent_key         TEXT NOT NULL,
+            activity_name      TEXT,
+            constructed_intent TEXT,
+            test_result        TEXT,
+            result             TEXT NOT NULL,
+            completed_at       REAL NOT NULL,
+            PRIMARY KEY (run_key, intent_key)
+        )
+        """,
+    )
+
+    def __init__(self, db_path, apk_path, target_url, payloads=None):
+        """
+        :param db_path: 断点数据库路径
+        :param apk_path: 被测 APK
+        :param target_url: 测试使用的 URL
+        :param payloads: payload 矩阵模式的 payload 列表
+        """
+        self.conn = connect_db(db_path)
+        for sql in self.SCHEMA_SQL:
+            self.conn.execute(sql)
+        self.apk_sha256 = AnalysisCache.file_sha256(apk_path)
+        self.payload_hash = hashlib.sha1(json.dumps([target_url, payloads or []]).encode("utf-8")).hexdigest()
+        self.run_key = hashlib.sha1(f"{self.apk_sha256}:{self.payload_hash}".encode("utf-8")).hexdigest()
+        self.conn.execute(
+            "INSERT OR IGNORE INTO intent_run (run_key, apk_sha256, payload_hash, apk_path, started_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (self.run_key, self.apk_sha256, self.payload_hash, apk_path, time.time())
+        )
 
+    @staticmethod
+    def intent_key(item):
+        return hashlib.sha1(item["constructedIntent"].encode("utf-8")).hexdigest()
+
+    def completed(self):
+        """
+        :return: 本次测试已完成的结果 {intent_key: result}
+        """
+        rows = self.conn.execute("SELECT intent_key, result FROM intent_result WHERE run_key = ?", (self.run_key,))
+        completed = {}
+        for intent_key, result in rows:
+            result = json.loads(result)
+            if not result.get("transient"):
+                completed[intent_key] = result
+        return completed
+
+    def skip_completed(self, items, completed):
+        """
+        生成器：跳过 completed 中已有结果的 Intent
+        """
+        for item in items:
+            if self.intent_key(item) not in completed:
+                yield item
+
+    def record(self, result):
+        if result.get("transient"):
+            return
+        # 连接处于 autocommit 模式，每条结果单独提交
+        self.conn.execute(
+            "INSERT OR REPLACE INTO intent_result "
+            "(run_key, intent_key, activity_name, constructed_intent, test_result, result, completed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.run_key, self.intent_key(result), result["activityName"], result["constructedIntent"],
+             result["testResult"], json.dumps(result, ensure_ascii=False), time.time())
+        )
+
+    def finish(self):
+        self.conn.execute("UPDATE intent_run SET finished_at = ? WHERE run_key = ?", (time.time(), self.run_key))
+
+    def close(self):
+        self.conn.close()
+
+
+def async_engine_conflicts(persistent=False, pace_by="device", burst=1, batch_size=0, logcat=False):
+    """
+    返回 async 引擎不支持、却被指定了的命令行选项（AsyncIntentEngine 按设备限速、每条命令一个 adb 子进程，
+    没有常驻会话、批量脚本、按应用限速/突发与 logcat 判定）
+    """
+    conflicts = []
+    if persistent:
+        conflicts.append("--persistent")
+    if batch_size:
+        conflicts.append("--batch")
+    if logcat:
+        conflicts.append("--logcat")
+    if pace_by != "device":
+        conflicts.append("--pace-by")
+    if burst != 1:
+        conflicts.append("--burst")
+    return conflicts
+
+
+def main(apk_path, output_xlsx, target_url, concurrency=1, interval=2, persistent=False, adb="adb",
+         pace_by="device", burst=1, devices=None, engine="thread", batch_size=0, batch_mode="pipe", payloads=None,
+         logcat=False, settle=3.0, checkpoint_db="./intent_checkpoint.db", resume=False, webview_only=False):
+    if engine == "async":
+        conflicts = async_engine_conflicts(persistent, pace_by, burst, batch_size, logcat)
+        if conflicts:
+            raise ValueError(f"async 引擎不支持 {', '.join(conflicts)}，请改用 --engine thread")
 
-def main(apk_path, output_xlsx, target_url, concurrency=1, interval=2):
     # 1. 分析 APK
     analyzer = APKAnalyzer(apk_path)
     activities_info = analyzer.analyze()
@@ -459,52 +1876,168 @@ def main(apk_path, output_xlsx, target_url, concurrency=1, interval=2):
     print(f"[*] 已分析完毕，发现 {len(activities_info)} 个 Activity。")
 
     # 2. 将所有 Activity 信息写入 Excel（Activity_Analysis）
-    reporter = ExcelReporter(output_xlsx)
+    reporter = create_reporter(output_xlsx)
     reporter.write_analysis(activities_info)
 
     # 3. 筛选攻击面，并针对其构造 Intent
-    builder = IntentBuilder(analyzer.package_name, target_url)
-    all_test_intents = []
-    for act_info in activities_info:
-        test_cmds = builder.build_intents_for_activity(act_info)
-        all_test_intents.extend(test_cmds)
-
-    if not all_test_intents:
+    targets = activities_info
+    if webview_only:
+        # DEX 调用图上入口方法到不了 WebView 加载方法的 Activity 不再测试
+        reach = AppAnalyzer(apk_path, manifest_only=True).analyze_webview_reachability()
+        # activity-alias 按其 targetActivity 判断
+        targets = [
+            a for a in activities_info
+            if reach.get(a.get("targetActivity") or a["activityName"], {}).get("reachable")
+        ]
+        print(f"[*] 调用链可达 WebView 的 Activity: {len(targets)}/{len(activities_info)}")
+    builder = IntentBuilder(analyzer.package_name, target_url, payloads=payloads)
+    # 命令按需生成，边生成边测试
+    all_test_intents = itertools.chain.from_iterable(
+        builder.iter_intents_for_activity(act_info) for act_info in targets
+    )
+    first = next(all_test_intents, None)
+    if first is None:
         print("[*] 未发现任何可疑攻击面，无需发送 Intent 测试。")
         reporter.save()
         return
+    all_test_intents = itertools.chain([first], all_test_intents)
+
+    checkpoint = TestCheckpoint(checkpoint_db, apk_path, target_url, payloads) if checkpoint_db else None
+    if checkpoint is not None and resume:
+        completed = checkpoint.completed()
+        # 上次已完成的结果先写入报告，本次只测试剩余的 Intent
+        reporter.write_test_result(completed.values())
+        all_test_intents = checkpoint.skip_completed(all_test_intents, completed)
+        print(f"[*] 从断点恢复：跳过已完成的 {len(completed)} 条 Intent。")
+
+    def on_result(result):
+        reporter.write_test_result([result])
+        if checkpoint is not None:
+            checkpoint.record(result)
+
+    print("[*] 开始发送 Intent 测试(针对可能的攻击面)。")
+    tested = 0
+
+    # 4. 批量测试，每完成一条就将结果写入 Excel（AttackSurfaceTest）
+    if engine == "async":
+        import asyncio
+
+        if devices == "all":
+            devices = list_adb_devices(adb)
+        async_engine = AsyncIntentEngine(devices=devices, concurrency=concurrency, interval=interval, adb=adb)
+
+        async def consume():
+            count = 0
+            async for result in async_engine.run(all_test_intents):
+                on_result(result)
+                count += 1
+            return count
 
-    print(f"[*] 有 {len(all_test_intents)} 条 Intent 需要测试(针对可能的攻击面)。")
-
-    # 4. 批量测试
-    tester = IntentTester(interval=interval, concurrency=concurrency)
-    test_results = tester.test_intents(all_test_intents)
+        try:
+            tested = asyncio.run(consume())
+            if checkpoint is not None:
+                checkpoint.finish()
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+            reporter.save()
+        written = "、".join(reporter.output_files())
+        print(f"[+] 测试完成，共 {tested} 条 Intent，结果已写入 {written}。请人工查看日志确认是否真正加载了 URL。")
+        return
 
-    # 5. 将测试结果写入 Excel（AttackSurfaceTest）
-    reporter.write_test_result(test_results)
-    reporter.save()
-    print(f"[+] 测试完成，结果已写入 {output_xlsx}。请人工查看日志确认是否真正加载了 URL。")
+    tester = IntentTester(interval=interval, concurrency=concurrency, persistent=persistent, adb=adb,
+                          pace_by=pace_by, burst=burst, devices=devices, batch_size=batch_size,
+                          batch_mode=batch_mode, logcat=logcat, settle=settle)
+    if tester.devices:
+        print(f"[*] 使用 {len(tester.devices)} 台设备: {', '.join(tester.devices)}")
+    try:
+        for result in tester.iter_test_intents(all_test_intents):
+            on_result(result)
+            tested += 1
+        if checkpoint is not None:
+            checkpoint.finish()
+    finally:
+        # 中断时也保存已完成的部分，配合 --resume 继续
+        tester.close()
+        if checkpoint is not None:
+            checkpoint.close()
+        reporter.save()
+    written = "、".join(reporter.output_files())
+    if logcat:
+        print(f"[+] 测试完成，共 {tested} 条 Intent，结果已写入 {written}（已按 logcat 判定）。")
+    else:
+        print(f"[+] 测试完成，共 {tested} 条 Intent，结果已写入 {written}。请人工查看日志确认是否真正加载了 URL。")
 
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="自动化测试：检测 APK 是否存在可能的 WebView 任意 URL 加载攻击面")
-    parser.add_argument("-apk", help="待分析的APK文件路径")
-    parser.add_argument("-o", "--output", default="analysis_result.xlsx", help="输出Excel文件")
+    parser.add_argument("-apk", help="待分析的APK文件路径（也可以是 .xapk/.apks 安装包或 split 目录）")
+    parser.add_argument("-o", "--output", default="analysis_result.xlsx",
+                        help="输出文件，按扩展名选择格式：.xlsx（流式写入）/.csv/.jsonl/.parquet")
     parser.add_argument("-u", "--url", default="https://mymalware.com", help="测试时使用的URL")
     parser.add_argument("-c", "--concurrency", type=int, default=1, help="并发线程数")
-    parser.add_argument("-i", "--interval", type=int, default=2, help="每条Intent发送间隔(秒)")
+    parser.add_argument("-i", "--interval", type=float, default=2, help="同一设备/应用上每条Intent发送间隔(秒)")
+    parser.add_argument("--pace-by", choices=["device", "app"], default="device", help="发送间隔按设备还是按目标应用计算")
+    parser.add_argument("--burst", type=int, default=1, help="每个设备/应用允许的突发条数")
+    parser.add_argument("--persistent", action="store_true", help="复用常驻 adb shell 会话发送 Intent")
+    parser.add_argument("--adb", default="adb", help="adb 可执行文件路径")
+    parser.add_argument("-s", "--serial", action="append", dest="devices",
+                        help="参与测试的设备序列号，可多次指定；指定 all 表示所有在线设备")
+    parser.add_argument("--engine", choices=["thread", "async"], default="thread",
+                        help="执行引擎：thread 为线程池，async 为 asyncio 子进程引擎（-c 为每台设备的在途命令数）")
+    parser.add_argument("--batch", type=int, default=0, dest="batch_size",
+                        help="批量模式：每 N 条 Intent 合并为一个设备端脚本，一次 adb 往返执行（thread 引擎）")
+    parser.add_argument("--batch-mode", choices=["pipe", "push"], default="pipe",
+                        help="批量脚本下发方式：pipe 经 stdin 交给 adb shell sh，push 先推送到设备再执行")
+    parser.add_argument("-p", "--payload", action="append", dest="payloads",
+                        help="payload 矩阵模式：URL 或 URL 模板，可多次指定，"
+                             "模板占位符 {scheme} {host} {port} {path} {target_url} {url}；"
+                             "只发送 intent-filter 能匹配的 data URI")
+    parser.add_argument("--logcat", action="store_true",
+                        help="每台设备常驻 adb logcat，按日志将结果判定为 Loaded/Rejected/Crashed/NoEffect（thread 引擎）")
+    parser.add_argument("--settle", type=float, default=3.0, help="Intent 发送后继续收集日志的秒数")
+    parser.add_argument("--webview-only", action="store_true",
+                        help="先做 DEX 调用图分析，只测试入口方法能到达 WebView 加载方法的 Activity")
+    parser.add_argument("--checkpoint", default="./intent_checkpoint.db",
+                        help="断点数据库路径，每条结果完成后立即写入；指定空字符串表示不记录")
+    parser.add_argument("--resume", action="store_true",
+                        help="从断点继续：跳过同一 APK（sha256）与同一组 URL/payload 下已完成的 Intent")
+    parser.add_argument("--payload-file", help="payload 矩阵模式：每行一个 URL 或 URL 模板的文件")
     args = parser.parse_args()
+    if args.engine == "async":
+        conflicts = async_engine_conflicts(args.persistent, args.pace_by, args.burst, args.batch_size, args.logcat)
+        if conflicts:
+            parser.error(f"--engine async 不支持 {', '.join(conflicts)}，请改用 --engine thread")
 
     # 运行主流程
-    if not os.path.isfile(args.apk):
+    if not (os.path.isfile(args.apk) or os.path.isdir(args.apk) and ApkBundle.is_split_dir(args.apk)):
         print(f"[!] 指定的 APK 文件不存在: {args.apk}")
         exit(1)
 
+    payloads = args.payloads
+    if args.payload_file:
+        with open(args.payload_file, "r", encoding="utf-8") as f:
+            payloads = (payloads or []) + [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
     main(
         apk_path=args.apk,
         output_xlsx=args.output,
         target_url=args.url,
         concurrency=args.concurrency,
-        interval=args.interval
+        interval=args.interval,
+        persistent=args.persistent,
+        adb=args.adb,
+        pace_by=args.pace_by,
+        burst=args.burst,
+        devices="all" if args.devices == ["all"] else args.devices,
+        engine=args.engine,
+        batch_size=args.batch_size,
+        batch_mode=args.batch_mode,
+        payloads=payloads,
+        logcat=args.logcat,
+        settle=args.settle,
+        checkpoint_db=args.checkpoint,
+        resume=args.resume,
+        webview_only=args.webview_only
     )
@@ -0,0 +1,87 @@
+#coding = 'utf-8'
+import os
+import sys
+import time
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# 仓库根目录中的 test.py 与标准库的 test 包同名，必须排在 sys.path 最前面
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+FAKE_ADB = os.path.join(TESTS_DIR, "fake_adb.py")
+FIXTURES = os.path.join(TESTS_DIR, "fixtures")
+
+
+class FakeAdb:
+    """
+    fake_adb.py 的状态目录操作，见 fake_adb.py 的说明
+    """
+
+    def __init__(self, state):
+        self.path = FAKE_ADB
+        self.state = str(state)
+
+    def _file(self, name):
+        return os.path.join(self.state, name)
+
+    def _read(self, name):
+        try:
+            with open(self._file(name)) as f:
+                return [line.rstrip("\n") for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def kill(self, serial):
+        with open(self._file("dead"), "a") as f:
+            f.write(serial + "\n")
+
+    def die_after(self, serial, shell_calls):
+        with open(self._file(f"die_after.{serial}"), "w") as f:
+            f.write(f"{shell_calls}\n")
+
+    def set_running(self, package, pid):
+        with open(self._file("pids"), "a") as f:
+            f.write(f"{package} {pid}\n")
+
+    def calls(self, serial=None):
+        """
+        返回 adb 调用的参数串列表，指定 serial 时只返回该设备的调用
+        """
+        calls = [line.split(" ", 1) for line in self._read("calls")]
+        return [args for s, args in calls if serial is None or s == serial]
+
+    def logcat(self):
+        return self._read("logcat")
+
+    def wait_logcat_reader(self, timeout=5):
+        # adb logcat 替身启动后才开始跟随日志，等它出现在调用记录中
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if any(args.startswith("logcat") for args in self.calls()):
+                time.sleep(0.3)
+                return
+            time.sleep(0.05)
+        raise TimeoutError("adb logcat 未启动")
+
+
+@pytest.fixture
+def fake_adb(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_ADB_STATE", str(tmp_path))
+    monkeypatch.setenv("FAKE_ADB_SERIALS", "emulator-5554,emulator-5556")
+    monkeypatch.delenv("FAKE_AM_SLEEP", raising=False)
+    return FakeAdb(tmp_path)
+
+
+def intent(package, activity, url="https://evil.example/x"):
+    """
+    构造一条与 IntentBuilder 输出格式相同的测试项
+    """
+    return {
+        "activityName": f"{package}.{activity}",
+        "filterIndex": 0,
+        "actions": ["android.intent.action.VIEW"],
+        "categories": [],
+        "dataAttrs": {},
+        "constructedIntent": f'adb shell am start -n {package}/.{activity} -a android.intent.action.VIEW -d "{url}"',
+    }
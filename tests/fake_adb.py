@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+#coding = 'utf-8'
+"""
+测试用的 adb 替身：在本机用 sh 模拟设备 shell，不需要真实设备。
+
+状态保存在环境变量 FAKE_ADB_STATE 指向的目录中（每个测试一个临时目录）：
+    calls           每次调用 adb 的参数，一行一次（"<serial> <参数...>"）
+    dead            已断开的设备序列号，每行一个；对这些设备的任何调用都返回 "device not found"
+    die_after.<s>   设备 s 在第 N 次 shell 调用之后断开
+    pids            设备上正在运行的应用："<包名> <pid>"，由 am 启动应用时追加，pidof 从这里查询
+    logcat          设备日志（logcat -v threadtime 格式），am 执行时追加，adb logcat 从末尾开始跟随输出
+FAKE_ADB_SERIALS 为 adb devices 列出的设备（逗号分隔），第一个为默认设备。
+
+设备端的 am 与 pidof 也由本脚本实现（shell 的 PATH 中放入指向本脚本的同名链接），
+am start 按组件名决定行为：含 Missing 时输出找不到 Activity 的错误，含 Slow 时先 sleep FAKE_AM_SLEEP 秒，
+含 Crash 时写入崩溃日志，含 Deny 时写入 Permission Denial，其余情况目标进程按 -d 的 URL 写一行加载日志。
+"""
+import os
+import re
+import sys
+import time
+import fcntl
+import shutil
+
+STATE = os.environ.get("FAKE_ADB_STATE", ".")
+SERIALS = os.environ.get("FAKE_ADB_SERIALS", "emulator-5554").split(",")
+REMOTE_TMP = "/data/local/tmp"
+SYSTEM_PID = 1000
+
+
+def state_path(name):
+    return os.path.join(STATE, name)
+
+
+def locked():
+    f = open(state_path("lock"), "a")
+    fcntl.flock(f, fcntl.LOCK_EX)
+    return f
+
+
+def read_lines(name):
+    try:
+        with open(state_path(name)) as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def append(name, text):
+    with open(state_path(name), "a") as f:
+        f.write(text)
+
+
+def logcat_line(pid, level, tag, message):
+    stamp = time.strftime("%m-%d %H:%M:%S", time.localtime()) + f".{int(time.time() * 1000) % 1000:03d}"
+    return f"{stamp} {pid:5d} {pid:5d} {level} {tag}: {message}\n"
+
+
+def running_pids():
+    return dict(line.split() for line in read_lines("pids"))
+
+
+# ---------------------------------------------------------------------------
+# 设备端命令
+# ---------------------------------------------------------------------------
+
+def am(args):
+    joined = " ".join(args)
+    match = re.search(r"-n\s+(\S+)", joined)
+    component = match.group(1) if match else ""
+    package = component.split("/")[0]
+    match = re.search(r"-d\s+(\S+)", joined)
+    data = match.group(1).strip("\"'") if match else ""
+
+    if "Missing" in component:
+        print("Error type 3")
+        print(f"Error: Activity class {{{component}}} does not exist.")
+        return 0
+    if "Slow" in component:
+        time.sleep(float(os.environ.get("FAKE_AM_SLEEP", "1")))
+
+    with locked():
+        lines = [logcat_line(SYSTEM_PID, "I", "ActivityTaskManager", f"START u0 {{dat={data} cmp={component}}}")]
+        pids = running_pids()
+        if package not in pids:
+            pids[package] = str(20000 + len(pids))
+            append("pids", f"{package} {pids[package]}\n")
+            lines.append(logcat_line(SYSTEM_PID, "I", "ActivityManager",
+                                     f"Start proc {pids[package]}:{package}/u0a55 for activity {{{component}}}"))
+        pid = int(pids[package])
+        if "Crash" in component:
+            lines.append(logcat_line(pid, "E", "AndroidRuntime", "FATAL EXCEPTION: main"))
+            lines.append(logcat_line(pid, "E", "AndroidRuntime", f"Process: {package}, PID: {pid}"))
+        elif "Deny" in component:
+            lines.append(logcat_line(SYSTEM_PID, "W", "ActivityTaskManager",
+                                     f"Permission Denial: starting Intent {{ cmp={component} }} not exported"))
+        elif data:
+            lines.append(logcat_line(pid, "I", "UrlLoader", f"loading {data}"))
+        append("logcat", "".join(lines))
+    print(f"Starting: Intent {{ {joined} }}")
+    return 0
+
+
+def pidof(args):
+    pids = running_pids()
+    found = [pids[name] for name in args if name in pids]
+    if not found:
+        return 1
+    print(" ".join(found))
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# adb 命令
+# ---------------------------------------------------------------------------
+
+def device_bin():
+    """
+    shell 的 PATH 中放入的目录，其中 am/pidof 链接到本脚本
+    """
+    path = state_path("bin")
+    with locked():
+        os.makedirs(path, exist_ok=True)
+        for name in ("am", "pidof"):
+            link = os.path.join(path, name)
+            if not os.path.lexists(link):
+                os.symlink(os.path.abspath(__file__), link)
+    return path
+
+
+def is_dead(serial, count_shell):
+    with locked():
+        if serial in read_lines("dead"):
+            return True
+        limit = read_lines(f"die_after.{serial}")
+        if count_shell and limit:
+            count = len(read_lines(f"shell_count.{serial}")) + 1
+            append(f"shell_count.{serial}", "x\n")
+            if count > int(limit[0]):
+                append("dead", serial + "\n")
+                return True
+    return False
+
+
+def follow_logcat():
+    path = state_path("logcat")
+    open(path, "a").close()
+    with open(path) as f:
+        f.seek(0, os.SEEK_END)
+        while True:
+            line = f.readline()
+            if line:
+                sys.stdout.write(line)
+                sys.stdout.flush()
+            else:
+                time.sleep(0.05)
+
+
+def adb(args):
+    serial = SERIALS[0]
+    if args[:1] == ["-s"]:
+        serial, args = args[1], args[2:]
+    with locked():
+        append("calls", f"{serial} {' '.join(args)}\n")
+
+    if args[:1] == ["devices"]:
+        dead = read_lines("dead")
+        print("List of devices attached")
+        for s in SERIALS:
+            print(f"{s}\t{'offline' if s in dead else 'device'}")
+        return 0
+
+    if is_dead(serial, count_shell=args[:1] == ["shell"]):
+        print(f"error: device '{serial}' not found", file=sys.stderr)
+        return 1
+
+    if args[:1] == ["shell"]:
+        env = dict(os.environ, PATH=device_bin() + os.pathsep + os.environ.get("PATH", ""))
+        device_tmp = state_path("device_tmp")
+        if len(args) == 1:
+            os.execvpe("sh", ["sh"], env)
+        command = " ".join(args[1:]).replace(REMOTE_TMP, device_tmp)
+        os.execvpe("sh", ["sh", "-c", command], env)
+    if args[:1] == ["push"]:
+        target = args[2].replace(REMOTE_TMP, state_path("device_tmp"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy(args[1], target)
+        print(f"{args[1]}: 1 file pushed")
+        return 0
+    if args[:1] == ["logcat"]:
+        follow_logcat()
+    print(f"fake adb: 不支持的命令 {args}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    tool = os.path.basename(sys.argv[0])
+    if tool == "am":
+        sys.exit(am(sys.argv[2:] if sys.argv[1:2] == ["start"] else sys.argv[1:]))
+    if tool == "pidof":
+        sys.exit(pidof(sys.argv[1:]))
+    sys.exit(adb(sys.argv[1:]))
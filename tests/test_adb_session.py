@@ -0,0 +1,59 @@
+#coding = 'utf-8'
+import pytest
+
+from conftest import intent
+from test import AdbShellSession, AdbSessionPool, AdbSessionError, IntentTester, is_device_lost
+
+
+def test_session_runs_commands_in_one_adb_process(fake_adb):
+    session = AdbShellSession(fake_adb.path)
+    try:
+        assert session.run("echo hello") == (0, "hello\n")
+        assert session.run("echo out; echo err >&2; exit_code() { return 3; }; exit_code") == (3, "out\nerr\n")
+        assert session.run("am start -n com.a/.Main -d https://x/1")[0] == 0
+    finally:
+        session.close()
+    assert fake_adb.calls() == ["shell"]
+
+
+def test_session_timeout_closes_session(fake_adb):
+    session = AdbShellSession(fake_adb.path)
+    with pytest.raises(AdbSessionError, match="命令超时"):
+        session.run("sleep 5", timeout=0.5)
+    assert session.proc is None
+
+
+def test_session_on_lost_device_reports_device_lost(fake_adb):
+    fake_adb.kill("emulator-5554")
+    session = AdbShellSession(fake_adb.path, "emulator-5554")
+    with pytest.raises(AdbSessionError) as excinfo:
+        session.run("echo hello")
+    assert is_device_lost(str(excinfo.value))
+
+
+def test_pool_reuses_sessions_and_recreates_after_error(fake_adb):
+    pool = AdbSessionPool(size=2, adb=fake_adb.path, timeout=0.5)
+    try:
+        for i in range(4):
+            assert pool.run(f"echo {i}") == (0, f"{i}\n")
+        assert fake_adb.calls() == ["shell"]
+
+        returncode, output = pool.run("sleep 5")
+        assert returncode is None and "命令超时" in output
+        assert pool.run("echo again") == (0, "again\n")
+        assert fake_adb.calls() == ["shell", "shell"]
+    finally:
+        pool.close()
+
+
+def test_persistent_tester_results(fake_adb):
+    tester = IntentTester(interval=0, persistent=True, adb=fake_adb.path)
+    items = [intent("com.a", "Main"), intent("com.a", "Missing"), intent("com.b", "Main")]
+    try:
+        results = {r["activityName"]: r["testResult"] for r in tester.test_intents(items)}
+    finally:
+        tester.close()
+    assert results["com.a.Main"] == "Pending"
+    assert results["com.b.Main"] == "Pending"
+    assert results["com.a.Missing"].startswith("Failed: ") and "does not exist" in results["com.a.Missing"]
+    assert fake_adb.calls() == ["shell"]
@@ -0,0 +1,110 @@
+#coding = 'utf-8'
+import json
+import threading
+
+import pytest
+
+import AA
+from AA import AnalysisCache
+
+
+def components(name, size=100):
+    return {"activities": [{"name": name, "padding": "x" * size}]}
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(AA.time, "time", clock)
+    return clock
+
+
+def entry_size(name):
+    return len(json.dumps(components(name)))
+
+
+def test_eviction_follows_recorded_access_order(tmp_path, clock):
+    cache = AnalysisCache(str(tmp_path / "cache.db"), max_bytes=3 * entry_size("a"))
+    for sha256 in ("a", "b", "c"):
+        cache.put(sha256, f"com.{sha256}", components(sha256))
+        clock.now += 10
+
+    # 距写入已超过 ACCESS_INTERVAL 的命中会刷新访问时间，下次 put 时写入
+    clock.now += AnalysisCache.ACCESS_INTERVAL
+    assert cache.get("a") == ("com.a", components("a"))
+    cache.put("d", "com.d", components("d"))
+
+    assert cache.get("b") is None
+    assert [cache.get(sha256)[0] for sha256 in ("a", "c", "d")] == ["com.a", "com.c", "com.d"]
+    cache.close()
+
+
+def test_recent_hits_do_not_write(tmp_path, clock):
+    cache = AnalysisCache(str(tmp_path / "cache.db"))
+    cache.put("a", "com.a", components("a"))
+    statements = []
+    cache.conn.set_trace_callback(statements.append)
+
+    clock.now += AnalysisCache.ACCESS_INTERVAL - 1
+    for _ in range(10):
+        assert cache.get("a") is not None
+    assert not [sql for sql in statements if not sql.lstrip().upper().startswith("SELECT")]
+    cache.close()
+
+
+def test_close_flushes_pending_access_times(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    cache = AnalysisCache(path)
+    cache.put("a", "com.a", components("a"))
+    clock.now += AnalysisCache.ACCESS_INTERVAL
+    cache.get("a")
+    cache.close()
+
+    cache = AnalysisCache(path)
+    assert cache.conn.execute("SELECT last_access FROM analysis_cache").fetchone()[0] == clock.now
+    cache.close()
+
+
+def test_concurrent_readers_and_writer(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = AnalysisCache(path, max_bytes=None)
+    assert writer.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    for i in range(50):
+        writer.put(f"sha{i}", f"com.app{i}", components(str(i)))
+
+    errors = []
+    misses = []
+
+    def read():
+        cache = AnalysisCache(path, max_bytes=None)
+        # 每次命中都记录访问时间并频繁写入，与写入方争用数据库
+        cache.ACCESS_INTERVAL = 0
+        cache.ACCESS_FLUSH_SIZE = 5
+        try:
+            for _ in range(5):
+                for i in range(50):
+                    if cache.get(f"sha{i}") is None:
+                        misses.append(i)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            cache.close()
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for i in range(50, 100):
+        writer.put(f"sha{i}", f"com.app{i}", components(str(i)))
+    for thread in readers:
+        thread.join()
+    writer.close()
+
+    assert errors == [] and misses == []
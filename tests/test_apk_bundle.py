@@ -0,0 +1,140 @@
+#coding = 'utf-8'
+import json
+import os
+import zipfile
+
+import pytest
+from lxml import etree
+
+import AA
+from AA import ApkBundle, CorpusIngestor
+
+ANDROID = "http://schemas.android.com/apk/res/android"
+
+
+def manifest(package, split=None, activities=()):
+    """
+    以 Manifest XML 文本充当 APK 内容，由 FakeApk 解析
+    """
+    split_attr = f' split="{split}"' if split else ""
+    items = "".join(f'<activity android:name="{name}" android:exported="true" />' for name in activities)
+    return (f'<manifest xmlns:android="{ANDROID}" package="{package}"{split_attr}>'
+            f'<application>{items}</application></manifest>').encode()
+
+
+class FakeApk:
+    def __init__(self, data):
+        self.manifest_xml = etree.fromstring(data)
+
+    def get_package(self):
+        return self.manifest_xml.get("package")
+
+    def get_android_manifest_xml(self):
+        return self.manifest_xml
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """
+    替换 AA.load_apk，记录每次解析的来源（raw=True 表示从内存读入）
+    """
+    calls = []
+
+    def fake_load_apk(apk_path, raw=False):
+        calls.append(raw or os.path.basename(apk_path))
+        if not raw:
+            with open(apk_path, "rb") as f:
+                apk_path = f.read()
+        return FakeApk(apk_path)
+
+    monkeypatch.setattr(AA, "load_apk", fake_load_apk)
+    return calls
+
+
+def make_dir(path, files):
+    os.makedirs(path)
+    for name, data in files.items():
+        with open(os.path.join(path, name), "wb") as f:
+            f.write(data)
+    return str(path)
+
+
+def make_zip(path, files):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return str(path)
+
+
+def test_is_split_dir_by_name_and_manifest(tmp_path, loads):
+    named = make_dir(tmp_path / "named", {"base.apk": b"", "split_config.arm64_v8a.apk": b"",
+                                          "config.en.apk": b""})
+    assert ApkBundle.is_split_dir(named) and ApkBundle.is_bundle(named)
+    # 文件名即可判断时不解析 Manifest
+    assert loads == []
+
+    feature = make_dir(tmp_path / "feature", {"base.apk": manifest("com.a"),
+                                              "dynamic_feature.apk": manifest("com.a", split="feature")})
+    assert ApkBundle.is_split_dir(feature)
+
+    unrelated = make_dir(tmp_path / "unrelated", {"base.apk": manifest("com.a"), "other.apk": manifest("com.b"),
+                                                  "later.apk": manifest("com.a", split="x")})
+    assert not ApkBundle.is_split_dir(unrelated)
+    assert not ApkBundle.is_split_dir(make_dir(tmp_path / "base_only", {"base.apk": b""}))
+    assert not ApkBundle.is_split_dir(make_dir(tmp_path / "no_base", {"split_a.apk": b"", "b.apk": b""}))
+
+    assert ApkBundle.is_bundle("app.XAPK") and ApkBundle.is_bundle("app.apks")
+    assert not ApkBundle.is_bundle("app.apk")
+
+
+def test_plain_apk_dir_is_not_collected_as_bundle(tmp_path, loads):
+    root = tmp_path / "corpus"
+    make_dir(root / "pulled", {"base.apk": b"", "split_config.en.apk": b""})
+    make_dir(root / "mixed", {"base.apk": manifest("com.a"), "other.apk": manifest("com.b")})
+    assert CorpusIngestor.collect_apk_paths([str(root)]) == [
+        str(root / "mixed" / "base.apk"), str(root / "mixed" / "other.apk"), str(root / "pulled")]
+
+
+def test_xapk_base_and_entries(tmp_path):
+    xapk = make_zip(tmp_path / "app.xapk", {
+        "manifest.json": json.dumps({"split_apks": [{"file": "com.a.apk", "id": "base"},
+                                                    {"file": "config.arm64_v8a.apk", "id": "config.arm64_v8a"}]}),
+        "com.a.apk": b"base",
+        "config.arm64_v8a.apk": b"abi",
+        "icon.png": b"",
+    })
+    bundle = ApkBundle(xapk)
+    assert (bundle.base, bundle.splits) == ("com.a.apk", ["config.arm64_v8a.apk"])
+    assert bundle.read("config.arm64_v8a.apk") == b"abi"
+
+    apks = make_zip(tmp_path / "app.apks", {
+        "splits/base-master.apk": b"base",
+        "splits/base-xxhdpi.apk": b"dpi",
+        "standalones/standalone-arm64_v8a.apk": b"full",
+    })
+    bundle = ApkBundle(apks)
+    assert (bundle.base, bundle.splits) == ("splits/base-master.apk", ["splits/base-xxhdpi.apk"])
+
+    with pytest.raises(ValueError):
+        ApkBundle(make_zip(tmp_path / "bad.apks", {"a.apk": b"", "b.apk": b""}))
+
+
+def test_split_components_read_in_memory_and_merged(tmp_path, loads):
+    apks = make_zip(tmp_path / "app.apks", {
+        "base.apk": manifest("com.a", activities=[".Main"]),
+        "split_feature.apk": manifest("com.a", split="feature", activities=[".Main", ".Feature"]),
+        "split_extra.apk": manifest("com.a", split="extra", activities=["com.a.Feature", "Extra"]),
+    })
+    before = sorted(os.listdir(tmp_path))
+    bundle = ApkBundle(apks)
+    base = AA.ManifestExtractor(bundle.load_base().get_android_manifest_xml(), "com.a").extract_components()
+    splits = bundle.split_components("com.a", workers=1)
+
+    # 全部从内存解析，不解压到磁盘
+    assert loads == [True, True, True]
+    assert sorted(os.listdir(tmp_path)) == before
+
+    merged = ApkBundle.merge_components(base, splits)
+    assert [a["name"] for a in merged["activities"]] == ["com.a.Main", "com.a.Feature", "com.a.Extra"]
+    # 合并不修改 base
+    assert [a["name"] for a in base["activities"]] == ["com.a.Main"]
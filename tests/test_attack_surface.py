@@ -0,0 +1,130 @@
+#coding = 'utf-8'
+import sqlite3
+
+import pytest
+
+from AA import AttackSurfaceInspector, connect_db, save_activities, transaction
+
+# (activity, exported, permission)
+PACKAGES = {
+    "com.a": [
+        ("Open", "true", None),
+        ("Upper", "TRUE", " "),
+        ("Normal", "true", "com.a.permission.NORMAL"),
+        ("Signature", "true", "com.a.permission.SIGNATURE"),
+        ("Free", "true", "com.gone.permission.FREE"),
+    ],
+    "com.b": [
+        ("Hidden", "false", None),
+        ("Implicit", None, "com.a.permission.NORMAL"),
+        ("Dangerous", "true", "android.permission.CAMERA"),
+    ],
+    "com.c": [
+        ("Open", "true", None),
+    ],
+}
+
+PERMISSIONS = [
+    ("com.a.permission.NORMAL", "normal"),
+    ("com.a.permission.SIGNATURE", "signature|privileged"),
+    ("android.permission.CAMERA", "dangerous"),
+]
+
+RESULT_SQL = """
+SELECT package_name, activity_name, is_attack_surface, prot_level, used_free_permission
+FROM activity_info ORDER BY package_name, activity_name
+"""
+
+
+def store(db_path, package_name, rows):
+    activities = [{"activityName": f"{package_name}.{name}", "exported": exported, "permission": permission,
+                   "intent_filters": None} for name, exported, permission in rows]
+    conn = connect_db(db_path)
+    try:
+        with transaction(conn):
+            save_activities(conn, package_name, activities)
+    finally:
+        conn.close()
+
+
+def set_permissions(db_path, permissions):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE IF NOT EXISTS permission_info (permission_name TEXT, prot_level TEXT)")
+    conn.execute("DELETE FROM permission_info")
+    conn.executemany("INSERT INTO permission_info VALUES (?, ?)", permissions)
+    conn.commit()
+    conn.close()
+
+
+def results(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(RESULT_SQL).fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    def make(name, permissions=PERMISSIONS):
+        db_path = str(tmp_path / name)
+        for package_name, rows in PACKAGES.items():
+            store(db_path, package_name, rows)
+        if permissions is not None:
+            set_permissions(db_path, permissions)
+        return db_path
+    return make
+
+
+@pytest.mark.parametrize("permissions", [PERMISSIONS, None], ids=["permission_info", "no_permission_info"])
+def test_set_based_matches_row_by_row(make_db, permissions):
+    row_db, set_db = make_db("row.db", permissions), make_db("set.db", permissions)
+    for package_name in PACKAGES:
+        AttackSurfaceInspector(package_name, row_db).activity_inspector()
+        AttackSurfaceInspector(package_name, set_db).activity_inspector(set_based=True)
+    assert results(set_db) == results(row_db)
+
+    corpus_db = make_db("corpus.db", permissions)
+    AttackSurfaceInspector(None, corpus_db).activity_inspector(set_based=True)
+    assert results(corpus_db) == results(row_db)
+
+
+def test_classification_rules(make_db):
+    db_path = make_db("all.db")
+    AttackSurfaceInspector(None, db_path).activity_inspector(set_based=True)
+    rows = {activity: (attack, prot, free) for _, activity, attack, prot, free in results(db_path)}
+    assert rows == {
+        "com.a.Open": ("true", None, "false"),
+        "com.a.Upper": ("true", None, "false"),
+        "com.a.Normal": ("true", "normal", "false"),
+        "com.a.Signature": ("false", "signature|privileged", "false"),
+        "com.a.Free": ("true", None, "true"),
+        "com.b.Hidden": ("false", None, "false"),
+        "com.b.Implicit": ("false", "normal", "false"),
+        "com.b.Dangerous": ("false", "dangerous", "false"),
+        "com.c.Open": ("true", None, "false"),
+    }
+
+
+def test_inspect_corpus_only_reclassifies_changed_packages(make_db):
+    db_path = make_db("all.db")
+    inspector = AttackSurfaceInspector(db_path=db_path)
+    progress = []
+    stats = inspector.inspect_corpus(chunk_size=2, progress=progress.append)
+    assert (stats["packages"], stats["classified"], stats["rows"]) == (3, 3, 9)
+    assert [p["classified"] for p in progress] == [2, 3]
+
+    # 没有任何变化
+    assert inspector.inspect_corpus(only_changed=True, progress=progress.append)["classified"] == 0
+
+    # CAMERA 降为 normal：只有使用它的 com.b 受影响
+    set_permissions(db_path, PERMISSIONS[:2] + [("android.permission.CAMERA", "normal")])
+    stats = inspector.inspect_corpus(only_changed=True, progress=progress.append)
+    assert (stats["classified"], stats["rows"]) == (1, 3)
+    assert ("com.b", "com.b.Dangerous", "true", "normal", "false") in results(db_path)
+
+    # 重新入库后结果列为 NULL，指纹不变也要重新分类
+    store(db_path, "com.c", PACKAGES["com.c"])
+    stats = inspector.inspect_corpus(only_changed=True, progress=progress.append)
+    assert stats["classified"] == 1
+    assert ("com.c", "com.c.Open", "true", None, "false") in results(db_path)
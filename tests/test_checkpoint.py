@@ -0,0 +1,113 @@
+#coding = 'utf-8'
+import csv
+import os
+
+import pytest
+
+import test as intent_test
+from conftest import intent
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    apk = tmp_path / "app.apk"
+    apk.write_bytes(b"not really an apk")
+    ckpt = intent_test.TestCheckpoint(str(tmp_path / "ckpt.db"), str(apk), "https://evil.example/x")
+    yield ckpt
+    ckpt.close()
+
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_timed_out_intent_is_retried_on_resume(fake_adb, checkpoint, monkeypatch, persistent):
+    monkeypatch.setenv("FAKE_AM_SLEEP", "3")
+    items = [intent("com.a", "Main"), intent("com.a", "Slow"), intent("com.a", "Missing")]
+    tester = intent_test.IntentTester(interval=0, adb=fake_adb.path, command_timeout=0.5, persistent=persistent)
+    try:
+        results = {r["activityName"]: r for r in tester.test_intents(items)}
+    finally:
+        tester.close()
+    for result in results.values():
+        checkpoint.record(result)
+
+    assert results["com.a.Slow"]["transient"] and "命令超时" in results["com.a.Slow"]["testResult"]
+    # 找不到 Activity 是 Intent 本身的结果，不是 adb 层面的失败
+    assert results["com.a.Missing"]["testResult"].startswith("Failed: ")
+    assert not results["com.a.Missing"]["transient"]
+
+    completed = checkpoint.completed()
+    remaining = list(checkpoint.skip_completed(items, completed))
+    assert [item["activityName"] for item in remaining] == ["com.a.Slow"]
+
+
+def test_lost_device_results_are_not_checkpointed(fake_adb, checkpoint):
+    fake_adb.kill("emulator-5554")
+    tester = intent_test.IntentTester(interval=0, adb=fake_adb.path)
+    for result in tester.test_intents([intent("com.a", "Main")]):
+        assert result["transient"]
+        checkpoint.record(result)
+    assert checkpoint.completed() == {}
+
+
+def test_run_is_keyed_by_apk_content_and_payloads(tmp_path):
+    apk = tmp_path / "app.apk"
+    apk.write_bytes(b"v1")
+    db_path = str(tmp_path / "ckpt.db")
+    result = dict(intent("com.a", "Main"), testResult="Pending", transient=False)
+
+    first = intent_test.TestCheckpoint(db_path, str(apk), "https://evil.example/x", ["{scheme}://{host}/a"])
+    first.record(result)
+    first.close()
+
+    def completed(url="https://evil.example/x", payloads=("{scheme}://{host}/a",)):
+        ckpt = intent_test.TestCheckpoint(db_path, str(apk), url, list(payloads))
+        try:
+            return list(ckpt.completed())
+        finally:
+            ckpt.close()
+
+    assert completed() == [intent_test.TestCheckpoint.intent_key(result)]
+    assert completed(payloads=("{scheme}://{host}/b",)) == []
+    assert completed(url="https://evil.example/y") == []
+    apk.write_bytes(b"v2")
+    assert completed() == []
+
+
+def test_main_resumes_after_device_loss(fake_adb, tmp_path, monkeypatch, capsys):
+    class Analyzer:
+        def __init__(self, apk_path):
+            self.package_name = "com.a"
+
+        def analyze(self):
+            return [{
+                "activityName": f"com.a.{name}",
+                "exported": "true",
+                "permission": None,
+                "intent_filters": [{"actions": ["android.intent.action.VIEW"], "categories": [],
+                                    "datas": [{"scheme": "https"}]}],
+            } for name in ("Main", "Other")]
+
+    monkeypatch.setattr(intent_test, "APKAnalyzer", Analyzer)
+    apk = tmp_path / "app.apk"
+    apk.write_bytes(b"apk")
+    output = str(tmp_path / "result.csv")
+    kwargs = dict(apk_path=str(apk), output_xlsx=output, target_url="https://evil.example/x", interval=0,
+                  adb=fake_adb.path, checkpoint_db=str(tmp_path / "ckpt.db"))
+
+    # 第 3 条之后设备断开：其余 Intent 都是 adb 层面的失败，不计入断点
+    fake_adb.die_after("emulator-5554", 3)
+    intent_test.main(**kwargs)
+    assert len(fake_adb.calls()) == 8
+    os.remove(os.path.join(fake_adb.state, "dead"))
+    os.remove(os.path.join(fake_adb.state, "die_after.emulator-5554"))
+
+    capsys.readouterr()
+    intent_test.main(resume=True, **kwargs)
+    assert len(fake_adb.calls()) == 8 + 5
+    # 报告实际写出的按工作表拆分的文件，而不是 -o 指定的路径
+    written = capsys.readouterr().out.splitlines()[-1]
+    for sheet in ("Activity_Analysis", "AttackSurfaceTest"):
+        assert str(tmp_path / f"result_{sheet}.csv") in written
+    assert f"{output}。" not in written
+    with open(str(tmp_path / "result_AttackSurfaceTest.csv"), encoding="utf-8-sig") as f:
+        rows = list(csv.reader(f))[1:]
+    assert len(rows) == 8
@@ -0,0 +1,51 @@
+#coding = 'utf-8'
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import AA
+from AA import CorpusIngestor, WorkerPids
+
+
+def hang(*args):
+    # 模拟卡在 C 扩展中、SIGALRM 也打断不了的分析
+    time.sleep(60)
+
+
+def test_worker_pids_are_reported_by_initializer():
+    pids = WorkerPids()
+    with ProcessPoolExecutor(max_workers=2, **pids.pool_kwargs()) as pool:
+        worker_pids = {pool.submit(os.getpid).result() for _ in range(8)}
+        assert worker_pids <= pids.collect()
+
+
+def test_kill_pool_ends_hung_worker():
+    pids = WorkerPids()
+    pool = ProcessPoolExecutor(max_workers=1, **pids.pool_kwargs())
+    future = pool.submit(hang)
+    while not pids.collect():
+        time.sleep(0.05)
+
+    start = time.monotonic()
+    CorpusIngestor._kill_pool(pool, pids)
+    with pytest.raises(BrokenProcessPool):
+        future.result(timeout=10)
+    assert time.monotonic() - start < 10
+
+
+def test_hard_timeout_kills_pool_and_requeues(tmp_path, monkeypatch):
+    monkeypatch.setattr(AA, "_ingest_worker", hang)
+    monkeypatch.setattr(CorpusIngestor, "KILL_GRACE", 0)
+    ingestor = CorpusIngestor(db_path=str(tmp_path / "all.db"), workers=1, timeout=1)
+    pending = deque(["hung.apk", "next.apk"])
+
+    start = time.monotonic()
+    assert ingestor._run_pool(pending, 1, on_result=None) == []
+    assert time.monotonic() - start < 30
+    assert ingestor.failures == [("hung.apk", "timeout", "超时（强制结束）", None)]
+    # 未开始的 APK 留在队列中，由下一个进程池继续处理
+    assert list(pending) == ["next.apk"]
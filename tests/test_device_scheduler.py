@@ -0,0 +1,172 @@
+#coding = 'utf-8'
+import asyncio
+import subprocess
+import threading
+from collections import Counter
+
+import pytest
+
+from conftest import intent
+from test import (DeviceScheduler, IntentTester, AsyncIntentEngine, list_adb_devices, render_batch_script,
+                  parse_batch_output, async_engine_conflicts, main)
+
+DEVICES = ["emulator-5554", "emulator-5556"]
+
+
+def make_items(packages=3, per_package=4):
+    return [intent(f"com.app{p}", f"Activity{i}", f"https://evil.example/{p}/{i}")
+            for p in range(packages) for i in range(per_package)]
+
+
+def test_list_adb_devices_skips_offline(fake_adb):
+    assert list_adb_devices(fake_adb.path) == DEVICES
+    fake_adb.kill("emulator-5556")
+    assert list_adb_devices(fake_adb.path) == ["emulator-5554"]
+
+
+def test_scheduler_shards_every_item_once_with_app_affinity():
+    handled = Counter()
+    lock = threading.Lock()
+
+    def run(serial, item):
+        with lock:
+            handled[item["activityName"]] += 1
+        return True, serial, False
+
+    items = make_items(packages=4, per_package=5)
+    results = list(DeviceScheduler(DEVICES, run).run_all(items))
+
+    assert sorted(r[1]["activityName"] for r in results) == sorted(i["activityName"] for i in items)
+    assert set(handled.values()) == {1}
+    assert all(success and output == serial for serial, _, success, output, _ in results)
+    # 一个应用的全部 Intent 都由同一台设备执行
+    devices_per_app = {}
+    for serial, item, _, _, _ in results:
+        devices_per_app.setdefault(item["activityName"].rsplit(".", 1)[0], set()).add(serial)
+    assert all(len(serials) == 1 for serials in devices_per_app.values())
+
+
+def test_scheduler_requeues_items_of_lost_device():
+    lost = threading.Event()
+
+    def run(serial, item):
+        if serial == "emulator-5556":
+            lost.set()
+            return False, "error: device 'emulator-5556' not found", True
+        # 等另一台设备领到任务后再继续，避免一台设备独自处理完全部任务
+        lost.wait(5)
+        return True, "", False
+
+    scheduler = DeviceScheduler(DEVICES, run)
+    results = list(scheduler.run_all(make_items()))
+
+    assert len(results) == 12
+    assert all(serial == "emulator-5554" and success for serial, _, success, _, _ in results)
+    assert scheduler.dead == {"emulator-5556"}
+
+
+def test_scheduler_fails_remaining_items_when_all_devices_are_lost():
+    def run(serial, item):
+        return False, f"error: device '{serial}' not found", True
+
+    results = list(DeviceScheduler(DEVICES, run).run_all(make_items(packages=1, per_package=3)))
+
+    assert len(results) == 3
+    assert all(not success and transient for _, _, success, _, transient in results)
+
+
+def test_tester_requeues_on_device_lost_midway(fake_adb):
+    fake_adb.die_after("emulator-5556", 2)
+    tester = IntentTester(interval=0, adb=fake_adb.path, devices="all")
+    results = tester.test_intents(make_items())
+
+    assert len(results) == 12
+    assert all(r["testResult"] == "Pending" for r in results)
+    assert Counter(r["device"] for r in results)["emulator-5556"] <= 2
+
+
+def test_batch_render_and_parse_roundtrip():
+    script = render_batch_script(["echo a", "echo b; false", "echo c"])
+    out = "__AA_BEGIN__:0\na\n__AA_END__:0:0\n__AA_BEGIN__:1\nb\n__AA_END__:1:1\n__AA_BEGIN__:2\nc\n"
+    assert script.count("__AA_BEGIN__") == 3
+    assert parse_batch_output(out, 3) == [(0, "a\n"), (1, "b\n"), (None, "c\n")]
+
+
+def test_batch_output_without_trailing_newline():
+    script = render_batch_script(["printf abc", "printf 'x\\ny'; false", "true"])
+    out = subprocess.run(["sh"], input=script, capture_output=True, text=True, timeout=10).stdout
+    assert parse_batch_output(out, 3) == [(0, "abc"), (1, "x\ny"), (0, "")]
+
+
+def test_batch_output_ignores_out_of_range_markers():
+    out = "__AA_BEGIN__:0\n__AA_BEGIN__:7\nok__AA_END__:0:0\n__AA_BEGIN__:x\n__AA_END__:5:0\n"
+    assert parse_batch_output(out, 2) == [(0, "__AA_BEGIN__:7\nok"), (None, "")]
+
+
+@pytest.mark.parametrize("mode", ["pipe", "push"])
+def test_batch_results_and_per_item_windows(fake_adb, mode):
+    tester = IntentTester(interval=0, adb=fake_adb.path, batch_size=3, batch_mode=mode)
+    items = [intent("com.a", "Main", "https://evil.example/1"), intent("com.a", "Missing"),
+             intent("com.a", "Main", "https://evil.example/2"), intent("com.b", "Main")]
+    results = tester.test_intents(items)
+
+    assert [r["testResult"].split(":")[0] for r in results] == ["Pending", "Failed", "Pending", "Pending"]
+    # 每条结果的窗口来自各自的起止标记，批内依次排列
+    first_batch = results[:3]
+    assert all(r["sentAt"] <= r["doneAt"] for r in first_batch)
+    assert first_batch[0]["doneAt"] <= first_batch[1]["sentAt"] <= first_batch[2]["sentAt"]
+    assert len([args for args in fake_adb.calls() if args.startswith("shell")]) == 2
+
+
+def test_batch_on_lost_device_without_scheduler(fake_adb):
+    fake_adb.kill("emulator-5554")
+    tester = IntentTester(interval=0, adb=fake_adb.path, batch_size=2)
+    results = tester.test_intents(make_items(packages=1, per_package=3))
+
+    assert len(results) == 3
+    assert all(r["testResult"].startswith("Failed: ") for r in results)
+
+
+def test_batch_requeued_to_other_device(fake_adb):
+    fake_adb.kill("emulator-5556")
+    tester = IntentTester(interval=0, adb=fake_adb.path, batch_size=2, devices=DEVICES)
+    results = tester.test_intents(make_items(packages=2, per_package=3))
+
+    assert len(results) == 6
+    assert all(r["testResult"] == "Pending" and r["device"] == "emulator-5554" for r in results)
+
+
+def test_async_engine_results(fake_adb):
+    async def collect():
+        engine = AsyncIntentEngine(devices=DEVICES, concurrency=2, adb=fake_adb.path)
+        return [r async for r in engine.run(make_items(packages=2, per_package=2) + [intent("com.a", "Missing")])]
+
+    results = asyncio.run(collect())
+    assert Counter(r["testResult"].split(":")[0] for r in results) == {"Pending": 4, "Failed": 1}
+    assert {r["device"] for r in results} <= set(DEVICES)
+
+
+def test_async_engine_propagates_input_error(fake_adb):
+    def items():
+        yield from make_items(packages=1, per_package=2)
+        raise ValueError("broken input")
+
+    async def collect(seen):
+        engine = AsyncIntentEngine(adb=fake_adb.path)
+        async for result in engine.run(items()):
+            seen.append(result)
+
+    seen = []
+    with pytest.raises(ValueError, match="broken input"):
+        asyncio.run(asyncio.wait_for(collect(seen), 30))
+    assert len(seen) == 2
+
+
+def test_async_engine_rejects_thread_only_options(tmp_path):
+    assert async_engine_conflicts() == []
+    assert async_engine_conflicts(persistent=True, pace_by="app", burst=2, batch_size=5, logcat=True) == [
+        "--persistent", "--batch", "--logcat", "--pace-by", "--burst"]
+    # 在解析 APK 之前即拒绝
+    with pytest.raises(ValueError, match="--logcat"):
+        main(str(tmp_path / "missing.apk"), str(tmp_path / "out.csv"), "https://evil.example/", engine="async",
+             logcat=True)
@@ -0,0 +1,174 @@
+#coding = 'utf-8'
+import pytest
+
+from AA import IntentFilterIndex, simple_glob_match, connect_db, save_activities, transaction
+from test import IntentFilterData
+
+DATA_KEYS = ("scheme", "host", "port", "path", "pathPrefix", "pathPattern", "mimeType")
+
+
+def data(**attrs):
+    values = dict.fromkeys(DATA_KEYS)
+    values.update(attrs)
+    return values
+
+
+def activity(name, *datas, exported="true"):
+    return {
+        "activityName": name,
+        "exported": exported,
+        "permission": None,
+        "intent_filters": [{
+            "actions": ["android.intent.action.VIEW"],
+            "categories": ["android.intent.category.BROWSABLE"],
+            "datas": list(datas),
+        }],
+    }
+
+
+def store(db_path, package_name, *activities):
+    conn = connect_db(db_path)
+    try:
+        with transaction(conn):
+            save_activities(conn, package_name, list(activities))
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("pattern, path, expected", [
+    (".*\\.pdf", "/a.pdf", True),
+    # ".*" 只吃到下一个字符第一次出现的位置，不回溯
+    (".*\\.pdf", "/a.b.pdf", False),
+    (".*/download/.*", "/download/x", True),
+    (".*/download/.*", "/x/download/y", False),
+    # "x*" 贪婪且不回溯
+    ("a*a", "aa", False),
+    ("a*b", "aab", True),
+    ("/files/.*", "/files/", True),
+    ("/files/.*", "/files/x/y", True),
+    ("/a.c", "/abc", True),
+    # 与 PatternMatcher 一致：转义只影响 ".*"，单独的 "\\." 仍匹配任意字符
+    ("/a\\.c", "/abc", True),
+    ("/a\\.c", "/a.c", True),
+    ("/a\\*b", "/a*b", True),
+    ("", "", True),
+    ("", "/", False),
+    (".*", "", True),
+    # 与 PatternMatcher 一致：path 用完后只剩 "x*" 不算匹配
+    ("/x*", "/", False),
+])
+def test_simple_glob_match_follows_pattern_matcher(pattern, path, expected):
+    assert simple_glob_match(pattern, path) is expected
+
+
+def test_intent_filter_data_path_pattern_does_not_backtrack():
+    spec = IntentFilterData([data(scheme="https", host="*.evil.example", pathPattern=".*\\.pdf")])
+    assert spec.match("https://www.evil.example/a.pdf")
+    assert not spec.match("https://www.evil.example/a.b.pdf")
+
+
+def test_index_path_pattern_does_not_backtrack(tmp_path):
+    db_path = str(tmp_path / "all.db")
+    store(db_path, "com.pdf", activity("com.pdf.Viewer", data(scheme="https", host="*.evil.example",
+                                                              pathPattern=".*\\.pdf")))
+    index = IntentFilterIndex.open(db_path)
+    assert index.match("https://www.evil.example/a.pdf") == [("com.pdf", "com.pdf.Viewer", 0)]
+    assert index.match("https://www.evil.example/a.b.pdf") == []
+    # 持久化后重新加载，结果不变
+    assert IntentFilterIndex.open(db_path).match("https://www.evil.example/a.b.pdf") == []
+
+
+def test_refresh_rereads_only_changed_packages(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "all.db")
+    index_path = str(tmp_path / "all.filter_index")
+    store(db_path, "com.a", activity("com.a.Main", data(scheme="https", host="a.example")))
+    store(db_path, "com.b", activity("com.b.Main", data(scheme="https", host="b.example")))
+    assert IntentFilterIndex.open(db_path, index_path).match("https://a.example/") == [("com.a", "com.a.Main", 0)]
+
+    reread = []
+    original = IntentFilterIndex._add_package
+    monkeypatch.setattr(IntentFilterIndex, "_add_package",
+                        lambda self, package_name, rows: reread.append(package_name) or original(self, package_name, rows))
+
+    # 数据库没有变化：只比较水位，不读取任何包
+    index = IntentFilterIndex.open(db_path, index_path)
+    assert reread == []
+    assert index.refresh(db_path)["changed"] == 0
+
+    # 重写最后一个包：删除后重新插入的行可能复用相同的 rowid，版本号仍会变大
+    store(db_path, "com.b", activity("com.b.Main", data(scheme="https", host="c.example")))
+    store(db_path, "com.new", activity("com.new.Main", data(scheme="myapp")))
+    stats = index.refresh(db_path)
+    assert sorted(reread) == ["com.b", "com.new"]
+    assert (stats["changed"], stats["removed"], stats["packages"]) == (2, 0, 3)
+    assert index.match("https://b.example/") == []
+    assert index.match("https://c.example/") == [("com.b", "com.b.Main", 0)]
+    assert index.match("myapp://x") == [("com.new", "com.new.Main", 0)]
+
+
+def test_refresh_drops_removed_packages(tmp_path):
+    db_path = str(tmp_path / "all.db")
+    store(db_path, "com.a", activity("com.a.Main", data(scheme="https", host="a.example")))
+    store(db_path, "com.b", activity("com.b.Main", data(scheme="https", host="b.example")))
+    index = IntentFilterIndex.open(db_path)
+
+    conn = connect_db(db_path)
+    conn.execute("DELETE FROM package_version WHERE package_name = 'com.a'")
+    conn.close()
+    stats = index.refresh(db_path)
+    assert (stats["changed"], stats["removed"]) == (0, 1)
+    assert index.match("https://a.example/") == []
+    assert index.match("https://b.example/") == [("com.b", "com.b.Main", 0)]
+
+
+def test_refresh_upgrades_database_without_package_versions(tmp_path):
+    db_path = str(tmp_path / "all.db")
+    store(db_path, "com.a", activity("com.a.Main", data(scheme="https", host="a.example")))
+    conn = connect_db(db_path)
+    conn.execute("DROP TABLE package_version")
+    conn.execute("PRAGMA user_version = 1")
+    conn.close()
+
+    index = IntentFilterIndex()
+    assert index.refresh(db_path)["changed"] == 1
+    assert index.match("https://a.example/") == [("com.a", "com.a.Main", 0)]
+
+
+def test_index_matches_like_intent_filter_data(tmp_path):
+    db_path = str(tmp_path / "all.db")
+    index_path = str(tmp_path / "all.filter_index")
+    store(db_path, "com.a",
+          activity("com.a.Exact", data(scheme="https"), data(host="a.example", port="8443"), data(path="/x")),
+          activity("com.a.Wild", data(scheme="https", host="*.evil.example"), exported="false"),
+          activity("com.a.AnyHost", data(scheme="myapp")),
+          activity("com.a.Typed", data(scheme="https", host="a.example", mimeType="text/html")))
+    IntentFilterIndex.open(db_path, index_path)
+    index = IntentFilterIndex.load(index_path)
+
+    urls = [
+        "https://a.example:8443/x",
+        "https://a.example/x",
+        "https://a.example:8443/y",
+        "https://deep.www.evil.example/anything",
+        "https://evil.example.com/",
+        "myapp://whatever/path",
+    ]
+    hits = index.match_many(urls)
+    assert hits == {
+        "https://a.example:8443/x": [("com.a", "com.a.Exact", 0)],
+        "https://a.example/x": [],
+        "https://a.example:8443/y": [],
+        "https://deep.www.evil.example/anything": [("com.a", "com.a.Wild", 0)],
+        "https://evil.example.com/": [],
+        "myapp://whatever/path": [("com.a", "com.a.AnyHost", 0)],
+    }
+    assert index.match("https://deep.www.evil.example/", exported_only=True) == []
+    # 不带类型的 filter 与 IntentFilterData 的判定一致（IntentFilterData 对声明了 mimeType 的 filter 会带上 -t，
+    # 而索引查询的 URL 不带类型，这类 filter 不入索引）
+    for url in urls:
+        assert bool(hits[url]) == any(
+            IntentFilterData(d).match(url) for d in (
+                [data(scheme="https"), data(host="a.example", port="8443"), data(path="/x")],
+                [data(scheme="https", host="*.evil.example")],
+                [data(scheme="myapp")],
+            ))
@@ -0,0 +1,96 @@
+#coding = 'utf-8'
+import pytest
+
+from test import IntentFilterData, IntentBuilder, simple_glob_example
+
+TEMPLATE = ["{scheme}://{host}{port}{path}"]
+TARGET = "https://evil.example/x"
+
+
+def data(**attrs):
+    values = dict.fromkeys(("scheme", "host", "port", "path", "pathPrefix", "pathPattern", "mimeType"))
+    values.update(attrs)
+    return values
+
+
+@pytest.mark.parametrize("pattern, example", [
+    (".*\\.pdf", "/a.pdf"),
+    (".*/download/.*", "/download/"),
+    ("/files/.*", "/files/"),
+    (".*", "/a"),
+])
+def test_simple_glob_example_keeps_leading_slash(pattern, example):
+    assert simple_glob_example(pattern) == example
+
+
+def test_synthesize_wildcard_host_with_path_pattern():
+    spec = IntentFilterData([data(scheme="https", host="*.evil.example", pathPattern=".*\\.pdf")])
+    uris = spec.synthesize(TEMPLATE, TARGET)
+    assert uris == ["https://www.evil.example/a.pdf"]
+    assert all(spec.match(uri) for uri in uris)
+
+
+def test_synthesize_path_prefix_and_port():
+    spec = IntentFilterData([data(scheme="http", host="app.example", port="8080", pathPrefix="/open")])
+    assert spec.synthesize(TEMPLATE, TARGET) == ["http://app.example:8080/open"]
+    assert not spec.match("http://app.example/open")
+    assert not spec.match("http://app.example:8080/close")
+
+
+def test_synthesize_bare_wildcard_host_uses_target_host():
+    spec = IntentFilterData([data(scheme="https", host="*")])
+    assert spec.synthesize(TEMPLATE + [TARGET, "https://other.example/y"], TARGET) == [
+        "https://evil.example/x", "https://other.example/y"]
+
+
+def test_synthesize_drops_payloads_the_filter_cannot_match():
+    spec = IntentFilterData([data(scheme="myapp", host="open")])
+    assert spec.synthesize([TARGET, "myapp://open/{url}"], TARGET) == ["myapp://open/https%3A%2F%2Fevil.example%2Fx"]
+
+
+def test_matrix_mode_keeps_filters_with_path_pattern():
+    activity = {
+        "activityName": "com.a.Viewer",
+        "exported": "true",
+        "permission": None,
+        "intent_filters": [{
+            "actions": ["android.intent.action.VIEW"],
+            "categories": ["android.intent.category.BROWSABLE"],
+            "datas": [data(scheme="https", host="*.evil.example", pathPattern=".*\\.pdf")],
+        }],
+    }
+    commands = [i["constructedIntent"] for i in IntentBuilder("com.a", TARGET, TEMPLATE).iter_intents_for_activity(activity)]
+    assert commands == [
+        'adb shell am start -n com.a/com.a.Viewer -a android.intent.action.VIEW '
+        '-c android.intent.category.BROWSABLE -d "https://www.evil.example/a.pdf"',
+        'adb shell am start -n com.a/com.a.Viewer -a android.intent.action.VIEW '
+        '-c android.intent.category.BROWSABLE -d "https://www.evil.example/a.pdf" -e target "https://evil.example/x"',
+    ]
+
+
+def multi_data_activity():
+    # 同一 filter 内 scheme、host、path 分散在不同的 <data> 上
+    return {
+        "activityName": "com.a.Link",
+        "exported": "true",
+        "permission": None,
+        "intent_filters": [{
+            "actions": ["android.intent.action.VIEW"],
+            "categories": ["android.intent.category.BROWSABLE"],
+            "datas": [data(scheme="https"), data(host="a.example"), data(host="b.example", pathPrefix="/open")],
+        }],
+    }
+
+
+def test_data_attrs_merge_every_data_element():
+    intents = list(IntentBuilder("com.a", TARGET).iter_intents_for_activity(multi_data_activity()))
+    assert intents
+    assert all(i["dataAttrs"] == {"scheme": "https", "host": ["a.example", "b.example"], "port": None,
+                                  "path": None, "pathPrefix": "/open", "pathPattern": None, "mimeType": None}
+               for i in intents)
+
+
+def test_matrix_mode_combines_attributes_across_data_elements():
+    intents = IntentBuilder("com.a", TARGET, TEMPLATE).iter_intents_for_activity(multi_data_activity())
+    uris = {i["constructedIntent"].split(' -d "')[1].split('"')[0] for i in intents}
+    assert uris == {"https://a.example/open", "https://b.example/open"}
@@ -0,0 +1,98 @@
+#coding = 'utf-8'
+import multiprocessing
+import os
+import sqlite3
+import time
+
+import pytest
+
+import AA
+from AA import CorpusIngestor, IsolatedWorkerPool
+
+
+def scripted_worker(apk_path, timeout, cache_path=None, cache_max_bytes=None, reachability=False):
+    """
+    按 APK 路径名决定行为的 _ingest_worker 替身
+    """
+    name = os.path.basename(apk_path)
+    if name == "hang":
+        time.sleep(60)
+    if name == "crash":
+        os._exit(3)
+    if name == "alarm":
+        raise TimeoutError("APK 分析超时")
+    if name == "hog":
+        # 真实分配，由 RLIMIT_AS 拒绝
+        return bytearray(4 * 1024 ** 3)
+    if name == "broken":
+        raise ValueError("bad manifest")
+    package_name = name.split("-", 1)[1]
+    activities = [{"name": f"{package_name}.Main", "exported": "true", "permission": None, "intent_filters": None}]
+    return package_name, {"activities": activities}, None
+
+
+class ForkedPool(IsolatedWorkerPool):
+    # 测试中改用 fork 派生，工作进程才能继承 monkeypatch 后的 _ingest_worker
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ctx = multiprocessing.get_context("fork")
+
+
+@pytest.fixture(autouse=True)
+def scripted(monkeypatch):
+    monkeypatch.setattr(AA, "_ingest_worker", scripted_worker)
+    monkeypatch.setattr(AA, "IsolatedWorkerPool", ForkedPool)
+    monkeypatch.setattr(IsolatedWorkerPool, "KILL_GRACE", 0)
+
+
+def virtual_size_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmSize:"):
+                return int(line.split()[1]) // 1024
+
+
+def run(pool, apk_paths):
+    results, failures = [], []
+    pool.run(apk_paths, lambda path, *result: results.append(path),
+             lambda path, kind, reason, peak: failures.append((path, kind)))
+    return results, failures
+
+
+def test_failures_are_isolated_to_their_apk():
+    pool = ForkedPool(workers=2, timeout=1, memory_limit_mb=virtual_size_mb() + 512)
+    results, failures = run(pool, ["ok-com.a", "hang", "crash", "alarm", "hog", "broken", "ok-com.b"])
+
+    assert sorted(results) == ["ok-com.a", "ok-com.b"]
+    assert sorted(failures) == [("alarm", "timeout"), ("broken", "error"), ("crash", "crash"),
+                                ("hang", "timeout"), ("hog", "memory")]
+
+
+@pytest.mark.parametrize("options, spawned", [
+    ({"max_jobs": 2}, 3),
+    ({"rss_high_water_mb": 1}, 5),
+    ({}, 1),
+])
+def test_workers_are_recycled(options, spawned):
+    pool = ForkedPool(workers=1, timeout=10, **options)
+    results, failures = run(pool, [f"ok-com.app{i}" for i in range(5)])
+    assert len(results) == 5 and failures == []
+    assert pool.spawned == spawned
+
+
+def test_ingest_records_resource_failures(tmp_path):
+    list_file = tmp_path / "apks.txt"
+    list_file.write_text("ok-com.a\nhang\ncrash\n# comment\nok-com.b\n")
+    db_path = str(tmp_path / "all.db")
+    ingestor = CorpusIngestor(db_path=db_path, workers=2, timeout=1, isolated=True, max_jobs_per_worker=1)
+    stats = ingestor.ingest([str(list_file)])
+
+    assert (stats["total"], stats["ok"], stats["failed"], stats["workers_spawned"]) == (4, 2, 2, 4)
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT apk_path, kind FROM apk_failures ORDER BY apk_path").fetchall() == [
+            ("crash", "crash"), ("hang", "timeout")]
+        assert conn.execute("SELECT activity_name FROM activity_info ORDER BY 1").fetchall() == [
+            ("com.a.Main",), ("com.b.Main",)]
+    finally:
+        conn.close()
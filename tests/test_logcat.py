@@ -0,0 +1,110 @@
+#coding = 'utf-8'
+import os
+
+import pytest
+
+from conftest import FIXTURES, intent
+from test import LogcatCollector, LogcatClassifier, IntentTester
+
+
+def replay(path):
+    """
+    回放录制的 logcat，事件时间取日志行自身的时分秒（秒数）
+    """
+    collector = LogcatCollector(start=False)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            clock = line.split()[1] if line[:1].isdigit() else None
+            if clock is None:
+                collector.feed(line)  # 无法解析的行被忽略
+                continue
+            hours, minutes, seconds = clock.split(":")
+            collector.feed(line, int(hours) * 3600 + int(minutes) * 60 + float(seconds))
+    return collector
+
+
+def at(clock):
+    hours, minutes, seconds = clock.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+@pytest.fixture(scope="module")
+def recorded():
+    return replay(os.path.join(FIXTURES, "logcat_replay.txt"))
+
+
+@pytest.mark.parametrize("package, activity, url, start, expected", [
+    ("com.warm.app", "DeepLinkActivity", "https://evil.example/warm", "10:00:10", "Loaded"),
+    ("com.crash.app", "WebActivity", "https://evil.example/crash", "10:00:20", "Crashed"),
+    ("com.deny.app", "SecretActivity", "https://evil.example/deny", "10:00:30", "Rejected"),
+    ("com.quiet.app", "MainActivity", "https://evil.example/quiet", "10:00:40", "NoEffect"),
+    ("com.web.app", "BrowserActivity", "https://evil.example/web", "10:00:50", "Loaded"),
+])
+def test_classify_recorded_windows(recorded, package, activity, url, start, expected):
+    item = intent(package, activity, url)
+    events = recorded.window(at(start), at(start) + 3)
+    result = LogcatClassifier().classify(item, events, recorded.pids_of(package))
+    assert result.split(":")[0] == expected
+
+
+def test_warm_process_needs_pids_from_whole_stream(recorded):
+    # 进程在窗口之前启动：窗口内没有 Start proc，只能依靠整个日志流上记录的 pid
+    item = intent("com.warm.app", "DeepLinkActivity", "https://evil.example/warm")
+    events = recorded.window(at("10:00:10"), at("10:00:13"))
+    assert recorded.pids_of("com.warm.app") == {4321}
+    assert LogcatClassifier().classify(item, events) == "NoEffect"
+    assert LogcatClassifier().classify(item, events, {4321}).startswith("Loaded: ")
+
+
+def test_webview_lines_count_only_from_target_pids(recorded):
+    # 窗口内其他进程（pid 9001）的 chromium 日志也带有该 URL，不能据此判为 Loaded
+    item = intent("com.quiet.app", "MainActivity", "https://evil.example/quiet")
+    events = recorded.window(at("10:00:40"), at("10:00:43"))
+    assert any(tag == "chromium" and pid == 9001 for _, pid, _, tag, _ in events)
+    assert LogcatClassifier().classify(item, events) == "NoEffect"
+    # 应用子进程（com.web.app:browser）的 Start proc 记在包名下
+    assert recorded.pids_of("com.web.app") == {8123}
+
+
+def test_window_and_buffer_bounds():
+    collector = LogcatCollector(buffer_size=2, start=False)
+    for ts in (1, 2, 3):
+        collector.feed(f"10-17 10:00:0{ts}.000  100  100 I Tag: event {ts}", ts)
+    collector.feed("--------- beginning of crash", 4)
+    assert [e[4] for e in collector.window(0, 10)] == ["event 2", "event 3"]
+    assert [e[4] for e in collector.window(2.5, 3)] == ["event 3"]
+
+
+def test_tester_classifies_warm_process_via_pidof(fake_adb):
+    fake_adb.set_running("com.warm.app", 4321)
+    tester = IntentTester(interval=0, adb=fake_adb.path, serial="emulator-5554", logcat=True, settle=1.0)
+    items = [intent("com.warm.app", "Main", "https://evil.example/warm"),
+             intent("com.cold.app", "Crash"),
+             intent("com.deny.app", "Deny")]
+    try:
+        tester._collectors["emulator-5554"] = LogcatCollector(fake_adb.path, "emulator-5554")
+        fake_adb.wait_logcat_reader()
+        results = {r["activityName"]: r["testResult"] for r in tester.test_intents(items)}
+    finally:
+        tester.close()
+
+    assert results["com.warm.app.Main"].startswith("Loaded: ")
+    assert results["com.cold.app.Crash"].startswith("Crashed: ")
+    assert results["com.deny.app.Deny"].startswith("Rejected: ")
+    assert fake_adb.calls().count("shell pidof com.warm.app") == 1
+
+
+def test_batch_items_get_their_own_logcat_window(fake_adb):
+    # 同一批中先崩溃、后正常加载：按整批时间取窗口时第二条也会被判为 Crashed
+    tester = IntentTester(interval=1, adb=fake_adb.path, serial="emulator-5554", batch_size=2, logcat=True,
+                          settle=0.5)
+    items = [intent("com.same.app", "Crash"), intent("com.same.app", "Main", "https://evil.example/ok")]
+    try:
+        tester._collectors["emulator-5554"] = LogcatCollector(fake_adb.path, "emulator-5554")
+        fake_adb.wait_logcat_reader()
+        results = [r["testResult"] for r in tester.test_intents(items)]
+    finally:
+        tester.close()
+
+    assert results[0].startswith("Crashed: ")
+    assert results[1].startswith("Loaded: ")
@@ -0,0 +1,94 @@
+#coding = 'utf-8'
+import os
+from xml.dom import minidom
+
+import pytest
+from lxml import etree
+
+import AA
+from AA import AppAnalyzer, ManifestExtractor
+from conftest import FIXTURES
+
+PACKAGE = "com.example.shop"
+
+
+def baseline_analyze_activities(manifest_xml, package_name):
+    """
+    基线版本（8664801）AppAnalyzer.analyze_activities 的 minidom 实现，作为对照
+    """
+    manifest = minidom.parseString(etree.tostring(manifest_xml, encoding="unicode"))
+
+    def normalize(raw_name):
+        if raw_name.startswith("."):
+            return package_name + raw_name
+        if "." not in raw_name:
+            return f"{package_name}.{raw_name}"
+        return raw_name
+
+    activities_info = []
+    for activity in manifest.getElementsByTagName("activity"):
+        intent_filters = []
+        for f in activity.getElementsByTagName("intent-filter"):
+            datas = [{
+                "scheme": d.getAttribute("android:scheme") or None,
+                "host": d.getAttribute("android:host") or None,
+                "port": d.getAttribute("android:port") or None,
+                "path": d.getAttribute("android:path") or None,
+                "pathPrefix": d.getAttribute("android:pathPrefix") or None,
+                "pathPattern": d.getAttribute("android:pathPattern") or None,
+                "mimeType": d.getAttribute("android:mimeType") or None,
+            } for d in f.getElementsByTagName("data")]
+            if not datas:
+                datas.append(dict.fromkeys(("scheme", "host", "port", "path", "pathPrefix", "pathPattern", "mimeType")))
+            intent_filters.append({
+                "actions": [a.getAttribute("android:name") for a in f.getElementsByTagName("action")
+                            if a.getAttribute("android:name")],
+                "categories": [c.getAttribute("android:name") for c in f.getElementsByTagName("category")
+                               if c.getAttribute("android:name")],
+                "datas": datas,
+            })
+        exported = activity.getAttribute("android:exported").lower().strip()
+        permission = activity.getAttribute("android:permission").strip()
+        activities_info.append({
+            "activityName": normalize(activity.getAttribute("android:name")),
+            "exported": exported if exported else None,
+            "permission": permission if permission else None,
+            "intent_filters": intent_filters if intent_filters else None,
+        })
+    return activities_info
+
+
+class FakeApk:
+    def __init__(self, manifest_xml):
+        self.manifest_xml = manifest_xml
+
+    def get_package(self):
+        return self.manifest_xml.get("package")
+
+    def get_android_manifest_xml(self):
+        return self.manifest_xml
+
+
+@pytest.fixture
+def manifest_xml():
+    return etree.parse(os.path.join(FIXTURES, "AndroidManifest.xml")).getroot()
+
+
+def test_analyze_activities_matches_minidom_baseline(manifest_xml, monkeypatch):
+    monkeypatch.setattr(AA, "load_apk", lambda path: FakeApk(manifest_xml))
+    analyzer = AppAnalyzer("shop.apk", manifest_only=True)
+
+    activities = analyzer.analyze_activities()
+    assert activities == baseline_analyze_activities(manifest_xml, PACKAGE)
+    assert [a["activityName"] for a in activities] == [
+        "com.example.shop.MainActivity", "com.example.shop.DeepLinkActivity",
+        "com.example.shop.admin.AdminActivity", "com.thirdparty.sdk.WebActivity"]
+
+
+def test_single_pass_extracts_other_components(manifest_xml):
+    components = ManifestExtractor(manifest_xml, PACKAGE).extract_components()
+    assert [c["name"] for c in components["activity_aliases"]] == ["com.example.shop.Alias"]
+    assert components["activity_aliases"][0]["targetActivity"] == "com.example.shop.MainActivity"
+    assert [c["name"] for c in components["services"]] == ["com.example.shop.SyncService"]
+    assert components["receivers"][0]["intent_filters"][0]["actions"] == ["android.intent.action.BOOT_COMPLETED"]
+    assert components["providers"][0]["authorities"] == "com.example.shop.files"
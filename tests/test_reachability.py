@@ -0,0 +1,109 @@
+#coding = 'utf-8'
+from AA import WebViewReachability, WEBVIEW_CLASS
+
+
+class FakeMethod:
+    def __init__(self, class_name, name):
+        self.class_name = class_name
+        self.name = name
+        self.full_name = f"{class_name}->{name}"
+        self.callers = []
+        self.xref_queries = 0
+
+    def calls(self, callee):
+        callee.callers.append(self)
+        return self
+
+    def get_xref_from(self):
+        self.xref_queries += 1
+        return [(None, caller, 0) for caller in self.callers]
+
+
+class FakeClass:
+    def __init__(self, name, extends=None, external=False):
+        self.name = name
+        self.extends = extends
+        self.external = external
+        self.methods = {}
+
+    def is_external(self):
+        return self.external
+
+    def method(self, name):
+        return self.methods.setdefault(name, FakeMethod(self.name, name))
+
+    def get_methods(self):
+        return list(self.methods.values())
+
+
+class FakeAnalysis:
+    """
+    androguard Analysis 中 WebViewReachability 用到的部分：get_classes / get_class_analysis
+    """
+
+    def __init__(self):
+        self.classes = {}
+
+    def add(self, name, extends=None, external=False):
+        return self.classes.setdefault(name, FakeClass(name, extends, external))
+
+    def get_classes(self):
+        return list(self.classes.values())
+
+    def get_class_analysis(self, name):
+        return self.classes.get(name)
+
+
+def build_app():
+    dx = FakeAnalysis()
+    webview = dx.add(WEBVIEW_CLASS, "Landroid/view/View;", external=True)
+    load_url = webview.method("loadUrl")
+    dx.add("Landroid/app/Activity;", external=True)
+
+    helper = dx.add("Lcom/a/Helper;", "Ljava/lang/Object;")
+    helper.method("open").calls(load_url)
+    helper.method("indirect").calls(helper.method("open"))
+    # 调用环不影响搜索
+    helper.method("ping").calls(helper.method("pong")).calls(helper.method("ping"))
+
+    base = dx.add("Lcom/a/BaseActivity;", "Landroid/app/Activity;")
+    base.method("onCreate").calls(helper.method("open"))
+    main = dx.add("Lcom/a/Main;", "Lcom/a/BaseActivity;")
+    main.method("onResume").calls(helper.method("indirect"))
+
+    # 应用内的 WebView 子类上的加载方法同样是汇点
+    custom = dx.add("Lcom/a/MyWebView;", WEBVIEW_CLASS)
+    other = dx.add("Lcom/a/Other;", "Landroid/app/Activity;")
+    other.method("onNewIntent").calls(custom.method("loadUrl"))
+
+    quiet = dx.add("Lcom/a/Quiet;", "Landroid/app/Activity;")
+    quiet.method("onCreate").calls(helper.method("ping"))
+    quiet.method("helperOnly").calls(load_url)
+    return dx
+
+
+def test_shortest_path_through_inherited_entry():
+    reach = WebViewReachability(build_app())
+    assert reach.activity("com.a.Main") == {
+        "reachable": True,
+        "path": ["Lcom/a/BaseActivity;->onCreate", "Lcom/a/Helper;->open", f"{WEBVIEW_CLASS}->loadUrl"],
+    }
+
+
+def test_webview_subclass_sink_and_unreachable_activity():
+    reach = WebViewReachability(build_app())
+    assert reach.activity("com.a.Other")["path"] == ["Lcom/a/Other;->onNewIntent", "Lcom/a/MyWebView;->loadUrl"]
+    # 非入口方法能到达汇点不算
+    assert reach.activity("com.a.Quiet") == {"reachable": False, "path": []}
+    assert reach.activity("com.a.Missing") == {"reachable": False, "path": []}
+
+
+def test_reverse_search_runs_once_for_all_activities():
+    dx = build_app()
+    reach = WebViewReachability(dx)
+    reach.activity("com.a.Main")
+    queries = {m.full_name: m.xref_queries for c in dx.get_classes() for m in c.get_methods()}
+    for name in ("com.a.Other", "com.a.Quiet", "com.a.Main"):
+        reach.activity(name)
+    assert {m.full_name: m.xref_queries for c in dx.get_classes() for m in c.get_methods()} == queries
+    assert max(queries.values()) == 1